@@ -23,6 +23,23 @@ if config.config_file_name is not None:
 
 target_metadata = Base.metadata
 
+# tables created and kept up to date by src/api/search/sql.sql rather than
+# the ORM, which autogenerate should leave alone
+SEARCH_SQL_TABLES = {
+    "garden_documents",
+    "entrypoint_documents",
+    "modal_function_documents",
+    "garden_search_documents",
+    "garden_suggest_terms",
+    "search_generation",
+}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == "table" and name in SEARCH_SQL_TABLES:
+        return False
+    return True
+
 
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
@@ -52,6 +69,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
     )
 
@@ -60,7 +78,11 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+    )
 
     with context.begin_transaction():
         context.run_migrations()
@@ -0,0 +1,37 @@
+"""add enrolled_in_group to users
+
+Revision ID: d2c8f4a7b615
+Revises: b71d3e9a5c40
+Create Date: 2026-10-18 10:12:33.518907
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d2c8f4a7b615"
+down_revision: Union[str, None] = "b71d3e9a5c40"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # existing users were added to the group when their row was created, so
+    # backfill them as enrolled; new users start out unenrolled
+    op.add_column(
+        "users",
+        sa.Column(
+            "enrolled_in_group",
+            sa.Boolean(),
+            server_default=sa.true(),
+            nullable=False,
+        ),
+    )
+    op.alter_column("users", "enrolled_in_group", server_default=sa.false())
+
+
+def downgrade() -> None:
+    op.drop_column("users", "enrolled_in_group")
@@ -0,0 +1,50 @@
+"""record modal map calls once
+
+Revision ID: e5a1b7c39f42
+Revises: d2c8f4a7b615
+Create Date: 2026-10-19 09:41:07.826315
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e5a1b7c39f42"
+down_revision: Union[str, None] = "d2c8f4a7b615"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "modal_invocations", sa.Column("num_inputs", sa.Integer(), nullable=True)
+    )
+    # map calls used to be recorded with a row per input, fold them into one
+    op.execute(
+        """
+        WITH map_calls AS (
+            DELETE FROM modal_invocations
+            WHERE function_call_id IN (
+                SELECT function_call_id FROM modal_invocations
+                GROUP BY function_call_id HAVING count(*) > 1
+            )
+            RETURNING *
+        )
+        INSERT INTO modal_invocations (
+            user_id, function_id, function_call_id, date_invoked,
+            execution_time_seconds, estimated_usage, num_inputs
+        )
+        SELECT
+            min(user_id), min(function_id), function_call_id, min(date_invoked),
+            sum(execution_time_seconds), sum(estimated_usage), count(*)
+        FROM map_calls
+        GROUP BY function_call_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("modal_invocations", "num_inputs")
@@ -0,0 +1,39 @@
+"""Rebuild every full-text search document from scratch.
+
+Row-level triggers keep the search documents current (see src/api/search/sql.sql),
+so this is only needed after loading data with triggers disabled, or to repair drift.
+
+Run from the garden-backend-service directory:
+
+    python -m scripts.backfill_search_documents
+"""
+
+import asyncio
+import time
+
+from rich.console import Console
+from sqlalchemy import text
+
+from src.api.dependencies.database import create_db_engine, get_db_session_maker
+from src.config import get_settings
+
+console = Console()
+
+
+async def backfill_search_documents():
+    engine = create_db_engine(get_settings())
+    session_maker = get_db_session_maker(engine)
+
+    console.print("[bold green]Backfilling search documents...[/bold green]")
+    start_time = time.time()
+    async with session_maker() as db:
+        await db.execute(text("SELECT backfill_search_documents()"))
+        await db.commit()
+    await engine.dispose()
+
+    elapsed = (time.time() - start_time) * 1000
+    console.print(f"Done in [bold yellow]{elapsed:.2f} ms[/bold yellow]")
+
+
+if __name__ == "__main__":
+    asyncio.run(backfill_search_documents())
@@ -0,0 +1,152 @@
+"""Measure the per-request overhead of the app's middleware.
+
+Sends the same request to the bare router (no middleware) and to the full app,
+in-process so no server or network is involved, and reports the difference.
+
+The app is also built from a baseline git ref and measured the same way (in its
+own process), so the current middleware can be compared with an older stack. By
+default the baseline is the last commit with the old BaseHTTPMiddleware stack.
+
+Run from the garden-backend-service directory:
+
+    python -m scripts.middleware_benchmark --requests 5000
+    python -m scripts.middleware_benchmark --baseline-ref main
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from rich.console import Console
+
+from src.main import app
+
+console = Console()
+
+
+async def time_requests(asgi_app, path: str, requests: int) -> list[float]:
+    """Time `requests` sequential GETs of `path`, in microseconds."""
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        # warm up
+        for _ in range(100):
+            await client.get(path)
+
+        timings = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = await client.get(path)
+            timings.append((time.perf_counter() - start) * 1e6)
+            assert response.status_code < 500, response.text
+        return timings
+
+
+async def measure(path: str, requests: int) -> dict[str, float]:
+    """Median request time, in microseconds, without and with this tree's middleware."""
+    # the request log lines are part of the cost, but keep them off the terminal
+    for handler in logging.getLogger().handlers:
+        handler.setStream(open(os.devnull, "w"))
+
+    bare = await time_requests(app.router, path, requests)
+    full = await time_requests(app, path, requests)
+    return {"bare": statistics.median(bare), "full": statistics.median(full)}
+
+
+def git(*args: str) -> str:
+    return subprocess.run(
+        ["git", *args], capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+
+def default_baseline_ref() -> str:
+    """The parent of the commit that removed BaseHTTPMiddleware from src/middleware."""
+    removed = git(
+        "log", "-1", "--format=%h", "-S", "BaseHTTPMiddleware", "--", "src/middleware"
+    )
+    return f"{removed}^"
+
+
+def measure_baseline(ref: str, path: str, requests: int) -> dict[str, float]:
+    """Build the app as of `ref` in a temporary directory and measure it there."""
+    # this directory's path within the repo, e.g. garden-backend-service/
+    prefix = git("rev-parse", "--show-prefix")
+    archive = subprocess.run(
+        ["git", "archive", "--format=tar", f"{ref}:{prefix}"],
+        cwd=git("rev-parse", "--show-toplevel"),
+        capture_output=True,
+        check=True,
+    ).stdout
+    with tempfile.TemporaryDirectory() as tree:
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(tree)
+        # the baseline may predate this script
+        (Path(tree) / "scripts").mkdir(exist_ok=True)
+        shutil.copy(__file__, Path(tree) / "scripts" / "middleware_benchmark.py")
+        # settings read from .env here are already in os.environ, so the child gets them
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "scripts.middleware_benchmark",
+                "--path",
+                path,
+                "--requests",
+                str(requests),
+                "--json",
+            ],
+            cwd=tree,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def report(path: str, requests: int, current: dict, baseline: dict, ref: str):
+    current_overhead = current["full"] - current["bare"]
+    baseline_overhead = baseline["full"] - baseline["bare"]
+    console.print(f"[bold green]GET {path}[/bold green], {requests} requests (medians)")
+    console.print(f"No middleware:        [cyan]{current['bare']:.0f} µs[/cyan]")
+    console.print(f"Current middleware:   [cyan]{current['full']:.0f} µs[/cyan]")
+    console.print(f"Baseline ({ref}): [cyan]{baseline['full']:.0f} µs[/cyan]")
+    console.print(
+        f"Overhead: [bold yellow]{current_overhead:.0f} µs[/bold yellow] per request now, "
+        f"[bold yellow]{baseline_overhead:.0f} µs[/bold yellow] at the baseline"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", default="/")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument(
+        "--baseline-ref",
+        help="git ref to compare with (default: the last commit with the BaseHTTPMiddleware stack)",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="only measure this tree, and print the medians as JSON",
+    )
+    args = parser.parse_args()
+
+    current = asyncio.run(measure(args.path, args.requests))
+    if args.json:
+        print(json.dumps(current))
+        sys.exit()
+
+    ref = args.baseline_ref or default_baseline_ref()
+    baseline = measure_baseline(ref, args.path, args.requests)
+    report(args.path, args.requests, current, baseline, ref)
@@ -0,0 +1,23 @@
+"""Benchmark /gardens/search against synthetic corpora.
+
+Run from the garden-backend-service directory. First seed a corpus of benchmark
+gardens (each linked to an entrypoint and a modal function) into the database
+from your settings:
+
+    python -m scripts.search_benchmark seed --size 100000
+
+then, with the API running against the same database, run the query matrix and
+save the report:
+
+    python -m scripts.search_benchmark run --concurrency 1,8,32 --output before.json
+
+Reports are JSON, so runs from two commits can be diffed:
+
+    python -m scripts.search_benchmark compare before.json after.json
+
+DB query counts come from the API's Server-Timing header, or pg_stat_statements
+for older versions of the API that don't send one.
+
+Benchmark rows are marked by their DOIs and owner, so `seed --reset` (or `clear`)
+removes them without touching anything else in the database.
+"""
@@ -0,0 +1,225 @@
+import argparse
+import asyncio
+import json
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+from rich.console import Console
+from rich.table import Table
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from .corpus import benchmark_corpus_size, clear_corpus, seed_corpus
+from .queries import QUERY_SHAPES
+from .runner import QueryCounter, run_level
+
+console = Console()
+
+CORPUS_SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+
+def get_engine(database_url: str | None) -> AsyncEngine:
+    if database_url:
+        return create_async_engine(database_url)
+    from src.api.dependencies.database import create_db_engine
+    from src.config import get_settings
+
+    return create_db_engine(get_settings())
+
+
+def corpus_size(value: str) -> int:
+    return CORPUS_SIZES.get(value.lower()) or int(value)
+
+
+def comma_separated(cast):
+    return lambda value: [cast(item) for item in value.split(",")]
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def seed(args):
+    engine = get_engine(args.database_url)
+    if args.reset:
+        await clear_corpus(engine)
+    await seed_corpus(engine, args.size, args.batch_size)
+    await engine.dispose()
+
+
+async def clear(args):
+    engine = get_engine(args.database_url)
+    await clear_corpus(engine)
+    await engine.dispose()
+    console.print("Cleared the benchmark corpus")
+
+
+async def run(args):
+    engine = get_engine(args.database_url)
+    size = await benchmark_corpus_size(engine)
+    if not size:
+        console.print("[bold red]No benchmark gardens, run `seed` first[/bold red]")
+        return
+
+    # fallback for APIs that don't report query counts in a Server-Timing header
+    query_counter = QueryCounter(engine)
+    if not await query_counter.available():
+        query_counter = None
+
+    # measure the database, not the per-worker result cache, unless asked to
+    headers = {} if args.use_cache else {"Cache-Control": "no-cache"}
+    results = []
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+        for shape in args.shapes:
+            body = QUERY_SHAPES[shape](size)
+            for concurrency in args.concurrency:
+                await run_level(client, shape, body, concurrency, args.warmup, headers)
+                result = await run_level(
+                    client,
+                    shape,
+                    body,
+                    concurrency,
+                    args.requests,
+                    headers,
+                    query_counter,
+                )
+                console.print(
+                    f"{shape} x{concurrency}: p50 [cyan]{result.p50_ms} ms[/cyan], "
+                    f"p99 [cyan]{result.p99_ms} ms[/cyan], "
+                    f"{result.throughput_rps} req/s, {result.errors} errors"
+                )
+                results.append(result.to_dict())
+    await engine.dispose()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "url": args.url,
+        "corpus_size": size,
+        "requests": args.requests,
+        "cached": args.use_cache,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+        console.print(f"Wrote [bold]{args.output}[/bold]")
+    else:
+        print(output)
+
+
+def compare(args):
+    before, after = (json.loads(path.read_text()) for path in (args.before, args.after))
+    before_results = {(r["shape"], r["concurrency"]): r for r in before["results"]}
+
+    table = Table(
+        title=f"{before.get('commit') or args.before} -> {after.get('commit') or args.after}"
+    )
+    for header in ("shape", "concurrency", "p50 ms", "p95 ms", "p99 ms", "req/s"):
+        table.add_column(header)
+
+    def change(metric: str, old: dict, new: dict) -> str:
+        if old[metric] == 0:
+            return f"{new[metric]}"
+        pct = (new[metric] - old[metric]) / old[metric] * 100
+        return f"{new[metric]} ({pct:+.0f}%)"
+
+    for result in after["results"]:
+        previous = before_results.get((result["shape"], result["concurrency"]))
+        if previous is None:
+            continue
+        table.add_row(
+            result["shape"],
+            str(result["concurrency"]),
+            *(
+                change(metric, previous, result)
+                for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+            ),
+        )
+    console.print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.search_benchmark",
+        description="Benchmark /gardens/search against synthetic corpora.",
+    )
+    parser.add_argument(
+        "--database-url",
+        help="Database to seed and count queries in. Defaults to the one from your settings.",
+    )
+    subparsers = parser.add_subparsers(required=True)
+
+    seed_parser = subparsers.add_parser("seed", help="Seed the benchmark corpus")
+    seed_parser.add_argument(
+        "--size",
+        type=corpus_size,
+        default="10k",
+        help="Number of gardens: 1k, 10k, 100k, 1m or any number (default 10k)",
+    )
+    seed_parser.add_argument("--batch-size", type=int, default=10_000)
+    seed_parser.add_argument(
+        "--reset", action="store_true", help="Clear the corpus before seeding"
+    )
+    seed_parser.set_defaults(func=seed)
+
+    clear_parser = subparsers.add_parser("clear", help="Remove the benchmark corpus")
+    clear_parser.set_defaults(func=clear)
+
+    run_parser = subparsers.add_parser("run", help="Run the query matrix")
+    run_parser.add_argument("--url", default="http://localhost:5500")
+    run_parser.add_argument(
+        "--shapes",
+        type=comma_separated(str),
+        default=list(QUERY_SHAPES),
+        help=f"Comma separated query shapes (default {','.join(QUERY_SHAPES)})",
+    )
+    run_parser.add_argument(
+        "--concurrency",
+        type=comma_separated(int),
+        default=[1, 8, 32],
+        help="Comma separated concurrency levels (default 1,8,32)",
+    )
+    run_parser.add_argument(
+        "--requests", type=int, default=200, help="Requests per level (default 200)"
+    )
+    run_parser.add_argument(
+        "--warmup", type=int, default=10, help="Untimed requests before each level"
+    )
+    run_parser.add_argument("--timeout", type=float, default=60)
+    run_parser.add_argument(
+        "--use-cache",
+        action="store_true",
+        help="Let the API serve repeated searches from its result cache",
+    )
+    run_parser.add_argument("--output", type=Path, help="Write the JSON report here")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="Compare two reports from `run`"
+    )
+    compare_parser.add_argument("before", type=Path)
+    compare_parser.add_argument("after", type=Path)
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    if unknown := set(getattr(args, "shapes", [])) - set(QUERY_SHAPES):
+        parser.error(f"Unknown query shapes: {', '.join(sorted(unknown))}")
+
+    if asyncio.iscoroutinefunction(args.func):
+        asyncio.run(args.func(args))
+    else:
+        args.func(args)
+
+
+if __name__ == "__main__":
+    main()
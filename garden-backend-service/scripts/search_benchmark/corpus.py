@@ -0,0 +1,204 @@
+"""Seed (and clear) synthetic benchmark gardens straight into the database."""
+
+import time
+from uuid import UUID
+
+from rich.console import Console
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+console = Console()
+
+# every benchmark row is owned by this user and has a DOI under this prefix
+BENCHMARK_IDENTITY_ID = UUID("00000000-0000-4000-8000-00000000be4c")
+BENCHMARK_DOI_PREFIX = "10.99999/benchmark"
+
+# words the generated titles, descriptions and tags are drawn from
+VOCABULARY = [
+    "material", "protein", "climate", "catalyst", "polymer", "genome",
+    "battery", "crystal", "neural", "quantum", "fluid", "spectra",
+    "alloy", "enzyme", "seismic", "plasma", "solvent", "membrane",
+    "galaxy", "lattice", "aerosol", "isotope", "photonic", "microbe",
+]  # fmt: skip
+
+# in every description, so matches the whole corpus
+COMMON_TERM = "model"
+# in one garden per RARE_TERM_EVERY
+RARE_TERM = "zephyrite"
+RARE_TERM_EVERY = 1000
+
+AUTHORS = 500
+FIRST_YEAR = 2000
+YEARS = 25
+
+_SETUP = """
+INSERT INTO users (identity_id, username, name)
+VALUES (:identity_id, 'benchmark', 'Search Benchmark')
+ON CONFLICT (identity_id) DO NOTHING;
+
+INSERT INTO modal_apps (app_name, base_image_name, requirements, file_contents, user_id)
+SELECT 'benchmark', 'python:3.11', ARRAY[]::varchar[], '', id
+FROM users
+WHERE identity_id = :identity_id
+  AND NOT EXISTS (
+      SELECT 1 FROM modal_apps WHERE app_name = 'benchmark' AND user_id = users.id
+  );
+"""
+
+# :start and :stop bound the (1-based) garden numbers in the batch; :vocab is VOCABULARY
+_INSERT_BATCH = """
+WITH owner AS (
+    SELECT u.id AS user_id, a.id AS modal_app_id
+    FROM users u JOIN modal_apps a ON a.user_id = u.id AND a.app_name = 'benchmark'
+    WHERE u.identity_id = :identity_id
+),
+vocab AS (
+    SELECT CAST(:vocab AS varchar[]) AS words
+),
+words AS (
+    SELECT i,
+           words[1 + i % cardinality(words)] AS word,
+           -- never the same as word, since tags must be unique
+           words[1 + (i + 1 + (i / cardinality(words)) % (cardinality(words) - 1))
+                     % cardinality(words)] AS other_word,
+           (:first_year + i % :years)::text AS year,
+           ARRAY['Author ' || i % :authors, 'Author ' || (i + 1) % :authors] AS authors,
+           CASE WHEN i % :rare_every = 0 THEN ' ' || :rare_term ELSE '' END AS rare
+    FROM generate_series(:start, :stop - 1) i, vocab
+),
+new_gardens AS (
+    INSERT INTO gardens (
+        title, doi, doi_is_draft, authors, contributors, tags, description,
+        publisher, year, language, version, entrypoint_aliases, is_archived, user_id
+    )
+    SELECT initcap(word) || ' ' || other_word || ' garden ' || i,
+           :doi_prefix || '-garden-' || i, false, authors, ARRAY[]::varchar[],
+           ARRAY[word, other_word], 'A ' || :common_term || ' of ' || word || rare,
+           'Garden-AI', year, 'en', '0.0.1', '{}'::json, false, owner.user_id
+    FROM words, owner
+    RETURNING id, doi
+),
+new_entrypoints AS (
+    INSERT INTO entrypoints (
+        doi, doi_is_draft, title, description, year, func_uuid, container_uuid,
+        base_image_uri, full_image_uri, notebook_url, is_archived, short_name,
+        function_text, authors, tags, test_functions, user_id
+    )
+    SELECT :doi_prefix || '-entrypoint-' || i, false,
+           'Predict ' || other_word || ' ' || i,
+           'An entrypoint for ' || other_word || ' ' || :common_term || 's', year,
+           md5('benchmark-func-' || i)::uuid, md5('benchmark-container-' || i)::uuid,
+           'benchmark', 'benchmark', 'https://example.com/benchmark.ipynb', false,
+           'predict_' || i, 'def predict(x): return x', authors, ARRAY[other_word],
+           ARRAY[]::varchar[], owner.user_id
+    FROM words, owner
+    RETURNING id, doi
+),
+new_modal_functions AS (
+    INSERT INTO modal_functions (
+        doi, doi_is_draft, title, authors, tags, description, year, is_archived,
+        function_name, function_text, hardware_spec, test_functions, modal_app_id
+    )
+    SELECT :doi_prefix || '-modal-function-' || i, false,
+           'Simulate ' || word || ' ' || i, authors, ARRAY[word],
+           'A modal function simulating ' || word, year, false,
+           'simulate_' || i, 'def simulate(x): return x', '{}'::json,
+           ARRAY[]::varchar[], owner.modal_app_id
+    FROM words, owner
+    RETURNING id, doi
+),
+linked_entrypoints AS (
+    INSERT INTO gardens_entrypoints (garden_id, entrypoint_id)
+    SELECT g.id, e.id
+    FROM new_gardens g
+    JOIN new_entrypoints e ON split_part(e.doi, '-entrypoint-', 2) = split_part(g.doi, '-garden-', 2)
+)
+INSERT INTO gardens_modal_functions (garden_id, modal_function_id)
+SELECT g.id, mf.id
+FROM new_gardens g
+JOIN new_modal_functions mf ON split_part(mf.doi, '-modal-function-', 2) = split_part(g.doi, '-garden-', 2)
+"""
+
+_CLEAR = """
+DELETE FROM gardens_entrypoints
+WHERE garden_id IN (SELECT id FROM gardens WHERE doi LIKE :doi_pattern);
+
+DELETE FROM gardens_modal_functions
+WHERE garden_id IN (SELECT id FROM gardens WHERE doi LIKE :doi_pattern);
+
+DELETE FROM users_saved_gardens
+WHERE garden_id IN (SELECT id FROM gardens WHERE doi LIKE :doi_pattern);
+
+DELETE FROM gardens WHERE doi LIKE :doi_pattern;
+
+DELETE FROM entrypoints WHERE doi LIKE :doi_pattern;
+
+DELETE FROM modal_functions WHERE doi LIKE :doi_pattern;
+"""
+
+
+def _statements(sql: str) -> list[str]:
+    return [stmt for stmt in sql.split(";\n") if stmt.strip()]
+
+
+async def benchmark_corpus_size(engine: AsyncEngine) -> int:
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            text("SELECT count(*) FROM gardens WHERE doi LIKE :doi_pattern"),
+            {"doi_pattern": f"{BENCHMARK_DOI_PREFIX}-%"},
+        )
+        return result.scalar_one()
+
+
+async def clear_corpus(engine: AsyncEngine) -> None:
+    """Delete every benchmark garden, entrypoint and modal function."""
+    async with engine.begin() as conn:
+        for stmt in _statements(_CLEAR):
+            await conn.execute(text(stmt), {"doi_pattern": f"{BENCHMARK_DOI_PREFIX}-%"})
+
+
+async def seed_corpus(engine: AsyncEngine, size: int, batch_size: int) -> None:
+    """Top the benchmark corpus up to `size` gardens.
+
+    Each garden is linked to its own entrypoint and modal function, and the
+    search triggers build their documents as the rows go in, as they would for
+    gardens created through the API. Gardens are inserted in batches of
+    `batch_size`, each committed separately, so an interrupted seed can be resumed.
+    """
+    params = {
+        "identity_id": BENCHMARK_IDENTITY_ID,
+        "doi_prefix": BENCHMARK_DOI_PREFIX,
+        "vocab": VOCABULARY,
+        "common_term": COMMON_TERM,
+        "rare_term": RARE_TERM,
+        "rare_every": RARE_TERM_EVERY,
+        "authors": AUTHORS,
+        "first_year": FIRST_YEAR,
+        "years": YEARS,
+    }
+    async with engine.begin() as conn:
+        for stmt in _statements(_SETUP):
+            await conn.execute(text(stmt), {"identity_id": BENCHMARK_IDENTITY_ID})
+
+    existing = await benchmark_corpus_size(engine)
+    if existing >= size:
+        console.print(f"Corpus already has {existing} benchmark gardens")
+        return
+
+    console.print(
+        f"[bold green]Seeding {size - existing} benchmark gardens...[/bold green]"
+    )
+    start_time = time.time()
+    for start in range(existing + 1, size + 1, batch_size):
+        stop = min(start + batch_size, size + 1)
+        async with engine.begin() as conn:
+            await conn.execute(
+                text(_INSERT_BATCH), {**params, "start": start, "stop": stop}
+            )
+        console.print(f"  {stop - 1}/{size} gardens")
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ANALYZE"))
+
+    elapsed = time.time() - start_time
+    console.print(f"Done in [bold yellow]{elapsed:.1f} s[/bold yellow]")
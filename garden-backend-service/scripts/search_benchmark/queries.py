@@ -0,0 +1,32 @@
+"""The matrix of /gardens/search request shapes to benchmark."""
+
+from typing import Callable
+
+from .corpus import COMMON_TERM, FIRST_YEAR, RARE_TERM, VOCABULARY
+
+# each shape builds its request body from the size of the corpus
+QUERY_SHAPES: dict[str, Callable[[int], dict]] = {
+    # matches about one garden in a thousand
+    "rare_term": lambda size: {"q": RARE_TERM, "limit": 10},
+    # matches every garden, so ranking and facets see the whole corpus
+    "common_term": lambda size: {"q": COMMON_TERM, "limit": 10},
+    "filters_only": lambda size: {
+        "q": "",
+        "limit": 10,
+        "filters": [
+            {"field_name": "tags", "operator": "contains", "values": [VOCABULARY[0]]},
+            {
+                "field_name": "year",
+                "operator": "range",
+                "values": [str(FIRST_YEAR), str(FIRST_YEAR + 9)],
+            },
+        ],
+    },
+    # halfway through every match
+    "deep_offset": lambda size: {"q": COMMON_TERM, "limit": 10, "offset": size // 2},
+    "sort": lambda size: {
+        "q": COMMON_TERM,
+        "limit": 10,
+        "sort": {"field_name": "title", "order": "asc"},
+    },
+}
@@ -0,0 +1,137 @@
+"""Fire concurrent searches at a running API and summarize the results."""
+
+import asyncio
+import re
+import statistics
+import time
+from dataclasses import asdict, dataclass
+
+import httpx
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+@dataclass
+class BenchmarkResult:
+    shape: str
+    concurrency: int
+    requests: int
+    errors: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    throughput_rps: float
+    # None when neither the Server-Timing header nor pg_stat_statements is available
+    db_queries_per_request: float | None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+# the API reports each request's query count in its Server-Timing header
+SERVER_TIMING_DB_QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+class QueryCounter:
+    """Count statements run against the database with pg_stat_statements.
+
+    Only used for APIs that don't send a Server-Timing header. The counts are
+    database-wide, so they include anything else running against the same
+    database during the benchmark.
+    """
+
+    _TOTAL_CALLS = text(
+        "SELECT coalesce(sum(calls), 0) FROM pg_stat_statements "
+        "WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())"
+    )
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+
+    async def available(self) -> bool:
+        try:
+            await self.total()
+        except Exception:
+            return False
+        return True
+
+    async def total(self) -> int:
+        async with self.engine.connect() as conn:
+            result = await conn.execute(self._TOTAL_CALLS)
+            # discount this query itself
+            return int(result.scalar_one()) - 1
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """The `pct`th percentile of `sorted_values`, by linear interpolation."""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    weight = rank - lower
+    return sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    shape: str,
+    body: dict,
+    concurrency: int,
+    requests: int,
+    headers: dict[str, str],
+    query_counter: QueryCounter | None = None,
+) -> BenchmarkResult:
+    """Send `requests` copies of `body`, at most `concurrency` at a time."""
+    latencies: list[float] = []
+    # from the Server-Timing header of each successful response
+    db_queries: list[int] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    "/gardens/search", json=body, headers=headers
+                )
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append((time.perf_counter() - start) * 1000)
+                match = SERVER_TIMING_DB_QUERIES.search(
+                    response.headers.get("Server-Timing", "")
+                )
+                if match:
+                    db_queries.append(int(match.group(1)))
+            else:
+                errors += 1
+
+    queries_before = await query_counter.total() if query_counter else None
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    queries_per_request = None
+    if db_queries and len(db_queries) == len(latencies):
+        queries_per_request = round(statistics.fmean(db_queries), 2)
+    elif query_counter is not None:
+        queries = await query_counter.total() - queries_before
+        queries_per_request = round(queries / requests, 2)
+
+    latencies.sort()
+    return BenchmarkResult(
+        shape=shape,
+        concurrency=concurrency,
+        requests=requests,
+        errors=errors,
+        p50_ms=round(percentile(latencies, 50), 2),
+        p95_ms=round(percentile(latencies, 95), 2),
+        p99_ms=round(percentile(latencies, 99), 2),
+        mean_ms=round(statistics.fmean(latencies), 2) if latencies else 0.0,
+        throughput_rps=round(len(latencies) / elapsed, 2),
+        db_queries_per_request=queries_per_request,
+    )
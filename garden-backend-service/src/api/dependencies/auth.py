@@ -1,19 +1,15 @@
-from datetime import datetime
-
 import globus_sdk
 import structlog
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from structlog import get_logger
 
 from src.api.dependencies.database import get_db_session
 from src.auth.auth_state import AuthenticationState
-from src.auth.globus_groups import add_user_to_group
 from src.config import Settings, get_settings
-from src.models.modal.invocations import ModalInvocation
 from src.models.user import User
+from src.usage import get_monthly_usage
 
 log = get_logger(__name__)
 
@@ -27,11 +23,14 @@ def _get_auth_token(
     return authorization.credentials
 
 
-def _get_auth_state(
+async def _get_auth_state(
+    request: Request,
     token: str = Depends(_get_auth_token),
 ):
     """Get an AuthenticationState object from the token in the Authorization header."""
-    return AuthenticationState(token)
+    return await AuthenticationState.from_token(
+        token, request.app.state.token_introspector
+    )
 
 
 def authenticated(
@@ -44,6 +43,7 @@ def authenticated(
 
 
 async def authed_user(
+    request: Request,
     db: AsyncSession = Depends(get_db_session),
     auth: AuthenticationState = Depends(authenticated),
     settings: Settings = Depends(get_settings),
@@ -54,9 +54,7 @@ async def authed_user(
             identity_id=auth.identity_id,
         )
 
-        # Add the user to Garden Users Globus group if they are new
         if created:
-            add_user_to_group(auth, settings)
             # populate fields we can get from the auth token
             user.name = auth.name
             user.email = auth.email
@@ -72,6 +70,11 @@ async def authed_user(
         await db.rollback()
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+    # Add the user to the Garden Users Globus group if they aren't in it yet. This
+    # happens in the background, so the user isn't kept waiting on Globus
+    if not user.enrolled_in_group:
+        request.app.state.group_enrollment.enroll(auth.identity_id)
+
     # include username and id globally in any logs
     # emitted "downstream" in authed_user-dependants
     with structlog.contextvars.bound_contextvars(
@@ -94,24 +97,19 @@ async def modal_vip(
 
 
 async def under_modal_usage_limit(
+    request: Request,
     user: User = Depends(authed_user),
     settings: Settings = Depends(get_settings),
     db: AsyncSession = Depends(get_db_session),
 ) -> bool:
-    now = datetime.now()
-    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-    # Calculate total estimated usage during the current month
-    monthly_usage = await db.scalar(
-        select(func.sum(ModalInvocation.estimated_usage)).where(
-            ModalInvocation.user_id == user.id,
-            ModalInvocation.date_invoked >= start_of_month,
-        )
+    # total estimated usage during the current month
+    monthly_usage = await get_monthly_usage(
+        db, user.id, request.app.state.monthly_usage_cache
     )
 
     log.info(f"Calculated monthly usage: {monthly_usage}")
 
-    if monthly_usage is None or monthly_usage < settings.MODAL_USAGE_LIMIT:
+    if monthly_usage < settings.MODAL_USAGE_LIMIT:
         return True
     else:
         raise HTTPException(
@@ -1,12 +1,21 @@
+import hashlib
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import AsyncIterator
 
 import sqlparse
-from fastapi import Depends
-from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from cachetools import TTLCache
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import Session
 
-from src.config import get_settings
+from src.config import Settings
 
 
 async def async_init(db_session: async_sessionmaker, sql_path: Path):
@@ -29,13 +38,90 @@ def init(db: Session, sql_path: Path):
     db.commit()
 
 
-async def get_db_session(settings=Depends(get_settings)) -> AsyncSession:
-    """Get the database session then close it after the request is complete."""
-    postgres_url = settings.SQLALCHEMY_DATABASE_URL
-    engine = create_async_engine(postgres_url, echo=False)
-    AsyncSessionLocal = async_sessionmaker(
-        bind=engine, class_=AsyncSession, expire_on_commit=False
+def create_db_engine(settings: Settings, url: str | None = None) -> AsyncEngine:
+    """Create the engine (and its connection pool) shared by every request in this worker.
+
+    Connects to the primary database unless another `url` (e.g. a read replica) is given.
+    """
+    return create_async_engine(
+        url or settings.SQLALCHEMY_DATABASE_URL,
+        echo=False,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
     )
 
-    async with AsyncSessionLocal() as db_session:
+
+def get_db_session_maker(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def get_recent_writers(settings: Settings) -> TTLCache | None:
+    """Create the cache of callers who recently wrote to the primary.
+
+    Returns None when read-your-writes routing is turned off.
+    """
+    if not settings.DB_READ_YOUR_WRITES_SECS:
+        return None
+    return TTLCache(maxsize=10_000, ttl=settings.DB_READ_YOUR_WRITES_SECS)
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_committed(session: Session) -> None:
+    session.info["committed"] = True
+
+
+def _caller_key(request: Request) -> str | None:
+    """Identify the caller by a hash of their Authorization header, if any."""
+    authorization = request.headers.get("Authorization")
+    if not authorization:
+        return None
+    return hashlib.sha256(authorization.encode()).hexdigest()
+
+
+async def get_db_session(request: Request) -> AsyncSession:
+    """Get a database session from the app's pool then close it after the request is complete.
+
+    The engine and session maker are created once per worker in `main.lifespan`
+    and stored on `app.state`.
+    """
+    async with request.app.state.db_session_maker() as db_session:
+        # so changes to modal apps can invalidate their cached function handles
+        db_session.info["modal_function_cache"] = request.app.state.modal_function_cache
+        # and recorded usage can invalidate cached monthly usage totals
+        db_session.info["monthly_usage_cache"] = request.app.state.monthly_usage_cache
+        yield db_session
+
+        recent_writers: TTLCache | None = request.app.state.recent_writers
+        if recent_writers is not None and db_session.info.get("committed"):
+            if caller := _caller_key(request):
+                recent_writers[caller] = True
+
+
+@asynccontextmanager
+async def readonly_db_session(request: Request) -> AsyncIterator[AsyncSession]:
+    """Open a read-only database session, from the read replica if one is configured.
+
+    Callers who committed a write within the last `DB_READ_YOUR_WRITES_SECS` are
+    given a (still read-only) session on the primary instead, so they don't miss
+    their own changes while the replica catches up.
+
+    Routes should normally depend on `get_readonly_db_session`; this is for routes
+    that only sometimes need the database, e.g. on a cache miss.
+    """
+    session_maker = request.app.state.readonly_db_session_maker
+    recent_writers: TTLCache | None = request.app.state.recent_writers
+    if recent_writers is not None and _caller_key(request) in recent_writers:
+        session_maker = request.app.state.db_session_maker
+
+    async with session_maker() as db_session:
+        await db_session.connection(execution_options={"postgresql_readonly": True})
+        yield db_session
+
+
+async def get_readonly_db_session(request: Request) -> AsyncSession:
+    """Get a read-only database session (see `readonly_db_session`)."""
+    async with readonly_db_session(request) as db_session:
         yield db_session
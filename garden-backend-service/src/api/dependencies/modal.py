@@ -1,10 +1,159 @@
+import asyncio
+
 import modal
-from fastapi import Depends
+from cachetools import TTLCache
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.config import Settings
+from src.metrics import CACHE_ENTRIES, CACHE_MAX_ENTRIES, CACHE_REQUESTS, CACHE_TTL
+from src.middleware.timing import external_call
+from src.models import ModalApp
+
+
+class SharedModalClient:
+    """One Modal client per worker, connected on first use and shared by every request.
+
+    Created in `main.lifespan` (and closed there on shutdown), so requests don't
+    each pay for a fresh connection.
+    """
+
+    def __init__(self, token_id: str, token_secret: str):
+        self.token_id = token_id
+        self.token_secret = token_secret
+        self._client: modal.Client | None = None
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> modal.Client:
+        if self._client is None or self._client.is_closed():
+            async with self._lock:
+                # someone else may have connected while we waited for the lock
+                if self._client is None or self._client.is_closed():
+                    with external_call("modal", "Client.from_credentials"):
+                        self._client = await modal.client._Client.from_credentials(
+                            self.token_id, self.token_secret
+                        )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client._close()
+            self._client = None
+
+
+async def get_modal_client(request: Request) -> modal.Client:
+    """Get the worker's shared Modal client."""
+    return await request.app.state.modal_client.get()
+
+
+class ModalFunctionCache:
+    """Per-worker cache of Modal function handles, so invocations can skip `Function.lookup`.
+
+    Handles are keyed by (app name, function name, environment) and expire after
+    a TTL. Committing a change to a ModalApp (e.g. redeploying or deleting it)
+    through a session from `get_db_session` drops its functions from this worker's
+    cache. Other workers only see the change once their entries expire, so the
+    TTL bounds how long they can keep using a replaced deployment.
+    """
+
+    CACHE_NAME = "modal_function"
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        CACHE_MAX_ENTRIES.labels(cache=self.CACHE_NAME).set(maxsize)
+        CACHE_TTL.labels(cache=self.CACHE_NAME).set(ttl)
 
-from src.config import Settings, get_settings
+    async def lookup(
+        self,
+        app_name: str,
+        function_name: str,
+        environment_name: str,
+        client: modal.Client,
+    ) -> modal.functions._Function:
+        key = (app_name, function_name, environment_name)
+        function = self._entries.get(key)
+        if function is not None:
+            CACHE_REQUESTS.labels(cache=self.CACHE_NAME, result="hit").inc()
+            return function
 
+        CACHE_REQUESTS.labels(cache=self.CACHE_NAME, result="miss").inc()
+        function = await _lookup_function(*key, client)
+        self._entries[key] = function
+        self._update_size()
+        return function
 
-async def get_modal_client(settings: Settings = Depends(get_settings)) -> modal.Client:
-    return await modal.client._Client.from_credentials(
-        settings.MODAL_TOKEN_ID, settings.MODAL_TOKEN_SECRET
+    def invalidate_app(self, app_name: str) -> None:
+        for key in [key for key in self._entries if key[0] == app_name]:
+            self._entries.pop(key, None)
+        self._update_size()
+
+    def _update_size(self) -> None:
+        CACHE_ENTRIES.labels(cache=self.CACHE_NAME).set(len(self._entries))
+
+
+def get_modal_function_cache(settings: Settings) -> ModalFunctionCache | None:
+    """Create the Modal function cache.
+
+    Returns None when caching is turned off.
+    """
+    if (
+        not settings.MODAL_FUNCTION_CACHE_SIZE
+        or not settings.MODAL_FUNCTION_CACHE_TTL_SECS
+    ):
+        return None
+    return ModalFunctionCache(
+        maxsize=settings.MODAL_FUNCTION_CACHE_SIZE,
+        ttl=settings.MODAL_FUNCTION_CACHE_TTL_SECS,
     )
+
+
+async def lookup_modal_function(
+    request: Request,
+    app_name: str,
+    function_name: str,
+    environment_name: str,
+    client: modal.Client,
+) -> modal.functions._Function:
+    """Look up a deployed Modal function, from the worker's cache if it's enabled."""
+    cache: ModalFunctionCache | None = request.app.state.modal_function_cache
+    if cache is None:
+        return await _lookup_function(app_name, function_name, environment_name, client)
+    return await cache.lookup(app_name, function_name, environment_name, client)
+
+
+async def _lookup_function(
+    app_name: str, function_name: str, environment_name: str, client: modal.Client
+) -> modal.functions._Function:
+    with external_call("modal", "Function.lookup"):
+        return await modal.functions._Function.lookup(
+            app_name=app_name,
+            tag=function_name,
+            environment_name=environment_name,
+            client=client,
+        )
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_modal_apps(session: Session, flush_context) -> None:
+    changed = {
+        obj.app_name
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, ModalApp)
+    }
+    if changed:
+        session.info.setdefault("changed_modal_apps", set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_modal_functions(session: Session) -> None:
+    cache: ModalFunctionCache | None = session.info.get("modal_function_cache")
+    changed = session.info.pop("changed_modal_apps", set())
+    if cache is not None:
+        for app_name in changed:
+            cache.invalidate_app(app_name)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_modal_apps(session: Session) -> None:
+    session.info.pop("changed_modal_apps", None)
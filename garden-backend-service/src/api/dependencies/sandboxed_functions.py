@@ -2,6 +2,7 @@ import modal
 from fastapi import Depends
 
 from src.config import Settings, get_settings
+from src.middleware.timing import external_call
 from src.sandboxed_functions.modal_publishing_helpers import (
     deploy_modal_app,
     validate_modal_file,
@@ -13,11 +14,12 @@ class ValidateModalFileProvider:
         if settings.MODAL_USE_LOCAL:
             self.f = validate_modal_file
         else:
-            remote_function = modal.Function.lookup(
-                "garden-publishing-helpers",
-                "remote_validate_modal_file",
-                environment_name=settings.MODAL_ENV,
-            )
+            with external_call("modal", "Function.lookup"):
+                remote_function = modal.Function.lookup(
+                    "garden-publishing-helpers",
+                    "remote_validate_modal_file",
+                    environment_name=settings.MODAL_ENV,
+                )
             self.f = remote_function.remote
 
     def __call__(self, file_contents: str):
@@ -29,11 +31,12 @@ class DeployModalAppProvider:
         if settings.MODAL_USE_LOCAL:
             self.f = deploy_modal_app
         else:
-            remote_function = modal.Function.lookup(
-                "garden-publishing-helpers",
-                "remote_deploy_modal_app",
-                environment_name=settings.MODAL_ENV,
-            )
+            with external_call("modal", "Function.lookup"):
+                remote_function = modal.Function.lookup(
+                    "garden-publishing-helpers",
+                    "remote_deploy_modal_app",
+                    environment_name=settings.MODAL_ENV,
+                )
             self.f = remote_function.remote
 
     def __call__(
@@ -12,6 +12,7 @@ from src.api.schemas.entrypoint import EntrypointPatchRequest
 from src.api.schemas.garden import GardenPatchRequest
 from src.api.schemas.modal.modal_function import ModalFunctionPatchRequest
 from src.config import Settings
+from src.middleware.timing import external_call
 from src.models import Entrypoint, Garden, ModalFunction, User
 from src.models._associations import gardens_entrypoints
 
@@ -83,7 +84,8 @@ async def is_doi_registered(doi: str) -> bool:
 
     headers = {"Accept": "application/vnd.citationstyles.csl+json"}
     async with httpx.AsyncClient(headers=headers) as client:
-        response = await client.get(url, follow_redirects=False)
+        with external_call("doi_org", "resolve DOI"):
+            response = await client.get(url, follow_redirects=False)
 
     # Check if the response status code is a redirect (300-399), indicating the DOI is registered
     if 300 <= response.status_code < 400:
@@ -131,7 +133,8 @@ def deprecated(
 async def poll_globus_search_task(
     task_id, search_client: SearchClient, max_intervals=25
 ):
-    task_result = search_client.get_task(task_id)
+    with external_call("globus_search", "get task"):
+        task_result = search_client.get_task(task_id)
     while task_result["state"] not in {"FAILED", "SUCCESS"}:
         if max_intervals == 0:
             raise exceptions.HTTPException(
@@ -143,7 +146,8 @@ async def poll_globus_search_task(
             )
         await asyncio.sleep(0.2)
         max_intervals -= 1
-        task_result = search_client.get_task(task_id)
+        with external_call("globus_search", "get task"):
+            task_result = search_client.get_task(task_id)
 
     if task_result["state"] == "SUCCESS":
         return {}
@@ -161,12 +165,13 @@ async def archive_on_datacite(doi: str, settings: Settings):
     body = {"data": {"type": "dois", "attributes": {"event": "hide"}}}
 
     async with httpx.AsyncClient() as client:
-        response = await client.put(
-            f"{settings.DATACITE_ENDPOINT}/{doi}",
-            headers={"Content-Type": "application/vnd.api+json"},
-            auth=(settings.DATACITE_REPO_ID, settings.DATACITE_PASSWORD),
-            json=body,
-        )
+        with external_call("datacite", "hide DOI"):
+            response = await client.put(
+                f"{settings.DATACITE_ENDPOINT}/{doi}",
+                headers={"Content-Type": "application/vnd.api+json"},
+                auth=(settings.DATACITE_REPO_ID, settings.DATACITE_PASSWORD),
+                json=body,
+            )
         logger.info("Sent request to archive DOI on datacite", doi=doi)
 
     if response.status_code != 200:
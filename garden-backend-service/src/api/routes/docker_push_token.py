@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, status
 from src.api.dependencies.auth import AuthenticationState, authenticated
 from src.api.schemas.docker import ECRPushCredentials
 from src.config import Settings, get_settings
+from src.middleware.timing import external_call
 
 router = APIRouter(prefix="/docker-push-token")
 
@@ -19,12 +20,13 @@ async def get_push_session(
     user_policy = _build_user_policy(settings.ECR_REPO_ARN)
 
     # Assume a role to get temporary credentials
-    assumed_role = sts_client.assume_role(
-        RoleArn=settings.ECR_ROLE_ARN,
-        RoleSessionName="ECR_TOKEN_ROLE",
-        DurationSeconds=settings.STS_TOKEN_TIMEOUT,
-        Policy=user_policy,
-    )
+    with external_call("aws_sts", "AssumeRole"):
+        assumed_role = sts_client.assume_role(
+            RoleArn=settings.ECR_ROLE_ARN,
+            RoleSessionName="ECR_TOKEN_ROLE",
+            DurationSeconds=settings.STS_TOKEN_TIMEOUT,
+            Policy=user_policy,
+        )
 
     credentials = assumed_role["Credentials"]
     return ECRPushCredentials(**credentials, ECRRepo=settings.ECR_REPO_ARN)
@@ -5,6 +5,7 @@ from structlog import get_logger
 from src.api.dependencies.auth import AuthenticationState, authenticated
 from src.api.schemas import datacite
 from src.config import Settings, get_settings
+from src.middleware.timing import external_call
 
 logger = get_logger(__name__)
 
@@ -25,12 +26,13 @@ async def mint_draft_doi(
 ):
     body.data.attributes.prefix = settings.DATACITE_PREFIX
     try:
-        resp: requests.Response = requests.post(
-            settings.DATACITE_ENDPOINT,
-            headers={"Content-Type": "application/vnd.api+json"},
-            json=body.model_dump(exclude_unset=True),
-            auth=(settings.DATACITE_REPO_ID, settings.DATACITE_PASSWORD),
-        )
+        with external_call("datacite", "create DOI"):
+            resp: requests.Response = requests.post(
+                settings.DATACITE_ENDPOINT,
+                headers={"Content-Type": "application/vnd.api+json"},
+                json=body.model_dump(exclude_unset=True),
+                auth=(settings.DATACITE_REPO_ID, settings.DATACITE_PASSWORD),
+            )
         resp.raise_for_status()
     except requests.HTTPError as e:
         raise exceptions.HTTPException(
@@ -87,12 +89,13 @@ async def update_datacite(
     body.data.attributes.prefix = settings.DATACITE_PREFIX
     try:
         doi = body.data.attributes.identifiers[0].identifier
-        resp: requests.Response = requests.put(
-            f"{settings.DATACITE_ENDPOINT}/{doi}",
-            headers={"Content-Type": "application/vnd.api+json"},
-            json=body.model_dump(exclude_unset=True),
-            auth=(settings.DATACITE_REPO_ID, settings.DATACITE_PASSWORD),
-        )
+        with external_call("datacite", "update DOI"):
+            resp: requests.Response = requests.put(
+                f"{settings.DATACITE_ENDPOINT}/{doi}",
+                headers={"Content-Type": "application/vnd.api+json"},
+                json=body.model_dump(exclude_unset=True),
+                auth=(settings.DATACITE_REPO_ID, settings.DATACITE_PASSWORD),
+            )
         resp.raise_for_status()
         logger.info("Updated metadata on datacite", doi=doi)
     except requests.HTTPError as e:
@@ -1,6 +1,6 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy import select
 from sqlalchemy.dialects.postgresql import array
 from sqlalchemy.exc import IntegrityError
@@ -8,7 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from structlog import get_logger
 
 from src.api.dependencies.auth import authed_user, get_auth_client
-from src.api.dependencies.database import get_db_session
+from src.api.dependencies.database import get_db_session, get_readonly_db_session
 from src.api.routes._utils import (
     archive_on_datacite,
     assert_deletable_by_user,
@@ -19,6 +19,7 @@ from src.api.schemas.entrypoint import (
     EntrypointMetadataResponse,
     EntrypointPatchRequest,
 )
+from src.api.search.pagination import next_id_cursor, paginate_by_id
 from src.config import Settings, get_settings
 from src.models import Entrypoint, User
 
@@ -59,7 +60,7 @@ async def get_entrypoint_by_doi(
 
 @router.get("", status_code=status.HTTP_200_OK)
 async def get_entrypoints(
-    db: AsyncSession = Depends(get_db_session),
+    db: AsyncSession = Depends(get_readonly_db_session),
     *,
     doi: list[str] | None = Query(None),
     tags: list[str] | None = Query(None),
@@ -68,8 +69,14 @@ async def get_entrypoints(
     draft: bool | None = Query(None),
     year: str | None = Query(None),
     limit: int = Query(50, le=100),
+    cursor: str | None = Query(None),
+    response: Response,
 ) -> list[EntrypointMetadataResponse]:
-    """Fetch multiple entrypoints according to query parameters."""
+    """Fetch multiple entrypoints according to query parameters.
+
+    If there may be more results, the response's X-Next-Cursor header holds a
+    `cursor` to fetch the next page with.
+    """
     stmt = select(Entrypoint)
     if doi:
         stmt = stmt.where(Entrypoint.doi.in_(doi))
@@ -84,8 +91,16 @@ async def get_entrypoints(
     if year:
         stmt = stmt.where(Entrypoint.year == year)
 
-    result = await db.scalars(stmt.limit(limit))
-    return result.all()
+    try:
+        stmt = paginate_by_id(stmt, Entrypoint.id, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    result = await db.scalars(stmt)
+    entrypoints = result.all()
+    if next_cursor := next_id_cursor(entrypoints, limit):
+        response.headers["X-Next-Cursor"] = next_cursor
+    return entrypoints
 
 
 @router.delete("/{doi:path}", status_code=status.HTTP_200_OK)
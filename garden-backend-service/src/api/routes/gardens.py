@@ -1,15 +1,22 @@
+import asyncio
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import func, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import desc, select
 from sqlalchemy.dialects.postgresql import array
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.sql.selectable import Select
 from structlog import get_logger
 
 from src.api.dependencies.auth import authed_user
-from src.api.dependencies.database import get_db_session
+from src.api.dependencies.database import (
+    get_db_session,
+    get_readonly_db_session,
+    readonly_db_session,
+)
 from src.api.routes._utils import (
     archive_on_datacite,
     assert_deletable_by_user,
@@ -22,9 +29,24 @@ from src.api.schemas.garden import (
     GardenPatchRequest,
     GardenSearchRequest,
     GardenSearchResponse,
+    GardenSuggestion,
+)
+from src.api.search.cache import SearchResultCache, get_search_generation
+from src.api.search.pagination import (
+    decode_cursor,
+    encode_cursor,
+    next_id_cursor,
+    paginate_by_id,
+)
+from src.api.search.utils import (
+    apply_filters,
+    apply_search,
+    search_with_facets,
+    sort_order,
+    suggest,
 )
-from src.api.search.utils import apply_filters, calculate_facets, sort_results
 from src.config import Settings, get_settings
+from src.metrics import CACHE_REQUESTS
 from src.models import Entrypoint, Garden, ModalFunction, User
 
 logger = get_logger(__name__)
@@ -51,9 +73,16 @@ async def search_gardens(
     tags: Annotated[list[str] | None, Query()] = None,
     year: Annotated[str | None, Query()] = None,
     limit: Annotated[int | None, Query(le=100)] = 50,
-    db: AsyncSession = Depends(get_db_session),
+    cursor: Annotated[str | None, Query()] = None,
+    *,
+    response: Response,
+    db: AsyncSession = Depends(get_readonly_db_session),
 ):
-    """Fetch multiple gardens according to query parameters"""
+    """Fetch multiple gardens according to query parameters
+
+    If there may be more results, the response's X-Next-Cursor header holds a
+    `cursor` to fetch the next page with.
+    """
     stmt = select(Garden)
 
     if doi is not None:
@@ -77,8 +106,16 @@ async def search_gardens(
     if year is not None:
         stmt = stmt.where(Garden.year == year)
 
-    result = await db.scalars(stmt.limit(limit))
-    return result.all()
+    try:
+        stmt = paginate_by_id(stmt, Garden.id, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    result = await db.scalars(stmt)
+    gardens = result.all()
+    if next_cursor := next_id_cursor(gardens, limit):
+        response.headers["X-Next-Cursor"] = next_cursor
+    return gardens
 
 
 @router.post(
@@ -88,8 +125,48 @@ async def search_gardens(
 )
 async def search(
     search_request: GardenSearchRequest,
-    db: AsyncSession = Depends(get_db_session),
+    request: Request,
 ) -> GardenSearchResponse:
+    """Search gardens, serving repeated searches from the search result cache.
+
+    Send `Cache-Control: no-cache` to skip the cache. The X-Search-Cache
+    response header says whether the result was a cache hit, miss or bypass.
+    """
+    query = _search_query(search_request)
+    cache: SearchResultCache | None = request.app.state.search_cache
+    if cache is None:
+        async with readonly_db_session(request) as db:
+            return await _search(search_request, query, db)
+
+    key = cache.key(search_request)
+    bypass = "no-cache" in request.headers.get("Cache-Control", "")
+    async with readonly_db_session(request) as db:
+        # writes from any worker bump the generation, making older results stale
+        generation = await get_search_generation(db)
+        if not bypass and (cached := cache.get(key, generation)) is not None:
+            return _search_response(cached, "hit")
+        result = await _search(search_request, query, db)
+    body = result.model_dump_json()
+    cache.set(key, body.encode(), generation)
+    return _search_response(body, "bypass" if bypass else "miss")
+
+
+def _search_response(body: str | bytes, cache_status: str) -> Response:
+    CACHE_REQUESTS.labels(cache="search", result=cache_status).inc()
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"X-Search-Cache": cache_status},
+    )
+
+
+def _search_query(
+    search_request: GardenSearchRequest,
+) -> tuple[Select, list[ColumnElement], str]:
+    """Build the search statement, its ordering and the name of that ordering.
+
+    Raises a 400 for invalid filters or sorts, before anything touches the database.
+    """
     stmt = select(Garden)
 
     # Apply filters to query
@@ -98,43 +175,81 @@ async def search(
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    # Do a ranked full-text search
+    # sorted_by names the ordering in cursors, so they can't be reused across orderings
+    order_by, sorted_by = [], "id"
+    if search_request.sort:
+        try:
+            order_by.append(sort_order(Garden, search_request.sort))
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        sorted_by = f"{search_request.sort.field_name}:{search_request.sort.order}"
+
+    # Do a ranked full-text search, best matches first unless sorted otherwise
     if search_query := search_request.q:
-        search_func = func.search_gardens(search_query).table_valued(
-            "garden_id", "rank"
-        )
-        stmt = stmt.join(search_func, search_func.c.garden_id == Garden.id).order_by(
-            search_func.c.rank
-        )
+        stmt, rank = apply_search(Garden, stmt, search_query)
+        if not search_request.sort:
+            order_by.append(desc(rank))
+            sorted_by = "rank"
 
-    # Calculate facets after applying the filters and searching
-    facets = await calculate_facets(db, stmt)
+    # tie-break on id so pages are stable
+    order_by.append(Garden.id)
+    return stmt, order_by, sorted_by
 
-    # Get totals for offset/pagination
-    total_count_stmt = select(func.count()).select_from(stmt.subquery())
-    total_count = await db.scalar(total_count_stmt)
 
-    stmt = stmt.limit(search_request.limit).offset(search_request.offset)
+async def _search(
+    search_request: GardenSearchRequest,
+    query: tuple[Select, list[ColumnElement], str],
+    db: AsyncSession,
+) -> GardenSearchResponse:
+    stmt, order_by, sorted_by = query
 
-    if search_request.sort:
-        try:
-            stmt = sort_results(Garden, stmt, search_request.sort)
-        except ValueError as e:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    # Fetch the page of results along with the facets and totals
+    try:
+        after = None
+        if search_request.cursor:
+            after = decode_cursor(search_request.cursor, sorted_by)
+        page = await search_with_facets(
+            db,
+            Garden,
+            stmt,
+            order_by,
+            limit=search_request.limit,
+            offset=search_request.offset,
+            after=after,
+            facet_sizes=search_request.facets,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    # Run the search query
-    result = await db.scalars(stmt)
-    gardens = result.all()
+    next_cursor = None
+    if page.next_keys is not None:
+        next_cursor = encode_cursor(sorted_by, page.next_keys)
 
     return GardenSearchResponse(
-        count=len(gardens),
-        total=total_count,
-        offset=search_request.offset,
-        garden_meta=gardens,
-        facets=facets,
+        count=len(page.results),
+        total=page.total,
+        offset=page.offset,
+        garden_meta=page.results,
+        facets=page.facets,
+        next_cursor=next_cursor,
     )
 
 
+# declared before "/{doi:path}", which would otherwise match "/suggest"
+@router.get("/suggest", response_model=list[GardenSuggestion])
+async def suggest_gardens(
+    prefix: Annotated[str, Query(min_length=1, max_length=100)],
+    limit: Annotated[int, Query(ge=1, le=50)] = 10,
+    db: AsyncSession = Depends(get_readonly_db_session),
+):
+    """Suggest garden titles, tags, authors and contributors starting with `prefix`.
+
+    Meant for type-ahead: each suggestion comes with the number of gardens it
+    appears in, most common first.
+    """
+    return await suggest(db, prefix, limit)
+
+
 @router.get(
     "/{doi:path}",
     status_code=status.HTTP_200_OK,
@@ -295,12 +410,10 @@ async def update_garden(
 
 
 async def _collect_entrypoints(dois: list[str], db: AsyncSession) -> list[Entrypoint]:
-    stmt = select(Entrypoint).where(Entrypoint.doi.in_(dois))
-    result = await db.execute(stmt)
-    entrypoints: list[Entrypoint] = result.scalars().all()
+    entrypoints = await Entrypoint.load_many(db, "doi", dois)
 
-    if len(entrypoints) != len(dois):
-        missing_dois = [ep.doi for ep in entrypoints if ep.doi not in dois]
+    missing_dois = [doi for doi, ep in zip(dois, entrypoints) if ep is None]
+    if missing_dois:
         raise HTTPException(
             status_code=404,
             detail=f"Could not find entrypoint(s) with DOIs: {missing_dois}",
@@ -311,12 +424,10 @@ async def _collect_entrypoints(dois: list[str], db: AsyncSession) -> list[Entryp
 async def _collect_modal_functions(
     ids: list[int], db: AsyncSession
 ) -> list[ModalFunction]:
-    stmt = select(ModalFunction).where(ModalFunction.id.in_(ids))
-    result = await db.execute(stmt)
-    modal_functions: list[ModalFunction] = result.scalars().all()
+    modal_functions = await ModalFunction.load_many(db, "id", ids)
 
-    if len(modal_functions) != len(ids):
-        missing_ids = [mf.id for mf in modal_functions if mf.id not in ids]
+    missing_ids = [id for id, mf in zip(ids, modal_functions) if mf is None]
+    if missing_ids:
         raise HTTPException(
             status_code=404,
             detail=f"Could not find modal function(s) with IDs: {missing_ids}",
@@ -324,28 +435,45 @@ async def _collect_modal_functions(
     return modal_functions
 
 
+async def _get_draft_status(garden_data: GardenCreateRequest) -> bool:
+    """Use the requested draft status, or check with the real world (doi.org) if not specified."""
+    if garden_data.doi_is_draft is not None:
+        return garden_data.doi_is_draft
+    registered = await is_doi_registered(garden_data.doi)
+    return not registered
+
+
+async def _get_explicit_owner(
+    owner_identity_id: UUID | None, db: AsyncSession
+) -> User | None:
+    if owner_identity_id is None:
+        return None
+    return await User.load(db, "identity_id", owner_identity_id)
+
+
 async def _create_new_garden(
     garden_data: GardenCreateRequest,
     db: AsyncSession,
     user: User,
 ):
     log = logger.bind(doi=garden_data.doi)
-    # if not specified, check draft status with the real world (doi.org)
-    if garden_data.doi_is_draft is None:
-        registered = await is_doi_registered(garden_data.doi)
-        garden_data.doi_is_draft = not registered
-
-    # collect entrypoints by DOI
-    entrypoints = await _collect_entrypoints(garden_data.entrypoint_ids, db)
-    # collect modal functions by ID
-    modal_functions = await _collect_modal_functions(garden_data.modal_function_ids, db)
+    # check draft status, collect entrypoints by DOI, modal functions by ID and
+    # any explicit owner concurrently; the db lookups are batched by the session
+    (
+        garden_data.doi_is_draft,
+        entrypoints,
+        modal_functions,
+        explicit_owner,
+    ) = await asyncio.gather(
+        _get_draft_status(garden_data),
+        _collect_entrypoints(garden_data.entrypoint_ids, db),
+        _collect_modal_functions(garden_data.modal_function_ids, db),
+        _get_explicit_owner(garden_data.owner_identity_id, db),
+    )
 
     # default owner is authed_user unless owner_identity_id is explicitly provided
     owner: User = user
     if garden_data.owner_identity_id is not None:
-        explicit_owner: User | None = await User.get(
-            db, identity_id=garden_data.owner_identity_id
-        )
         if explicit_owner is not None:
             log.info(
                 "Assigned garden ownership to other user",
@@ -5,10 +5,11 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from structlog import get_logger
 
-from src.api.dependencies.database import get_db_session
+from src.api.dependencies.database import get_readonly_db_session
 from src.api.schemas.mdf.dataset import AccelerateDatasetMetadata, MDFSearchResponse
 from src.api.schemas.search.globus_search import GSearchRequestBody
 from src.config import Settings, get_settings
+from src.middleware.timing import external_call
 from src.models import Dataset
 
 logger = get_logger(__name__)
@@ -22,7 +23,7 @@ router = APIRouter(prefix="/mdf")
 )
 async def search_datasets(
     request: GSearchRequestBody,
-    db: AsyncSession = Depends(get_db_session),
+    db: AsyncSession = Depends(get_readonly_db_session),
     settings: Settings = Depends(get_settings),
 ) -> MDFSearchResponse:
     """
@@ -40,11 +41,11 @@ async def search_datasets(
     if response.status_code == 200:
         result = MDFSearchResponse(**response.json())
 
-        for gmeta in result.gmeta:
-            versioned_source_id = gmeta.root.subject
-            dataset: Dataset | None = await Dataset.get(
-                db, versioned_source_id=versioned_source_id
-            )
+        # look up all the datasets in one query rather than one per result
+        datasets = await Dataset.load_many(
+            db, "versioned_source_id", [gmeta.root.subject for gmeta in result.gmeta]
+        )
+        for gmeta, dataset in zip(result.gmeta, datasets):
             if dataset:
                 gmeta.root.accelerate_metadata = AccelerateDatasetMetadata(
                     **dataset.get_accelerate_metadata()
@@ -61,9 +62,10 @@ async def search_datasets(
 
 async def _query_search(query: Dict[str, Any], settings: Settings) -> httpx.Response:
     async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"https://search.api.globus.org/v1/index/{settings.MDF_SEARCH_INDEX_UUID}/search",
-            json=query,
-            headers={"Content-Type": "application/json"},
-        )
+        with external_call("globus_search", "search"):
+            response = await client.post(
+                f"https://search.api.globus.org/v1/index/{settings.MDF_SEARCH_INDEX_UUID}/search",
+                json=query,
+                headers={"Content-Type": "application/json"},
+            )
     return response
@@ -1,24 +1,37 @@
+import asyncio
 import time
+from typing import AsyncIterator
 
+import anyio
 import modal
 import structlog
-from fastapi import APIRouter, Depends, HTTPException, status
+from cachetools import TTLCache
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from grpclib import GRPCError, Status
+from modal._utils.function_utils import ATTEMPT_TIMEOUT_GRACE_PERIOD, OUTPUTS_TIMEOUT
 from modal._utils.grpc_utils import retry_transient_errors
+from modal.parallel_map import MAP_INVOCATION_CHUNK_SIZE
 from modal_proto import api_pb2
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from src.api.dependencies.auth import authed_user, modal_vip, under_modal_usage_limit
 from src.api.dependencies.database import get_db_session
-from src.api.dependencies.modal import get_modal_client
+from src.api.dependencies.modal import get_modal_client, lookup_modal_function
 from src.api.schemas.modal.invocations import (
+    ModalBatchInvocationOutput,
+    ModalBatchInvocationRequest,
     ModalInvocationRequest,
     ModalInvocationResponse,
+    ModalInvocationSpawnResponse,
 )
 from src.config import Settings, get_settings
+from src.middleware.timing import external_call
 from src.models.modal.invocations import ModalInvocation
 from src.models.modal.modal_function import ModalFunction
 from src.models.user import User
-from src.usage import estimate_usage
+from src.usage import add_monthly_usage, estimate_usage
 
 logger = structlog.get_logger(__name__)
 
@@ -27,6 +40,7 @@ router = APIRouter(prefix="/modal-invocations")
 
 @router.post("", response_model=ModalInvocationResponse)
 async def invoke_modal_fn(
+    request: Request,
     body: ModalInvocationRequest,
     user: User = Depends(authed_user),
     settings: Settings = Depends(get_settings),
@@ -45,26 +59,13 @@ async def invoke_modal_fn(
     # In this route we want to mimic their logic as closely as possible modulo (de-)serialization, with those steps performed on the user's machine
     # (like it would if they were using modal directly).
     #
-    # fetch function from db
-    modal_fn: ModalFunction | None = await ModalFunction.get(db, id=body.function_id)
-    if modal_fn is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"No Modal Function with id {body.function_id} found.",
-        )
-
-    app_name = modal_fn.modal_app.app_name
-    function_name = modal_fn.function_name
-    log = logger.bind(app_name=app_name, function_name=function_name)
-
-    # fetch the function from modal
-    log.info("fetching function object from modal")
-    function = await modal.functions._Function.lookup(
-        app_name=modal_fn.modal_app.app_name,
-        tag=modal_fn.function_name,
-        environment_name=settings.MODAL_ENV,
-        client=modal_client,
+    modal_fn = await _get_modal_function(db, body.function_id)
+    log = logger.bind(
+        app_name=modal_fn.modal_app.app_name, function_name=modal_fn.function_name
     )
+    function = await _lookup_function(request, modal_fn, settings, modal_client)
+    # give the db connection back to the pool while the function runs
+    await db.commit()
 
     # create the _Invocation object
     log.info("Requesting invocation with modal")
@@ -73,9 +74,10 @@ async def invoke_modal_fn(
         function, body.args_kwargs_serialized, modal_client
     )
 
-    outputs_response = await invocation.pop_function_call_outputs(
-        timeout=None, clear_on_success=True
-    )
+    with external_call("modal", "FunctionGetOutputs"):
+        outputs_response = await invocation.pop_function_call_outputs(
+            timeout=None, clear_on_success=True
+        )
     execution_time_seconds = time.time() - invocation_time
     log.debug("received modal RPC response", outputs_response=outputs_response)
 
@@ -92,6 +94,7 @@ async def invoke_modal_fn(
             estimated_usage=usage,
         )
     )
+    await add_monthly_usage(db, user.id, usage)
     await db.commit()
 
     if not outputs_response.outputs:
@@ -107,6 +110,195 @@ async def invoke_modal_fn(
     return output
 
 
+@router.post("/spawn", response_model=ModalInvocationSpawnResponse)
+async def spawn_modal_fn(
+    request: Request,
+    body: ModalInvocationRequest,
+    user: User = Depends(authed_user),
+    settings: Settings = Depends(get_settings),
+    modal_client: modal.Client = Depends(get_modal_client),
+    modal_vip: bool = Depends(modal_vip),
+    under_modal_usage_limit: bool = Depends(under_modal_usage_limit),
+    db: AsyncSession = Depends(get_db_session),
+):
+    """Start a function call and return its ID without waiting for it to finish.
+
+    Collect the result with `GET /modal-invocations/{function_call_id}`. The call
+    is billed for MODAL_SPAWN_RESERVED_SECS up front, so it counts towards the
+    usage limit straight away, and that's settled to its actual usage once the
+    result is collected. Calls whose result is never collected keep the reservation.
+    """
+    if not settings.MODAL_ENABLED:
+        raise NotImplementedError("Garden's Modal integration has not been enabled")
+
+    modal_fn = await _get_modal_function(db, body.function_id)
+    log = logger.bind(
+        app_name=modal_fn.modal_app.app_name, function_name=modal_fn.function_name
+    )
+    function = await _lookup_function(request, modal_fn, settings, modal_client)
+
+    log.info("Requesting spawned invocation with modal")
+    invocation = await _create_invocation(
+        function,
+        body.args_kwargs_serialized,
+        modal_client,
+        invocation_type=api_pb2.FUNCTION_CALL_INVOCATION_TYPE_ASYNC_LEGACY,
+    )
+
+    # reserve usage now, it's settled once the result is collected
+    reserved_usage = estimate_usage(modal_fn, settings.MODAL_SPAWN_RESERVED_SECS)
+    db.add(
+        ModalInvocation(
+            user_id=user.id,
+            function_id=modal_fn.id,
+            function_call_id=invocation.function_call_id,
+            estimated_usage=reserved_usage,
+        )
+    )
+    await add_monthly_usage(db, user.id, reserved_usage)
+    await db.commit()
+    log.info("Spawned modal function", function_call_id=invocation.function_call_id)
+    return ModalInvocationSpawnResponse(function_call_id=invocation.function_call_id)
+
+
+@router.get(
+    "/{function_call_id}",
+    response_model=ModalInvocationResponse,
+    responses={
+        status.HTTP_202_ACCEPTED: {
+            "model": ModalInvocationSpawnResponse,
+            "description": "The function call hasn't finished yet, poll again",
+        }
+    },
+)
+async def get_modal_invocation_result(
+    function_call_id: str,
+    timeout: float | None = Query(
+        default=None,
+        ge=0,
+        description="Seconds to wait for the result (capped by the server)",
+    ),
+    user: User = Depends(authed_user),
+    settings: Settings = Depends(get_settings),
+    modal_client: modal.Client = Depends(get_modal_client),
+    modal_vip: bool = Depends(modal_vip),
+    db: AsyncSession = Depends(get_db_session),
+):
+    """Wait (up to `timeout` seconds) for the result of a spawned function call.
+
+    Responds 202 if the call is still running. The result can be fetched again
+    until Modal expires it.
+    """
+    invocation_record: ModalInvocation | None = await ModalInvocation.get(
+        db, function_call_id=function_call_id, user_id=user.id
+    )
+    if invocation_record is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No Modal invocation with function call id {function_call_id} found.",
+        )
+    if invocation_record.num_inputs is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{function_call_id} is a map call, its outputs were streamed when it was made.",
+        )
+    log = logger.bind(function_call_id=function_call_id)
+
+    if timeout is None or timeout > settings.MODAL_POLL_TIMEOUT_SECS:
+        timeout = settings.MODAL_POLL_TIMEOUT_SECS
+    # give the db connection back to the pool while we wait
+    await db.commit()
+
+    invocation = modal.functions._Invocation(
+        modal_client.stub, function_call_id, modal_client
+    )
+    with external_call("modal", "FunctionGetOutputs"):
+        outputs_response = await invocation.pop_function_call_outputs(
+            timeout=timeout, clear_on_success=False
+        )
+    if not outputs_response.outputs:
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=ModalInvocationSpawnResponse(
+                function_call_id=function_call_id
+            ).model_dump(),
+        )
+
+    output: api_pb2.FunctionGetOutputsItem = outputs_response.outputs[0]
+    if invocation_record.execution_time_seconds is None:
+        await _record_spawned_usage(db, invocation_record, output)
+        log.info("Collected spawned modal function result")
+    return output
+
+
+@router.post(
+    "/map",
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "content": {"application/x-ndjson": {}},
+            "description": "One ModalBatchInvocationOutput per line",
+        }
+    },
+)
+async def map_modal_fn(
+    request: Request,
+    body: ModalBatchInvocationRequest,
+    user: User = Depends(authed_user),
+    settings: Settings = Depends(get_settings),
+    modal_client: modal.Client = Depends(get_modal_client),
+    modal_vip: bool = Depends(modal_vip),
+    under_modal_usage_limit: bool = Depends(under_modal_usage_limit),
+    db: AsyncSession = Depends(get_db_session),
+):
+    """Call a function once per input as a single Modal map call.
+
+    Outputs are streamed back as newline-delimited JSON, in input order or (with
+    `order_outputs=false`) as soon as each one finishes. Each line carries the
+    `idx` of its input. Usage is recorded for every collected output once the
+    stream ends.
+    """
+    if not settings.MODAL_ENABLED:
+        raise NotImplementedError("Garden's Modal integration has not been enabled")
+
+    modal_fn = await _get_modal_function(db, body.function_id)
+    log = logger.bind(
+        app_name=modal_fn.modal_app.app_name,
+        function_name=modal_fn.function_name,
+        num_inputs=len(body.args_kwargs_serialized),
+    )
+    function = await _lookup_function(request, modal_fn, settings, modal_client)
+    # the stream records usage with its own session, so this one isn't held open
+    await db.commit()
+
+    log.info("Requesting map invocation with modal")
+    inputs = [
+        _input_item(args_kwargs_serialized, idx)
+        for idx, args_kwargs_serialized in enumerate(body.args_kwargs_serialized)
+    ]
+    submitted_at = time.time()
+    function_call_id, remaining_inputs = await _create_map_invocation(
+        function, inputs, modal_client
+    )
+    log.info("Started modal map call", function_call_id=function_call_id)
+    return StreamingResponse(
+        _stream_map_outputs(
+            request.app.state.db_session_maker,
+            request.app.state.monthly_usage_cache,
+            user.id,
+            modal_fn,
+            function._invocation_function_id(),
+            function_call_id,
+            remaining_inputs,
+            num_inputs=len(inputs),
+            order_outputs=body.order_outputs,
+            submitted_at=submitted_at,
+            client=modal_client,
+        ),
+        media_type="application/x-ndjson",
+    )
+
+
 async def _create_invocation(
     function: modal.Function,
     args_kwargs_serialized: bytes,
@@ -115,14 +307,7 @@ async def _create_invocation(
 ) -> modal.functions._Invocation:
     function_id = function._invocation_function_id()
     # build the input payload with pre-serialized args
-    inputs_item = api_pb2.FunctionPutInputsItem(
-        input=api_pb2.FunctionInput(
-            args=args_kwargs_serialized,
-            data_format=api_pb2.DATA_FORMAT_PICKLE,
-            method_name="",
-        ),
-        idx=0,
-    )
+    inputs_item = _input_item(args_kwargs_serialized, idx=0)
 
     map_request = api_pb2.FunctionMapRequest(
         function_id=function_id,
@@ -135,7 +320,10 @@ async def _create_invocation(
 
     logger.debug("sending FunctionMap request", map_request=map_request)
     # First request is necessary to get the function_call_id
-    map_response = await retry_transient_errors(client.stub.FunctionMap, map_request)
+    with external_call("modal", "FunctionMap"):
+        map_response = await retry_transient_errors(
+            client.stub.FunctionMap, map_request
+        )
     function_call_id = map_response.function_call_id
     logger.debug("received FunctionMap RPC response", map_response=map_response)
 
@@ -146,12 +334,317 @@ async def _create_invocation(
     inputs_request = api_pb2.FunctionPutInputsRequest(
         function_id=function_id, inputs=[inputs_item], function_call_id=function_call_id
     )
-    inputs_response = await retry_transient_errors(
-        client.stub.FunctionPutInputs, inputs_request
-    )
+    with external_call("modal", "FunctionPutInputs"):
+        inputs_response = await retry_transient_errors(
+            client.stub.FunctionPutInputs, inputs_request
+        )
     processed_inputs = inputs_response.inputs
     if not processed_inputs:
         raise Exception(
             "Could not create function call - the input queue seems to be full"
         )
     return modal.functions._Invocation(client.stub, function_call_id, client)
+
+
+async def _get_modal_function(db: AsyncSession, function_id: int) -> ModalFunction:
+    modal_fn: ModalFunction | None = await ModalFunction.get(db, id=function_id)
+    if modal_fn is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No Modal Function with id {function_id} found.",
+        )
+    return modal_fn
+
+
+async def _lookup_function(
+    request: Request,
+    modal_fn: ModalFunction,
+    settings: Settings,
+    modal_client: modal.Client,
+) -> modal.Function:
+    logger.info(
+        "fetching function object from modal",
+        app_name=modal_fn.modal_app.app_name,
+        function_name=modal_fn.function_name,
+    )
+    return await lookup_modal_function(
+        request,
+        modal_fn.modal_app.app_name,
+        modal_fn.function_name,
+        settings.MODAL_ENV,
+        modal_client,
+    )
+
+
+async def _record_spawned_usage(
+    db: AsyncSession,
+    invocation_record: ModalInvocation,
+    output: api_pb2.FunctionGetOutputsItem,
+) -> None:
+    """Settle the usage of a spawned call, unless someone else collected it first."""
+    if output.input_started_at and output.output_created_at:
+        execution_time_seconds = output.output_created_at - output.input_started_at
+    else:
+        # modal didn't time the call, so count from when it was spawned. date_invoked
+        # is a naive timestamp from the database's clock, so ask the database
+        execution_time_seconds = float(
+            await db.scalar(
+                select(
+                    func.extract(
+                        "epoch", func.localtimestamp() - ModalInvocation.date_invoked
+                    )
+                ).where(ModalInvocation.id == invocation_record.id)
+            )
+        )
+
+    modal_fn = await _get_modal_function(db, invocation_record.function_id)
+    usage = estimate_usage(modal_fn, execution_time_seconds)
+    # read before the update, which syncs the new values onto invocation_record
+    reserved_usage = invocation_record.estimated_usage or 0.0
+    result = await db.execute(
+        update(ModalInvocation)
+        .where(
+            ModalInvocation.id == invocation_record.id,
+            ModalInvocation.execution_time_seconds.is_(None),
+        )
+        .values(
+            execution_time_seconds=execution_time_seconds,
+            estimated_usage=usage,
+        )
+    )
+    if result.rowcount:
+        # swap the reservation for the actual usage, in the month the call was spawned
+        await add_monthly_usage(
+            db,
+            invocation_record.user_id,
+            usage - reserved_usage,
+            month=invocation_record.date_invoked.date().replace(day=1),
+        )
+    await db.commit()
+
+
+def _input_item(
+    args_kwargs_serialized: bytes, idx: int
+) -> api_pb2.FunctionPutInputsItem:
+    return api_pb2.FunctionPutInputsItem(
+        input=api_pb2.FunctionInput(
+            args=args_kwargs_serialized,
+            data_format=api_pb2.DATA_FORMAT_PICKLE,
+            method_name="",
+        ),
+        idx=idx,
+    )
+
+
+async def _create_map_invocation(
+    function: modal.Function,
+    inputs: list[api_pb2.FunctionPutInputsItem],
+    client: modal.Client,
+) -> tuple[str, list[api_pb2.FunctionPutInputsItem]]:
+    """Start a map call, sending the first chunk of inputs along with it.
+
+    Inputs are chunked the same way as by modal's own `Function.map`.
+
+    Returns the call's ID and the inputs that still need to be put.
+    """
+    first_chunk = inputs[:MAP_INVOCATION_CHUNK_SIZE]
+    map_request = api_pb2.FunctionMapRequest(
+        function_id=function._invocation_function_id(),
+        parent_input_id="",
+        function_call_type=api_pb2.FUNCTION_CALL_TYPE_MAP,
+        pipelined_inputs=first_chunk,
+    )
+    with external_call("modal", "FunctionMap"):
+        map_response = await retry_transient_errors(
+            client.stub.FunctionMap, map_request
+        )
+    if map_response.pipelined_inputs:
+        return map_response.function_call_id, inputs[len(first_chunk) :]
+    return map_response.function_call_id, inputs
+
+
+async def _put_map_inputs(
+    function_id: str,
+    function_call_id: str,
+    inputs: list[api_pb2.FunctionPutInputsItem],
+    client: modal.Client,
+) -> None:
+    """Put a map call's inputs in chunks, waiting whenever Modal's input queue is full."""
+    for start in range(0, len(inputs), MAP_INVOCATION_CHUNK_SIZE):
+        request = api_pb2.FunctionPutInputsRequest(
+            function_id=function_id,
+            function_call_id=function_call_id,
+            inputs=inputs[start : start + MAP_INVOCATION_CHUNK_SIZE],
+        )
+        while True:
+            try:
+                with external_call("modal", "FunctionPutInputs"):
+                    await retry_transient_errors(
+                        client.stub.FunctionPutInputs,
+                        request,
+                        max_retries=8,
+                        max_delay=15,
+                        additional_status_codes=[Status.RESOURCE_EXHAUSTED],
+                    )
+                break
+            except GRPCError as e:
+                if e.status != Status.RESOURCE_EXHAUSTED:
+                    raise
+                logger.warning(
+                    "Modal map call is backlogged, still waiting to put inputs",
+                    function_call_id=function_call_id,
+                )
+
+
+async def _stream_map_outputs(
+    db_session_maker: async_sessionmaker[AsyncSession],
+    monthly_usage_cache: TTLCache | None,
+    user_id: int,
+    modal_fn: ModalFunction,
+    function_id: str,
+    function_call_id: str,
+    remaining_inputs: list[api_pb2.FunctionPutInputsItem],
+    num_inputs: int,
+    order_outputs: bool,
+    submitted_at: float,
+    client: modal.Client,
+) -> AsyncIterator[str]:
+    """Put the rest of a map call's inputs while streaming its outputs as JSON lines.
+
+    If the stream stops early (e.g. the client disconnects), the unfinished inputs
+    are cancelled. Either way, usage is recorded for every output collected.
+    """
+    log = logger.bind(function_call_id=function_call_id)
+    pump = asyncio.create_task(
+        _put_map_inputs(function_id, function_call_id, remaining_inputs, client)
+    )
+    execution_times: dict[int, float] = {}
+    # outputs that finished ahead of an earlier input, when streaming in order
+    held: dict[int, api_pb2.FunctionGetOutputsItem] = {}
+    next_idx = 0
+    last_entry_id = "0-0"
+    try:
+        while len(execution_times) < num_inputs:
+            if pump.done():
+                # surface errors putting inputs, rather than waiting on outputs that won't come
+                pump.result()
+            request = api_pb2.FunctionGetOutputsRequest(
+                function_call_id=function_call_id,
+                timeout=OUTPUTS_TIMEOUT,
+                last_entry_id=last_entry_id,
+                clear_on_success=False,
+                requested_at=time.time(),
+            )
+            with external_call("modal", "FunctionGetOutputs"):
+                response = await retry_transient_errors(
+                    client.stub.FunctionGetOutputs,
+                    request,
+                    max_retries=20,
+                    attempt_timeout=OUTPUTS_TIMEOUT + ATTEMPT_TIMEOUT_GRACE_PERIOD,
+                )
+            if not response.outputs:
+                continue
+            last_entry_id = response.last_entry_id
+
+            for item in response.outputs:
+                # outputs can be delivered more than once
+                if item.idx in execution_times:
+                    continue
+                execution_times[item.idx] = _execution_time(item, submitted_at)
+                if order_outputs:
+                    held[item.idx] = item
+                else:
+                    yield _output_line(item)
+            while next_idx in held:
+                yield _output_line(held.pop(next_idx))
+                next_idx += 1
+    finally:
+        pump.cancel()
+        # finish up even if the stream was cancelled by the client disconnecting
+        with anyio.CancelScope(shield=True):
+            await _finish_map_call(
+                function_call_id, len(execution_times) < num_inputs, client, log
+            )
+            await _record_map_usage(
+                db_session_maker,
+                monthly_usage_cache,
+                user_id,
+                modal_fn,
+                function_call_id,
+                list(execution_times.values()),
+            )
+        log.info(
+            "Finished modal map call",
+            num_inputs=num_inputs,
+            num_outputs=len(execution_times),
+        )
+
+
+async def _finish_map_call(
+    function_call_id: str, cancel: bool, client: modal.Client, log
+) -> None:
+    """Let Modal clear a map call's outputs, cancelling its unfinished inputs first if asked."""
+    try:
+        if cancel:
+            with external_call("modal", "FunctionCallCancel"):
+                await retry_transient_errors(
+                    client.stub.FunctionCallCancel,
+                    api_pb2.FunctionCallCancelRequest(
+                        function_call_id=function_call_id
+                    ),
+                )
+        with external_call("modal", "FunctionGetOutputs"):
+            await retry_transient_errors(
+                client.stub.FunctionGetOutputs,
+                api_pb2.FunctionGetOutputsRequest(
+                    function_call_id=function_call_id,
+                    timeout=0,
+                    last_entry_id="0-0",
+                    clear_on_success=True,
+                    requested_at=time.time(),
+                ),
+            )
+    except Exception:
+        log.warning("Failed to clean up modal map call", exc_info=True)
+
+
+async def _record_map_usage(
+    db_session_maker: async_sessionmaker[AsyncSession],
+    monthly_usage_cache: TTLCache | None,
+    user_id: int,
+    modal_fn: ModalFunction,
+    function_call_id: str,
+    execution_times: list[float],
+) -> None:
+    """Record a map call as one ModalInvocation, totalling its collected outputs.
+
+    One row per call keeps `function_call_id` unique to an invocation.
+    """
+    if not execution_times:
+        return
+    usage = sum(estimate_usage(modal_fn, t) for t in execution_times)
+    async with db_session_maker() as db:
+        db.info["monthly_usage_cache"] = monthly_usage_cache
+        await db.execute(
+            insert(ModalInvocation).values(
+                user_id=user_id,
+                function_id=modal_fn.id,
+                function_call_id=function_call_id,
+                execution_time_seconds=sum(execution_times),
+                estimated_usage=usage,
+                num_inputs=len(execution_times),
+            )
+        )
+        await add_monthly_usage(db, user_id, usage)
+        await db.commit()
+
+
+def _execution_time(item: api_pb2.FunctionGetOutputsItem, started: float) -> float:
+    """How long Modal spent on an input, or the time since `started` if it doesn't say."""
+    if item.input_started_at and item.output_created_at:
+        return item.output_created_at - item.input_started_at
+    return time.time() - started
+
+
+def _output_line(item: api_pb2.FunctionGetOutputsItem) -> str:
+    return ModalBatchInvocationOutput.model_validate(item).model_dump_json() + "\n"
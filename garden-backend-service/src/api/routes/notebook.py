@@ -8,6 +8,7 @@ from structlog import get_logger
 from src.api.dependencies.auth import AuthenticationState, authenticated
 from src.api.schemas.notebook import UploadNotebookRequest, UploadNotebookResponse
 from src.config import Settings, get_settings
+from src.middleware.timing import external_call
 
 router = APIRouter(prefix="/notebook")
 logger = get_logger(__name__)
@@ -34,11 +35,12 @@ async def upload_notebook(
     object_path = f"{body.folder}/{body.notebook_name}-{hash}.ipynb"
 
     s3 = boto3.client("s3")
-    s3.put_object(
-        Body=json.dumps(body.notebook_json),
-        Bucket=settings.NOTEBOOKS_S3_BUCKET,
-        Key=object_path,
-    )
+    with external_call("aws_s3", "PutObject"):
+        s3.put_object(
+            Body=json.dumps(body.notebook_json),
+            Bucket=settings.NOTEBOOKS_S3_BUCKET,
+            Key=object_path,
+        )
 
     s3_url = f"https://{settings.NOTEBOOKS_S3_BUCKET}.s3.amazonaws.com/{object_path}"
     return UploadNotebookResponse(notebook_url=s3_url)
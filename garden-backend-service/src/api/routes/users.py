@@ -1,3 +1,4 @@
+import asyncio
 from typing import Any
 from uuid import UUID
 
@@ -8,7 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from structlog import get_logger
 
 from src.api.dependencies.auth import authed_user
-from src.api.dependencies.database import get_db_session
+from src.api.dependencies.database import get_db_session, get_readonly_db_session
 from src.api.schemas.garden import GardenMetadataResponse
 from src.api.schemas.user import UserMetadataResponse, UserUpdateRequest
 from src.models import Garden, User
@@ -71,7 +72,7 @@ async def update_user_info(
 @router.get("/{user_uuid}/saved/gardens", response_model=list[GardenMetadataResponse])
 async def get_saved_gardens(
     user_uuid: UUID,
-    db: AsyncSession = Depends(get_db_session),
+    db: AsyncSession = Depends(get_readonly_db_session),
 ) -> list[GardenMetadataResponse]:
     """Fetch the users list of saved gardens."""
     user: User | None = await User.get(db, identity_id=user_uuid)
@@ -99,15 +100,17 @@ async def save_garden(
     db: AsyncSession = Depends(get_db_session),
 ) -> list[GardenMetadataResponse]:
     """Add a garden to the user's list of saved gardens by doi."""
-    user: User | None = await User.get(db, identity_id=user_uuid)
-    garden: Garden | None = await Garden.get(db, doi=doi)
-
     if user_uuid != authed_user.identity_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Not authorized to save a garden for user {user_uuid}.",
         )
 
+    user, garden = await asyncio.gather(
+        User.load(db, "identity_id", user_uuid),
+        Garden.load(db, "doi", doi),
+    )
+
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -151,8 +154,10 @@ async def remove_saved_garden(
             detail=f"Not authorized to remove a saved garden for user {user_uuid}.",
         )
 
-    user: User | None = await User.get(db, identity_id=user_uuid)
-    garden: Garden | None = await Garden.get(db, doi=doi)
+    user, garden = await asyncio.gather(
+        User.load(db, "identity_id", user_uuid),
+        Garden.load(db, "doi", doi),
+    )
 
     if user is None:
         raise HTTPException(
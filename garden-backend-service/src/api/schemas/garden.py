@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Annotated, Literal, get_args
 from uuid import UUID
 
 from pydantic import AliasPath, Field, computed_field
@@ -65,13 +66,31 @@ class GardenPatchRequest(BaseSchema):
 
 class GardenSearchFilter(BaseSchema):
     field_name: str
+    operator: Literal["match", "eq", "in", "overlap", "contains", "range"] = Field(
+        "match",
+        description="How to compare `values` with the field, see `src.api.search.utils.apply_filters`",
+    )
     values: list[str]
 
 
+GardenSearchFacetName = Literal["tags", "authors", "year"]
+DEFAULT_FACET_SIZE = 50
+
+
 class GardenSearchFacets(BaseSchema):
     tags: dict[str, int] = Field(default_factory=dict)
     authors: dict[str, int] = Field(default_factory=dict)
     year: dict[str, int] = Field(default_factory=dict)
+    other: dict[GardenSearchFacetName, int] = Field(
+        default_factory=dict,
+        description="For each facet, the total count of the values left out by its size limit",
+    )
+
+
+class GardenSuggestion(BaseSchema):
+    term: str
+    field: str
+    count: int = Field(description="Number of gardens with this term")
 
 
 class GardenSearchSort(BaseSchema):
@@ -85,8 +104,22 @@ class GardenSearchRequest(BaseSchema):
     offset: int = Field(
         0, ge=0, description="Offset for pagination (number of results to skip)"
     )
+    cursor: str | None = Field(
+        None,
+        description="`next_cursor` from the previous page of results. Takes precedence over `offset`.",
+    )
     filters: list[GardenSearchFilter] = Field(default_factory=list)
     sort: GardenSearchSort | None = None
+    facets: dict[GardenSearchFacetName, Annotated[int, Field(ge=1, le=1000)]] = Field(
+        default_factory=lambda: dict.fromkeys(
+            get_args(GardenSearchFacetName), DEFAULT_FACET_SIZE
+        ),
+        description=(
+            "The facets to calculate, each mapped to how many of its most common values "
+            f"to return. Defaults to every facet, up to {DEFAULT_FACET_SIZE} values each. "
+            "Send {} to skip facets."
+        ),
+    )
 
 
 class GardenSearchResponse(BaseSchema):
@@ -95,3 +128,4 @@ class GardenSearchResponse(BaseSchema):
     offset: int
     garden_meta: list[GardenMetadataResponse]
     facets: GardenSearchFacets
+    next_cursor: str | None = None
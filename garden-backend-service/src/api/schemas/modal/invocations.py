@@ -1,3 +1,5 @@
+from pydantic import Field
+
 from ..base import B64Bytes, BaseSchema
 
 
@@ -21,3 +23,19 @@ class ModalInvocationRequest(BaseSchema):
 class ModalInvocationResponse(BaseSchema):
     result: _ModalGenericResult
     data_format: int
+
+
+class ModalInvocationSpawnResponse(BaseSchema):
+    function_call_id: str
+
+
+class ModalBatchInvocationRequest(BaseSchema):
+    function_id: int
+    # one pickled (args, kwargs) per call, in the order the outputs are indexed
+    args_kwargs_serialized: list[B64Bytes] = Field(min_length=1, max_length=10_000)
+    # stream outputs in input order, or as soon as each one finishes
+    order_outputs: bool = True
+
+
+class ModalBatchInvocationOutput(ModalInvocationResponse):
+    idx: int
@@ -0,0 +1,99 @@
+import hashlib
+import json
+
+from cachetools import TTLCache
+from sqlalchemy import Integer, column, select, table
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.api.schemas.garden import GardenSearchRequest
+from src.config import Settings
+from src.metrics import CACHE_ENTRIES, CACHE_MAX_ENTRIES, CACHE_TTL
+
+# maintained by triggers in sql.sql, which bump it on every write to gardens,
+# entrypoints, modal functions or the links between them
+search_generation = table(
+    "search_generation",
+    column("id", Integer),
+    column("generation", Integer),
+)
+
+
+async def get_search_generation(db: AsyncSession) -> int:
+    """Read the current search generation, as of `db`'s view of the database.
+
+    Read it through the same session as the search, before searching, so the
+    results are at least as new as the generation they're cached under.
+    """
+    return await db.scalar(
+        select(search_generation.c.generation).where(search_generation.c.id == 1)
+    )
+
+
+class SearchResultCache:
+    """Per-worker cache of serialized /gardens/search responses.
+
+    Entries are keyed by a normalized hash of the search request, expire after a
+    TTL and are evicted least-recently-used first once the cache is full.
+
+    Each entry is stored with the search generation its result was read at, and
+    only served to requests that read the same generation. Since the generation
+    lives in the database, a write through any worker (or anything else) makes
+    every worker's cached results stale at once.
+    """
+
+    CACHE_NAME = "search"
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # the newest generation this worker has seen
+        self.generation = 0
+        CACHE_MAX_ENTRIES.labels(cache=self.CACHE_NAME).set(maxsize)
+        CACHE_TTL.labels(cache=self.CACHE_NAME).set(ttl)
+
+    @staticmethod
+    def key(search_request: GardenSearchRequest) -> str:
+        """Hash the request, ignoring differences that can't change the results."""
+        request = search_request.model_dump(mode="json")
+        request["q"] = " ".join(request["q"].split())
+        # filters are ANDed together, and their values are sets (except range bounds)
+        request["filters"] = sorted(
+            (
+                f if f["operator"] == "range" else {**f, "values": sorted(f["values"])}
+                for f in request["filters"]
+            ),
+            key=lambda f: (f["field_name"], f["operator"], f["values"]),
+        )
+        normalized = json.dumps(request, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    def get(self, key: str, generation: int) -> bytes | None:
+        """Get the result cached for `key`, if it was read at `generation`."""
+        self.generation = max(self.generation, generation)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != generation:
+            return None
+        return entry[1]
+
+    def set(self, key: str, result: bytes, generation: int) -> None:
+        """Store `result`, read at `generation`.
+
+        Results from behind the newest generation this worker has seen (e.g. read
+        from a lagging replica) aren't stored, so they can't replace newer ones.
+        """
+        if generation < self.generation:
+            return
+        self.generation = generation
+        self._entries[key] = (generation, result)
+        CACHE_ENTRIES.labels(cache=self.CACHE_NAME).set(len(self._entries))
+
+
+def get_search_cache(settings: Settings) -> SearchResultCache | None:
+    """Create the search result cache.
+
+    Returns None when caching is turned off.
+    """
+    if not settings.SEARCH_CACHE_SIZE or not settings.SEARCH_CACHE_TTL_SECS:
+        return None
+    return SearchResultCache(
+        maxsize=settings.SEARCH_CACHE_SIZE, ttl=settings.SEARCH_CACHE_TTL_SECS
+    )
@@ -0,0 +1,128 @@
+import base64
+import binascii
+import json
+from typing import Any, Sequence
+
+from sqlalchemy import and_, false, or_
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import ColumnElement, UnaryExpression
+from sqlalchemy.sql.selectable import Select
+
+SortKey = tuple[ColumnElement, bool]
+
+
+def encode_cursor(sort: str, values: Sequence[Any]) -> str:
+    """Encode the sort keys of the last result on a page as an opaque cursor.
+
+    `sort` names the ordering the values belong to (e.g. "title:asc"), so a
+    cursor can't silently be reused against a different ordering.
+    """
+    payload = json.dumps([sort, *values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> list[Any]:
+    """Decode a cursor made by `encode_cursor` back into its sort key values.
+
+    Raises:
+        ValueError: If the cursor is malformed or was made for a different ordering.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, *values = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort:
+        raise ValueError("Invalid cursor: results are now sorted differently")
+    return values
+
+
+def sort_keys(order_by: Sequence[ColumnElement]) -> list[SortKey]:
+    """Split ORDER BY clauses into (column, descending) pairs."""
+    keys = []
+    for clause in order_by:
+        if isinstance(clause, UnaryExpression) and clause.modifier in (
+            operators.asc_op,
+            operators.desc_op,
+        ):
+            keys.append((clause.element, clause.modifier is operators.desc_op))
+        else:
+            keys.append((clause, False))
+    return keys
+
+
+def keyset_after(keys: Sequence[SortKey], values: Sequence[Any]) -> ColumnElement:
+    """Build a WHERE clause matching rows that sort after `values` in `keys` order.
+
+    This is the lexicographic "(k1, k2, ...) > (v1, v2, ...)" comparison, spelled
+    out so it can mix ascending and descending keys and follows Postgres' default
+    NULL placement (last when ascending, first when descending). When the leading
+    column can't be NULL it's also given a plain range bound, so an index on the
+    sort columns can seek straight to the start of the page.
+
+    Raises:
+        ValueError: If there isn't exactly one value per key, or a value has the
+            wrong type for its column.
+    """
+    if len(keys) != len(values):
+        raise ValueError("Invalid cursor")
+
+    clauses = []
+    equal_so_far = []
+    for (column, descending), value in zip(keys, values):
+        nullable = getattr(column, "nullable", True) is not False
+        _check_type(column, value)
+        if value is None:
+            after = column.is_not(None) if descending else false()
+            equal = column.is_(None)
+        else:
+            after = column < value if descending else column > value
+            if nullable and not descending:
+                after = or_(after, column.is_(None))
+            equal = column == value
+        clauses.append(and_(*equal_so_far, after))
+        equal_so_far.append(equal)
+    stmt = or_(*clauses)
+
+    (column, descending), value = keys[0], values[0]
+    if value is not None and getattr(column, "nullable", True) is False:
+        stmt = and_(column <= value if descending else column >= value, stmt)
+    return stmt
+
+
+def _check_type(column: ColumnElement, value: Any) -> None:
+    # cursors are client supplied, so catch tampered values before the db does
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return
+    if (
+        value is not None
+        and python_type in (int, float, str)
+        and not isinstance(value, python_type)
+    ):
+        raise ValueError("Invalid cursor")
+
+
+def paginate_by_id(
+    stmt: Select, id_column: ColumnElement, cursor: str | None, limit: int | None
+) -> Select:
+    """Order `stmt` by id and start it after `cursor`, as made by `next_id_cursor`.
+
+    The primary key index backs the ordering, so every page costs the same no
+    matter how deep into the results it is.
+
+    Raises:
+        ValueError: If the cursor is invalid.
+    """
+    if cursor is not None:
+        after = decode_cursor(cursor, "id")
+        stmt = stmt.where(keyset_after(sort_keys([id_column]), after))
+    return stmt.order_by(id_column).limit(limit)
+
+
+def next_id_cursor(results: Sequence[Any], limit: int | None) -> str | None:
+    """Cursor for the page after `results`, or None if this was the last page."""
+    if not limit or len(results) < limit:
+        return None
+    return encode_cursor("id", [results[-1].id])
@@ -1,72 +1,46 @@
-CREATE OR REPLACE FUNCTION search_gardens(search_query text)
-RETURNS TABLE(garden_id int, rank real)
-AS
-    $$
-DECLARE
-    query tsquery := websearch_to_tsquery(search_query);
+-- The search documents used to be materialized views, refreshed in full by
+-- statement-level triggers on every write. They are now plain tables kept
+-- current row by row, so drop the old views and triggers if they're still around.
+DROP TRIGGER IF EXISTS garden_documents_trigger ON gardens;
+DROP TRIGGER IF EXISTS entrypoint_documents_trigger ON entrypoints;
+DROP TRIGGER IF EXISTS modal_function_documents_trigger ON modal_functions;
+DROP FUNCTION IF EXISTS refresh_garden_documents();
+DROP FUNCTION IF EXISTS refresh_entrypoint_documents();
+DROP FUNCTION IF EXISTS refresh_modal_function_documents();
+
+
+DO $$
 BEGIN
-    RETURN QUERY
-    WITH ep_ranks AS (
-         SELECT ge.garden_id,
-                COALESCE(SUM(ts_rank(ed.ep_document, query)), 0) AS rank
-         FROM gardens_entrypoints ge
-         INNER JOIN entrypoint_documents ed
-         ON ge.entrypoint_id = ed.id
-         GROUP BY ge.garden_id
-    ), modal_function_ranks AS (
-         SELECT gm.garden_id,
-                COALESCE(SUM(ts_rank(mf.mf_document, query)), 0) AS rank
-         FROM gardens_modal_functions gm
-         INNER JOIN modal_function_documents mf
-         ON gm.modal_function_id = mf.id
-         GROUP BY gm.garden_id
-    ), garden_ranks AS (
-       SELECT gd.garden_id,
-              COALESCE(ts_rank(gd.garden_document, query), 0)
-              + COALESCE(ep_ranks.rank, 0)
-              + COALESCE(mf_ranks.rank, 0) AS rank
-       FROM garden_documents gd
-       LEFT JOIN ep_ranks
-       ON ep_ranks.garden_id = gd.garden_id
-       LEFT JOIN modal_function_ranks mf_ranks
-       ON mf_ranks.garden_id = gd.garden_id
-    )
-    SELECT gr.garden_id, gr.rank
-    FROM garden_ranks gr
-    WHERE gr.rank > 0
-    ORDER BY gr.rank DESC;
+    IF EXISTS (SELECT 1 FROM pg_matviews WHERE matviewname = 'garden_documents') THEN
+        DROP MATERIALIZED VIEW garden_documents;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_matviews WHERE matviewname = 'entrypoint_documents') THEN
+        DROP MATERIALIZED VIEW entrypoint_documents;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_matviews WHERE matviewname = 'modal_function_documents') THEN
+        DROP MATERIALIZED VIEW modal_function_documents;
+    END IF;
 END;
 $$
-language plpgsql
 ;
 
 
-CREATE MATERIALIZED VIEW IF NOT EXISTS garden_documents AS
-    SELECT g.id AS garden_id,
-    setweight(to_tsvector(array_to_string(g.authors, ' ')), 'A') ||
-    setweight(to_tsvector(array_to_string(g.contributors, ' ')), 'A') ||
-    setweight(to_tsvector(array_to_string(g.tags, ' ')), 'B') ||
-    setweight(to_tsvector(g.description), 'D') ||
-    setweight(to_tsvector(g.title), 'D') AS garden_document
-    FROM gardens g;
+CREATE TABLE IF NOT EXISTS garden_documents (
+    garden_id int PRIMARY KEY REFERENCES gardens(id) ON DELETE CASCADE,
+    garden_document tsvector
+);
 
 
-CREATE MATERIALIZED VIEW IF NOT EXISTS entrypoint_documents AS
-    SELECT e.id,
-    setweight(to_tsvector(array_to_string(e.authors, ' ')), 'A') ||
-    setweight(to_tsvector(array_to_string(e.tags, ' ')), 'B') ||
-    setweight(to_tsvector(e.title), 'D') ||
-    setweight(to_tsvector(e.description), 'D') AS ep_document
-    FROM entrypoints e;
+CREATE TABLE IF NOT EXISTS entrypoint_documents (
+    id int PRIMARY KEY REFERENCES entrypoints(id) ON DELETE CASCADE,
+    ep_document tsvector
+);
 
 
-CREATE MATERIALIZED VIEW IF NOT EXISTS modal_function_documents AS
-    SELECT mf.id,
-    setweight(to_tsvector(array_to_string(mf.authors, ' ')), 'A') ||
-    setweight(to_tsvector(array_to_string(mf.tags, ' ')), 'A') ||
-    setweight(to_tsvector(mf.title), 'D') ||
-    setweight(to_tsvector(mf.description), 'D') AS mf_document
-    FROM modal_functions mf;
+CREATE TABLE IF NOT EXISTS modal_function_documents (
+    id int PRIMARY KEY REFERENCES modal_functions(id) ON DELETE CASCADE,
+    mf_document tsvector
+);
 
 
 CREATE INDEX IF NOT EXISTS garden_documents_index ON garden_documents USING GIN(garden_document);
@@ -74,64 +48,457 @@ CREATE INDEX IF NOT EXISTS entrypoint_documents_index ON entrypoint_documents US
 CREATE INDEX IF NOT EXISTS modal_function_documents_index ON modal_function_documents USING GIN(mf_document);
 
 
-CREATE OR REPLACE FUNCTION refresh_garden_documents()
+-- The document builders take columns rather than whole rows, so they don't
+-- depend on the tables' row types (which would block dropping the tables).
+CREATE OR REPLACE FUNCTION garden_document(
+    authors text[], contributors text[], tags text[], description text, title text
+)
+RETURNS tsvector
+AS $$
+    SELECT setweight(to_tsvector(array_to_string(authors, ' ')), 'A') ||
+           setweight(to_tsvector(array_to_string(contributors, ' ')), 'A') ||
+           setweight(to_tsvector(array_to_string(tags, ' ')), 'B') ||
+           setweight(to_tsvector(description), 'D') ||
+           setweight(to_tsvector(title), 'D');
+$$
+LANGUAGE sql STABLE
+;
+
+
+CREATE OR REPLACE FUNCTION entrypoint_document(
+    authors text[], tags text[], title text, description text
+)
+RETURNS tsvector
+AS $$
+    SELECT setweight(to_tsvector(array_to_string(authors, ' ')), 'A') ||
+           setweight(to_tsvector(array_to_string(tags, ' ')), 'B') ||
+           setweight(to_tsvector(title), 'D') ||
+           setweight(to_tsvector(description), 'D');
+$$
+LANGUAGE sql STABLE
+;
+
+
+CREATE OR REPLACE FUNCTION modal_function_document(
+    authors text[], tags text[], title text, description text
+)
+RETURNS tsvector
+AS $$
+    SELECT setweight(to_tsvector(array_to_string(authors, ' ')), 'A') ||
+           setweight(to_tsvector(array_to_string(tags, ' ')), 'A') ||
+           setweight(to_tsvector(title), 'D') ||
+           setweight(to_tsvector(description), 'D');
+$$
+LANGUAGE sql STABLE
+;
+
+
+-- Row-level triggers: each write only (re)builds the documents for the rows it touched.
+-- Deletes are handled by the ON DELETE CASCADE foreign keys above.
+CREATE OR REPLACE FUNCTION sync_garden_document()
 RETURNS TRIGGER
 AS $$
 BEGIN
-    REFRESH MATERIALIZED VIEW garden_documents;
-    RETURN NEW;
+    INSERT INTO garden_documents (garden_id, garden_document)
+    VALUES (
+        NEW.id,
+        garden_document(NEW.authors, NEW.contributors, NEW.tags, NEW.description, NEW.title)
+    )
+    ON CONFLICT (garden_id) DO UPDATE SET garden_document = EXCLUDED.garden_document;
+    RETURN NULL;
 END;
 $$
 LANGUAGE plpgsql
 ;
 
 
-CREATE OR REPLACE FUNCTION refresh_entrypoint_documents()
+CREATE OR REPLACE FUNCTION sync_entrypoint_document()
 RETURNS TRIGGER
 AS $$
 BEGIN
-    REFRESH MATERIALIZED VIEW entrypoint_documents;
-    RETURN NEW;
+    INSERT INTO entrypoint_documents (id, ep_document)
+    VALUES (NEW.id, entrypoint_document(NEW.authors, NEW.tags, NEW.title, NEW.description))
+    ON CONFLICT (id) DO UPDATE SET ep_document = EXCLUDED.ep_document;
+    RETURN NULL;
 END;
 $$
 LANGUAGE plpgsql
 ;
 
 
-CREATE OR REPLACE FUNCTION refresh_modal_function_documents()
+CREATE OR REPLACE FUNCTION sync_modal_function_document()
 RETURNS TRIGGER
 AS $$
 BEGIN
-    REFRESH MATERIALIZED VIEW modal_function_documents;
-    RETURN NEW;
+    INSERT INTO modal_function_documents (id, mf_document)
+    VALUES (NEW.id, modal_function_document(NEW.authors, NEW.tags, NEW.title, NEW.description))
+    ON CONFLICT (id) DO UPDATE SET mf_document = EXCLUDED.mf_document;
+    RETURN NULL;
 END;
 $$
 LANGUAGE plpgsql
 ;
 
-CREATE OR REPLACE TRIGGER garden_documents_trigger
+
+CREATE OR REPLACE TRIGGER garden_documents_sync
 AFTER INSERT OR UPDATE OF authors,
                 contributors,
                 tags,
                 description,
                 title
 ON gardens
-EXECUTE FUNCTION refresh_garden_documents();
+FOR EACH ROW
+EXECUTE FUNCTION sync_garden_document();
 
 
-CREATE OR REPLACE TRIGGER entrypoint_documents_trigger
+CREATE OR REPLACE TRIGGER entrypoint_documents_sync
 AFTER INSERT OR UPDATE OF authors,
                 tags,
                 description,
                 title
 ON entrypoints
-EXECUTE FUNCTION refresh_entrypoint_documents();
+FOR EACH ROW
+EXECUTE FUNCTION sync_entrypoint_document();
 
 
-CREATE OR REPLACE TRIGGER modal_function_documents_trigger
+CREATE OR REPLACE TRIGGER modal_function_documents_sync
 AFTER INSERT OR UPDATE OF authors,
                 tags,
                 description,
                 title
 ON modal_functions
-EXECUTE FUNCTION refresh_modal_function_documents();
+FOR EACH ROW
+EXECUTE FUNCTION sync_modal_function_document();
+
+
+-- Per-garden combined document: the garden's own document plus the documents
+-- of every entrypoint and modal function linked to it, each keeping its own
+-- weights. Searching only has to rank this one table instead of summing ranks
+-- across the association tables for the whole catalog.
+CREATE TABLE IF NOT EXISTS garden_search_documents (
+    garden_id int PRIMARY KEY REFERENCES gardens(id) ON DELETE CASCADE,
+    document tsvector
+);
+
+
+CREATE INDEX IF NOT EXISTS garden_search_documents_index ON garden_search_documents USING GIN(document);
+
+
+CREATE OR REPLACE AGGREGATE tsvector_agg(tsvector) (
+    SFUNC = tsvector_concat,
+    STYPE = tsvector,
+    INITCOND = ''
+);
+
+
+CREATE OR REPLACE FUNCTION refresh_garden_search_document(gid int)
+RETURNS void
+AS $$
+BEGIN
+    -- selecting from garden_documents means nothing is written for a garden
+    -- that is being deleted
+    INSERT INTO garden_search_documents (garden_id, document)
+    SELECT gd.garden_id,
+           COALESCE(gd.garden_document, '')
+           || COALESCE((SELECT tsvector_agg(ed.ep_document)
+                        FROM gardens_entrypoints ge
+                        INNER JOIN entrypoint_documents ed
+                        ON ge.entrypoint_id = ed.id
+                        WHERE ge.garden_id = gid), '')
+           || COALESCE((SELECT tsvector_agg(mfd.mf_document)
+                        FROM gardens_modal_functions gm
+                        INNER JOIN modal_function_documents mfd
+                        ON gm.modal_function_id = mfd.id
+                        WHERE gm.garden_id = gid), '')
+    FROM garden_documents gd
+    WHERE gd.garden_id = gid
+    ON CONFLICT (garden_id) DO UPDATE SET document = EXCLUDED.document;
+END;
+$$
+LANGUAGE plpgsql
+;
+
+
+CREATE OR REPLACE FUNCTION sync_garden_search_document_from_garden()
+RETURNS TRIGGER
+AS $$
+BEGIN
+    PERFORM refresh_garden_search_document(NEW.garden_id);
+    RETURN NULL;
+END;
+$$
+LANGUAGE plpgsql
+;
+
+
+CREATE OR REPLACE FUNCTION sync_garden_search_documents_from_entrypoint()
+RETURNS TRIGGER
+AS $$
+DECLARE
+    ep_id int := CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END;
+BEGIN
+    PERFORM refresh_garden_search_document(ge.garden_id)
+    FROM gardens_entrypoints ge
+    WHERE ge.entrypoint_id = ep_id;
+    RETURN NULL;
+END;
+$$
+LANGUAGE plpgsql
+;
+
+
+CREATE OR REPLACE FUNCTION sync_garden_search_documents_from_modal_function()
+RETURNS TRIGGER
+AS $$
+DECLARE
+    mf_id int := CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END;
+BEGIN
+    PERFORM refresh_garden_search_document(gm.garden_id)
+    FROM gardens_modal_functions gm
+    WHERE gm.modal_function_id = mf_id;
+    RETURN NULL;
+END;
+$$
+LANGUAGE plpgsql
+;
+
+
+-- Fires when an entrypoint or modal function is linked to or unlinked from a garden.
+CREATE OR REPLACE FUNCTION sync_garden_search_document_from_association()
+RETURNS TRIGGER
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM refresh_garden_search_document(OLD.garden_id);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM refresh_garden_search_document(NEW.garden_id);
+    END IF;
+    RETURN NULL;
+END;
+$$
+LANGUAGE plpgsql
+;
+
+
+CREATE OR REPLACE TRIGGER garden_search_documents_garden_sync
+AFTER INSERT OR UPDATE
+ON garden_documents
+FOR EACH ROW
+EXECUTE FUNCTION sync_garden_search_document_from_garden();
+
+
+CREATE OR REPLACE TRIGGER garden_search_documents_entrypoint_sync
+AFTER INSERT OR UPDATE OR DELETE
+ON entrypoint_documents
+FOR EACH ROW
+EXECUTE FUNCTION sync_garden_search_documents_from_entrypoint();
+
+
+CREATE OR REPLACE TRIGGER garden_search_documents_modal_function_sync
+AFTER INSERT OR UPDATE OR DELETE
+ON modal_function_documents
+FOR EACH ROW
+EXECUTE FUNCTION sync_garden_search_documents_from_modal_function();
+
+
+CREATE OR REPLACE TRIGGER garden_search_documents_entrypoints_link_sync
+AFTER INSERT OR UPDATE OR DELETE
+ON gardens_entrypoints
+FOR EACH ROW
+EXECUTE FUNCTION sync_garden_search_document_from_association();
+
+
+CREATE OR REPLACE TRIGGER garden_search_documents_modal_functions_link_sync
+AFTER INSERT OR UPDATE OR DELETE
+ON gardens_modal_functions
+FOR EACH ROW
+EXECUTE FUNCTION sync_garden_search_document_from_association();
+
+
+-- The distinct titles, tags, authors and contributors of each garden, for
+-- type-ahead suggestions (see /gardens/suggest). Prefix lookups on lower(term)
+-- use the text_pattern_ops index, so they don't depend on pg_trgm.
+CREATE TABLE IF NOT EXISTS garden_suggest_terms (
+    garden_id int NOT NULL REFERENCES gardens(id) ON DELETE CASCADE,
+    field text NOT NULL,
+    term text NOT NULL,
+    PRIMARY KEY (garden_id, field, term)
+);
+
+
+CREATE INDEX IF NOT EXISTS garden_suggest_terms_prefix_index
+ON garden_suggest_terms (lower(term) text_pattern_ops);
+
+
+CREATE OR REPLACE FUNCTION suggest_terms(
+    title text, tags text[], authors text[], contributors text[]
+)
+RETURNS TABLE(field text, term text)
+AS $$
+    SELECT DISTINCT t.field, btrim(t.term)
+    FROM (
+        SELECT 'title', title
+        UNION ALL SELECT 'tags', unnest(tags)
+        UNION ALL SELECT 'authors', unnest(authors)
+        UNION ALL SELECT 'contributors', unnest(contributors)
+    ) AS t(field, term)
+    WHERE btrim(t.term) <> '';
+$$
+LANGUAGE sql IMMUTABLE
+;
+
+
+CREATE OR REPLACE FUNCTION sync_garden_suggest_terms()
+RETURNS TRIGGER
+AS $$
+BEGIN
+    DELETE FROM garden_suggest_terms WHERE garden_id = NEW.id;
+    INSERT INTO garden_suggest_terms (garden_id, field, term)
+    SELECT NEW.id, t.field, t.term
+    FROM suggest_terms(NEW.title, NEW.tags, NEW.authors, NEW.contributors) t;
+    RETURN NULL;
+END;
+$$
+LANGUAGE plpgsql
+;
+
+
+CREATE OR REPLACE TRIGGER garden_suggest_terms_sync
+AFTER INSERT OR UPDATE OF title,
+                tags,
+                authors,
+                contributors
+ON gardens
+FOR EACH ROW
+EXECUTE FUNCTION sync_garden_suggest_terms();
+
+
+-- A counter bumped by every write that could change search results, so each
+-- worker can tell whether its cached results (see src/api/search/cache.py) are
+-- still current. It's bumped in the writing transaction, so it only moves once
+-- the write is visible, and statement-level triggers bump it once per statement.
+CREATE TABLE IF NOT EXISTS search_generation (
+    id int PRIMARY KEY CHECK (id = 1),
+    generation bigint NOT NULL
+);
+
+
+INSERT INTO search_generation (id, generation) VALUES (1, 0)
+ON CONFLICT (id) DO NOTHING;
+
+
+CREATE OR REPLACE FUNCTION bump_search_generation()
+RETURNS TRIGGER
+AS $$
+BEGIN
+    UPDATE search_generation SET generation = generation + 1 WHERE id = 1;
+    RETURN NULL;
+END;
+$$
+LANGUAGE plpgsql
+;
+
+
+CREATE OR REPLACE TRIGGER gardens_search_generation
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+ON gardens
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_search_generation();
+
+
+CREATE OR REPLACE TRIGGER entrypoints_search_generation
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+ON entrypoints
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_search_generation();
+
+
+CREATE OR REPLACE TRIGGER modal_functions_search_generation
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+ON modal_functions
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_search_generation();
+
+
+CREATE OR REPLACE TRIGGER gardens_entrypoints_search_generation
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+ON gardens_entrypoints
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_search_generation();
+
+
+CREATE OR REPLACE TRIGGER gardens_modal_functions_search_generation
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+ON gardens_modal_functions
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_search_generation();
+
+
+-- Rebuild every search document from scratch. The triggers keep the documents
+-- current, so this is only needed to populate the tables the first time (see
+-- below) or after loading data with triggers disabled.
+-- see: scripts/backfill_search_documents.py
+CREATE OR REPLACE FUNCTION backfill_search_documents()
+RETURNS void
+AS $$
+BEGIN
+    INSERT INTO garden_documents (garden_id, garden_document)
+    SELECT g.id, garden_document(g.authors, g.contributors, g.tags, g.description, g.title)
+    FROM gardens g
+    ON CONFLICT (garden_id) DO UPDATE SET garden_document = EXCLUDED.garden_document;
+
+    INSERT INTO entrypoint_documents (id, ep_document)
+    SELECT e.id, entrypoint_document(e.authors, e.tags, e.title, e.description)
+    FROM entrypoints e
+    ON CONFLICT (id) DO UPDATE SET ep_document = EXCLUDED.ep_document;
+
+    INSERT INTO modal_function_documents (id, mf_document)
+    SELECT mf.id, modal_function_document(mf.authors, mf.tags, mf.title, mf.description)
+    FROM modal_functions mf
+    ON CONFLICT (id) DO UPDATE SET mf_document = EXCLUDED.mf_document;
+
+    PERFORM refresh_garden_search_document(gd.garden_id)
+    FROM garden_documents gd;
+
+    DELETE FROM garden_suggest_terms;
+    INSERT INTO garden_suggest_terms (garden_id, field, term)
+    SELECT g.id, t.field, t.term
+    FROM gardens g,
+         suggest_terms(g.title, g.tags, g.authors, g.contributors) t;
+END;
+$$
+LANGUAGE plpgsql
+;
+
+
+-- populate the document tables the first time they're created
+DO $$
+BEGIN
+    IF (NOT EXISTS (SELECT 1 FROM garden_documents) AND EXISTS (SELECT 1 FROM gardens))
+       OR (NOT EXISTS (SELECT 1 FROM entrypoint_documents) AND EXISTS (SELECT 1 FROM entrypoints))
+       OR (NOT EXISTS (SELECT 1 FROM modal_function_documents) AND EXISTS (SELECT 1 FROM modal_functions))
+       OR (NOT EXISTS (SELECT 1 FROM garden_search_documents) AND EXISTS (SELECT 1 FROM gardens))
+       OR (NOT EXISTS (SELECT 1 FROM garden_suggest_terms) AND EXISTS (SELECT 1 FROM gardens))
+    THEN
+        PERFORM backfill_search_documents();
+    END IF;
+END;
+$$
+;
+
+
+-- Ranked full-text search over the combined garden documents.
+-- This is a single-SELECT, STABLE sql function so the planner inlines it into
+-- the calling query: the @@ prefilter uses the GIN index, only matching rows
+-- are ranked, and the caller's ORDER BY/LIMIT become a top-k over the matches.
+CREATE OR REPLACE FUNCTION search_gardens(search_query text)
+RETURNS TABLE(garden_id int, rank real)
+AS $$
+    SELECT gsd.garden_id, ts_rank(gsd.document, query) AS rank
+    FROM garden_search_documents gsd,
+         websearch_to_tsquery(search_query) query
+    WHERE gsd.document @@ query;
+$$
+LANGUAGE sql STABLE
+;
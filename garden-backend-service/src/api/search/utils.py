@@ -1,13 +1,32 @@
-from sqlalchemy import asc, column, desc, func, select
-from sqlalchemy.dialects.postgresql import ARRAY, TEXT
+import re
+from typing import Any, NamedTuple
+
+from sqlalchemy import (
+    Integer,
+    asc,
+    cast,
+    column,
+    desc,
+    func,
+    literal,
+    not_,
+    select,
+    table,
+    true,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, REAL, TEXT, array
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.sql.selectable import Select
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.sql.selectable import ScalarSelect, Select
 
 from src.api.schemas.garden import (
     GardenSearchFacets,
     GardenSearchFilter,
     GardenSearchSort,
+    GardenSuggestion,
 )
+from src.api.search.pagination import SortKey, keyset_after, sort_keys
 from src.models.base import Base
 
 
@@ -22,18 +41,34 @@ def apply_filters(
     ANDed together, meaning that all conditions must be satisfied for a row to be included
     in the result.
 
+    A filter's `operator` decides how its `values` are compared with the field:
+
+    - `match` (the default): full-text match of each value against the field's text.
+      Every value must match. No index can serve this, so prefer the operators below.
+    - `eq`: the field equals the single value.
+    - `in`: the field equals any of the values.
+    - `overlap`: the array field shares at least one element with the values (`&&`).
+    - `contains`: the array field has every one of the values (`@>`).
+    - `range`: the year is within `[min, max]`, inclusive. Either bound may be `""`
+      to leave that end open.
+
+    The array operators are served by the GIN indexes on `tags`, `authors` and
+    `contributors`, and `eq`/`in`/`range` by btree indexes where the field has one.
+
     Args:
         model (Base): The SQLAlchemy model to which the filters should be applied.
                       This should be a class derived from `src.models.base.Base`.
         stmt (Select): The initial SQLAlchemy `Select` statement to be modified.
         filters (list[GardenSearchFilter]): A list of `GardenSearchFilter` instances, where each filter
-                                            specifies a `field_name` and a list of `values` to match.
+                                            specifies a `field_name`, an `operator` and a list of
+                                            `values` to compare with.
 
     Returns:
         Select: A new `Select` statement with the additional `WHERE` clauses based on the provided filters.
 
     Raises:
-        ValueError: If a `field_name` in a filter does not correspond to an attribute on the `model`.
+        ValueError: If a `field_name` in a filter does not correspond to an attribute on the `model`,
+                    or its `operator` or `values` don't suit the field.
 
     Example:
         Given a model `Garden` with attributes `title`, `description`, and `tags`:
@@ -41,7 +76,7 @@ def apply_filters(
         ```
         filters = [
             GardenSearchFilter(field_name="title", values=["flower"]),
-            GardenSearchFilter(field_name="tags", values=["botany"])
+            GardenSearchFilter(field_name="tags", operator="contains", values=["botany"])
         ]
         query = select(Garden)
         query_with_filters = apply_filters(Garden, query, filters)
@@ -52,81 +87,313 @@ def apply_filters(
     for filter in filters:
         if not hasattr(model, filter.field_name):
             raise ValueError(f"Invalid filter field_name: {filter.field_name}")
-        for value in filter.values:
-            if type(getattr(model, filter.field_name).type) is ARRAY:
-                stmt = stmt.where(
-                    func.array_to_string(getattr(model, filter.field_name), " ").match(
-                        value
+        field = getattr(model, filter.field_name)
+        is_array = type(field.type) is ARRAY
+
+        match filter.operator:
+            case "match":
+                for value in filter.values:
+                    if is_array:
+                        stmt = stmt.where(func.array_to_string(field, " ").match(value))
+                    else:
+                        stmt = stmt.where(func.cast(field, TEXT).match(value))
+            case "overlap" | "contains":
+                if not is_array:
+                    raise ValueError(
+                        f"Invalid filter operator for {filter.field_name}: {filter.operator} "
+                        "only applies to list fields"
+                    )
+                # cast so the comparison matches the column's type (and its GIN index)
+                values = cast(array(filter.values), field.type)
+                if filter.operator == "overlap":
+                    stmt = stmt.where(field.overlap(values))
+                else:
+                    stmt = stmt.where(field.contains(values))
+            case "eq" | "in":
+                if is_array:
+                    raise ValueError(
+                        f"Invalid filter operator for {filter.field_name}: use overlap or "
+                        f"contains to filter list fields"
+                    )
+                values = [_filter_value(field, value) for value in filter.values]
+                if filter.operator == "eq":
+                    if len(values) != 1:
+                        raise ValueError(
+                            f"Invalid filter values for {filter.field_name}: eq takes one value"
+                        )
+                    stmt = stmt.where(field == values[0])
+                else:
+                    stmt = stmt.where(field.in_(values))
+            case "range":
+                if filter.field_name != "year":
+                    raise ValueError(
+                        f"Invalid filter operator for {filter.field_name}: range only applies to year"
                     )
-                )
-            else:
-                stmt = stmt.where(
-                    func.cast(getattr(model, filter.field_name), TEXT).match(value)
-                )
+                stmt = stmt.where(*_year_range(field, filter.values))
     return stmt
 
 
-async def calculate_facets(db: AsyncSession, query: Select) -> GardenSearchFacets:
-    """Calculate and return search facets for a given query.
+def _filter_value(field: ColumnElement, value: str) -> Any:
+    """Convert a filter value to the field's type, so comparisons can use its index."""
+    python_type = field.type.python_type
+    if python_type is bool:
+        if value.lower() not in ("true", "false"):
+            raise ValueError(
+                f"Invalid filter value: expected true or false, got {value}"
+            )
+        return value.lower() == "true"
+    if python_type is int:
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError(f"Invalid filter value: expected an integer, got {value}")
+    return value
+
+
+def _year_range(field: ColumnElement, values: list[str]) -> list[ColumnElement]:
+    """WHERE clauses for an inclusive `[min, max]` range of years.
+
+    Years are stored as strings, so bounds are compared as zero-padded four digit
+    strings, which sort the same as the integers and can use the index on year.
+    """
+    if len(values) != 2:
+        raise ValueError("Invalid filter values for year: range takes [min, max]")
+    clauses = [field.regexp_match(r"^\d{4}$")]
+    for bound, compare in zip(values, (field.__ge__, field.__le__)):
+        if bound == "":
+            continue
+        try:
+            year = int(bound)
+        except ValueError:
+            raise ValueError(f"Invalid filter value: expected a year, got {bound}")
+        if not 0 <= year <= 9999:
+            raise ValueError(f"Invalid filter value: expected a year, got {bound}")
+        clauses.append(compare(f"{year:04d}"))
+    return clauses
+
+
+def apply_search(
+    model: Base, stmt: Select, search_query: str
+) -> tuple[Select, ColumnElement[float]]:
+    """Restrict `stmt` to gardens matching `search_query`.
+
+    Joins the `search_gardens` SQL function, which Postgres inlines into the
+    statement, so only documents matching the query (found via the GIN index)
+    are ranked, and ordering by the returned rank column with a LIMIT becomes
+    a top-k over those matches.
+
+    Returns:
+        The joined statement, and the rank column to order best matches first by.
+    """
+    search_func = func.search_gardens(search_query).table_valued(
+        column("garden_id", Integer), column("rank", REAL)
+    )
+    stmt = stmt.join(search_func, search_func.c.garden_id == model.id)
+    return stmt, search_func.c.rank
 
-    This function computes facet counts for tags, authors, and years based on the
-    result set from the provided SQLAlchemy Select statement. Facets are calculated
-    by grouping on specific fields (`tags`, `authors`, and `year`) and counting
-    occurrences within the subset of gardens returned by the query.
+
+class SearchPage(NamedTuple):
+    results: list[Base]
+    total: int
+    offset: int
+    facets: GardenSearchFacets
+    # sort key values of the last result, if there are more results after it
+    next_keys: list[Any] | None
+
+
+async def search_with_facets(
+    db: AsyncSession,
+    model: Base,
+    stmt: Select,
+    order_by: list[ColumnElement],
+    limit: int,
+    offset: int = 0,
+    after: list[Any] | None = None,
+    facet_sizes: dict[str, int] | None = None,
+) -> SearchPage:
+    """Fetch one page of results, along with the total and the facet counts.
+
+    Everything comes from one statement over a CTE of the filtered (and
+    searched) `stmt`, so the filtering and ranking run once. The page is a plain
+    `ORDER BY ... LIMIT` over the CTE, a top-k rather than a sort of every match,
+    and a cursor (`after`) becomes a `WHERE` on the sort keys instead of an
+    `OFFSET`. The total and the requested tag, author and year facets are
+    aggregated into a summary row, which the page is outer joined onto so an
+    empty page still carries them.
+
+    Each facet only includes its most common values, up to its size limit (ties
+    broken alphabetically), and reports the total count of the rest as `other`.
 
     Args:
-        db (AsyncSession): The asynchronous SQLAlchemy session used to execute queries.
-        query (Select): A SQLAlchemy `Select` statement representing the filtered subset
-                        of gardens to calculate facets from.
+        db (AsyncSession): The asynchronous SQLAlchemy session used to execute the query.
+        model (Base): The model `stmt` selects, with `tags`, `authors` and `year` columns.
+        stmt (Select): The filtered subset of `model` to search, without ordering or paging.
+        order_by (list[ColumnElement]): The ordering to page through the results in.
+        limit (int): The maximum number of results to return.
+        offset (int): The number of results to skip.
+        after (list | None): Sort key values (see `src.api.search.pagination`) to
+                             start the page after instead of skipping `offset` results.
+        facet_sizes (dict[str, int] | None): The facets to calculate ("tags", "authors"
+                                             and/or "year"), each mapped to the most values
+                                             to return for it. Defaults to none.
 
     Returns:
-        GardenSearchFacets: An instance of `GardenSearchFacets` containing three fields:
-            - `tags` (dict[str, int]): A dictionary where keys are individual tags and values
-              are the count of gardens associated with each tag.
-            - `authors` (dict[str, int]): A dictionary where keys are author names and values
-              are the count of gardens authored by each individual.
-            - `year` (dict[str, int]): A dictionary where keys are years (as strings) and values
-              are the count of gardens created in each year.
-
-    Note:
-        This function assumes that the query provided returns results from a table or view that
-        includes the columns `tags`, `authors`, and `year` as arrays or individual fields.
+        SearchPage: The page of `model` instances, the total number of results, the
+            offset of the page, the facets counting the gardens associated with each
+            tag, author and year, and the sort keys to fetch the next page after.
+
+    Raises:
+        ValueError: If `after` doesn't fit `order_by`.
     """
-    filtered_gardens = query.subquery("filtered_gardens")
+    keys = sort_keys(order_by)
+    filtered = stmt.add_columns(
+        *[key.label(f"sort_key_{i}") for i, (key, _) in enumerate(keys)]
+    ).cte("filtered")
+    filtered_keys = [
+        (filtered.c[f"sort_key_{i}"], descending)
+        for i, (_, descending) in enumerate(keys)
+    ]
+
+    def facet_counts(value, size: int) -> ScalarSelect:
+        counts = (
+            select(value.label("value"), func.count().label("count"))
+            .select_from(filtered)
+            .group_by(column("value"))
+            .subquery()
+        )
+        ranked = (
+            select(
+                counts,
+                func.row_number()
+                .over(order_by=(desc(counts.c.count), counts.c.value))
+                .label("rank"),
+            )
+            .order_by(column("rank"))
+            .subquery()
+        )
+        return select(
+            func.json_build_object(
+                "values",
+                func.json_object_agg(ranked.c.value, ranked.c.count).filter(
+                    ranked.c.rank <= size
+                ),
+                "other",
+                func.coalesce(func.sum(ranked.c.count).filter(ranked.c.rank > size), 0),
+            )
+        ).scalar_subquery()
 
-    tags_query = select(
-        func.unnest(filtered_gardens.c.tags).label("tag"), func.count().label("count")
-    ).group_by(column("tag"))
+    facet_values = {
+        "tags": func.unnest(filtered.c.tags),
+        "authors": func.unnest(filtered.c.authors),
+        "year": filtered.c.year,
+    }
+    facet_sizes = facet_sizes or {}
 
-    authors_query = select(
-        func.unnest(filtered_gardens.c.authors).label("author"),
-        func.count().label("count"),
-    ).group_by(column("author"))
+    if after is not None:
+        # counted along with the total, for the offset reported back with the page
+        start = func.count().filter(not_(keyset_after(filtered_keys, after)))
+    else:
+        start = literal(offset)
+    summary = (
+        select(
+            func.count().label("total"),
+            start.label("start"),
+            *[
+                facet_counts(facet_values[name], size).label(name)
+                for name, size in facet_sizes.items()
+            ],
+        )
+        .select_from(filtered)
+        .subquery("summary")
+    )
 
-    year_query = select(
-        filtered_gardens.c.year.label("year"), func.count().label("count")
-    ).group_by(column("year"))
+    page = select(filtered).order_by(*_ordered(filtered_keys))
+    if after is not None:
+        # seek straight past the cursor, rather than skipping every result before it
+        page = page.where(keyset_after(filtered_keys, after))
+    else:
+        page = page.offset(offset)
+    # one extra row, to tell whether there's a page after this one
+    page = page.limit(limit + 1).subquery("page")
+    page_keys = [
+        (page.c[f"sort_key_{i}"], descending) for i, (_, descending) in enumerate(keys)
+    ]
 
-    tags_result = await db.execute(tags_query)
-    authors_result = await db.execute(authors_query)
-    year_result = await db.execute(year_query)
+    # the page is outer joined onto the summary, so an empty page still gets a row
+    rows = (
+        await db.execute(
+            select(aliased(model, page), *[key for key, _ in page_keys], summary)
+            .select_from(summary)
+            .outerjoin(page, true())
+            .order_by(*_ordered(page_keys))
+        )
+    ).all()
+    summary_row = rows[0]
+    rows = [row for row in rows if row[0] is not None]
+    results = [row[0] for row in rows[:limit]]
 
-    tags = {row[0]: row[1] for row in tags_result.all()}
-    authors = {row[0]: row[1] for row in authors_result.all()}
-    year = {str(row[0]): row[1] for row in year_result.all()}
+    next_keys = None
+    if results and len(rows) > limit:
+        next_keys = list(rows[limit - 1][1 : 1 + len(keys)])
 
-    return GardenSearchFacets(tags=tags, authors=authors, year=year)
+    facets = GardenSearchFacets(
+        **{name: getattr(summary_row, name)["values"] or {} for name in facet_sizes},
+        other={name: getattr(summary_row, name)["other"] for name in facet_sizes},
+    )
+    return SearchPage(
+        results=results,
+        total=summary_row.total,
+        offset=summary_row.start,
+        facets=facets,
+        next_keys=next_keys,
+    )
+
+
+def _ordered(keys: list[SortKey]) -> list[ColumnElement]:
+    return [desc(key) if descending else asc(key) for key, descending in keys]
+
+
+# maintained by triggers in sql.sql, see garden_suggest_terms there
+garden_suggest_terms = table(
+    "garden_suggest_terms",
+    column("garden_id", Integer),
+    column("field", TEXT),
+    column("term", TEXT),
+)
+
+
+async def suggest(db: AsyncSession, prefix: str, limit: int) -> list[GardenSuggestion]:
+    """Find the garden titles, tags, authors and contributors starting with `prefix`.
+
+    Matching ignores case and goes through the prefix index on
+    `lower(term)`, so it only touches matching terms. The most common terms
+    come first.
+    """
+    escaped = re.sub(r"([\\%_])", r"\\\1", prefix.lower())
+    count = func.count().label("count")
+    stmt = (
+        select(garden_suggest_terms.c.term, garden_suggest_terms.c.field, count)
+        .where(func.lower(garden_suggest_terms.c.term).like(f"{escaped}%", escape="\\"))
+        .group_by(garden_suggest_terms.c.term, garden_suggest_terms.c.field)
+        .order_by(desc(count), garden_suggest_terms.c.term)
+        .limit(limit)
+    )
+    result = await db.execute(stmt)
+    return [
+        GardenSuggestion(term=term, field=field, count=n)
+        for term, field, n in result.all()
+    ]
 
 
-def sort_results(model: Base, stmt: Select, sort: GardenSearchSort):
+def sort_order(model: Base, sort: GardenSearchSort) -> ColumnElement:
     if not hasattr(model, sort.field_name):
         raise ValueError(f"Invalid sort field_name: {sort.field_name}")
 
     match sort.order:
         case "asc":
-            return stmt.order_by(asc(getattr(model, sort.field_name)))
+            return asc(getattr(model, sort.field_name))
         case "desc":
-            return stmt.order_by(desc(getattr(model, sort.field_name)))
+            return desc(getattr(model, sort.field_name))
         case _:
             raise ValueError(
                 f"Invalid sort order: {sort.order}. Must be 'asc' or 'desc'"
@@ -1,10 +1,9 @@
 import typing as t
 import uuid
 
-import globus_sdk
 from fastapi import HTTPException
 
-from src.auth.globus_auth import introspect_token
+from src.auth.globus_auth import TokenIntrospector, introspect_token
 from src.config import get_settings
 
 
@@ -26,23 +25,35 @@ class AuthenticationState:
     """
 
     def __init__(
-        self, token: t.Optional[str], *, assert_default_scope: bool = True
+        self,
+        token: t.Optional[str],
+        introspect_data: t.Optional[dict] = None,
+        *,
+        assert_default_scope: bool = True,
     ) -> None:
         settings = get_settings()
         self.garden_default_scope: str = settings.GARDEN_DEFAULT_SCOPE
         self.token = token
 
-        self.introspect_data: t.Optional[globus_sdk.GlobusHTTPResponse] = None
+        self.introspect_data: t.Optional[dict] = None
         self.identity_id: t.Optional[uuid.UUID] = None
         self.username: t.Optional[str] = None
         self.scopes: t.Set[str] = set()
 
-        if token:
-            self._handle_token()
+        if token and introspect_data is not None:
+            self._handle_introspect_data(introspect_data)
 
-    def _handle_token(self) -> None:
-        """Given a token, flesh out the AuthenticationState."""
-        self.introspect_data = introspect_token(t.cast(str, self.token))
+    @classmethod
+    async def from_token(
+        cls, token: t.Optional[str], introspector: TokenIntrospector
+    ) -> "AuthenticationState":
+        """Introspect the token (if any) with Globus Auth and build its AuthenticationState."""
+        introspect_data = await introspect_token(token, introspector) if token else None
+        return cls(token, introspect_data)
+
+    def _handle_introspect_data(self, introspect_data: dict) -> None:
+        """Given the token's introspection, flesh out the AuthenticationState."""
+        self.introspect_data = introspect_data
         self.username = self.introspect_data["username"]
         self.identity_id = (
             uuid.UUID(self.introspect_data["sub"])
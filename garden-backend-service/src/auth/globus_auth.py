@@ -1,30 +1,158 @@
+import asyncio
+import time
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 
 import globus_sdk
 import structlog
-from cachetools import TTLCache, cached
 from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from src.config import get_settings
+from src.auth.token_cache import (
+    CachedIntrospection,
+    MemoryTokenCache,
+    TokenCache,
+    get_shared_token_cache,
+    hash_token,
+)
+from src.config import Settings, get_settings
+from src.metrics import CACHE_ENTRIES, CACHE_MAX_ENTRIES, CACHE_REQUESTS, CACHE_TTL
+from src.middleware.timing import external_call
 
 logger = structlog.get_logger(__name__)
 
+# globus_sdk is synchronous, so introspection calls run on their own threads
+# rather than blocking the event loop (or queueing behind sync endpoints in
+# the default threadpool)
+_introspection_executor = ThreadPoolExecutor(
+    max_workers=8, thread_name_prefix="token-introspection"
+)
 
-@cached(cache=TTLCache(maxsize=100, ttl=5 * 60))
-def introspect_token(token: str, log: bool = True) -> globus_sdk.GlobusHTTPResponse:
-    """Introspect a token and return the response data."""
-    client = get_auth_client()
-    auth_data = client.oauth2_token_introspect(
-        token, include="identity_set,identity_set_detail"
-    )
 
-    if log:
-        introspect_detail = getattr(auth_data, "data", auth_data)
+class TokenIntrospector:
+    """Introspects tokens with Globus Auth, caching the results.
+
+    Results are kept in memory, and in a `shared` cache (see src/auth/token_cache.py)
+    if there is one, so other workers can use them too. Active tokens are cached for
+    `ttl` seconds, or until they expire if that's sooner. Inactive ones are cached
+    for `invalid_ttl` seconds (so a bad token can't be used to hammer Globus Auth,
+    but a token that was only just issued isn't turned away for long).
+
+    Concurrent lookups of the same uncached token share one lookup.
+    """
+
+    CACHE_NAME = "token_introspection"
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        invalid_ttl: float,
+        shared: TokenCache | None = None,
+    ):
+        self.ttl = ttl
+        self.invalid_ttl = invalid_ttl
+        self._memory = MemoryTokenCache(maxsize)
+        self._shared = shared
+        self._in_flight: dict[str, asyncio.Future] = {}
+        CACHE_MAX_ENTRIES.labels(cache=self.CACHE_NAME).set(maxsize)
+        CACHE_TTL.labels(cache=self.CACHE_NAME).set(ttl)
+
+    async def introspect(self, token: str) -> dict:
+        """Return Globus Auth's introspection of `token`, which may not be active."""
+        key = hash_token(token)
+        cached = await self._memory.get(key)
+        if cached is not None:
+            self._count(self.CACHE_NAME, "hit")
+            return cached.data
+
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self._count(self.CACHE_NAME, "coalesced")
+        else:
+            self._count(self.CACHE_NAME, "miss")
+            pending = asyncio.ensure_future(self._lookup(key, token))
+            self._in_flight[key] = pending
+            pending.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # shielded, so one caller giving up (e.g. a dropped connection) doesn't
+        # cancel the lookup for everyone else waiting on it
+        return await asyncio.shield(pending)
+
+    async def _lookup(self, key: str, token: str) -> dict:
+        if self._shared is not None:
+            cached = await self._get_shared(key)
+            if cached is not None:
+                await self._remember(key, cached)
+                return cached.data
+
+        auth_data = await self._fetch(token)
+        if auth_data.get("active", False):
+            expires_at = time.time() + self.ttl
+            if auth_data.get("exp") is not None:
+                expires_at = min(expires_at, auth_data["exp"])
+        else:
+            expires_at = time.time() + self.invalid_ttl
+        if expires_at > time.time():
+            entry = CachedIntrospection(auth_data, expires_at)
+            await self._remember(key, entry)
+            if self._shared is not None:
+                await self._set_shared(key, entry)
+        return auth_data
+
+    async def _fetch(self, token: str) -> dict:
+        client = get_auth_client()
+        loop = asyncio.get_running_loop()
+        with external_call("globus_auth", "token introspect"):
+            response = await loop.run_in_executor(
+                _introspection_executor,
+                lambda: client.oauth2_token_introspect(
+                    token, include="identity_set,identity_set_detail"
+                ),
+            )
+
+        auth_data = getattr(response, "data", response)
         logger.debug(
             "auth_detail",
-            extra={"log_type": "auth_detail", "auth_detail": introspect_detail},
+            extra={"log_type": "auth_detail", "auth_detail": auth_data},
         )
+        return auth_data
 
+    async def _remember(self, key: str, entry: CachedIntrospection) -> None:
+        await self._memory.set(key, entry)
+        CACHE_ENTRIES.labels(cache=self.CACHE_NAME).set(len(self._memory))
+
+    # the shared cache is only a shortcut, so if it's unavailable we carry on without it
+
+    async def _get_shared(self, key: str) -> CachedIntrospection | None:
+        shared = t.cast(TokenCache, self._shared)
+        cache_name = f"{self.CACHE_NAME}_{shared.name}"
+        try:
+            cached = await shared.get(key)
+        except Exception:
+            logger.warning("Failed to read the shared token cache", exc_info=True)
+            self._count(cache_name, "error")
+            return None
+        self._count(cache_name, "miss" if cached is None else "hit")
+        return cached
+
+    async def _set_shared(self, key: str, entry: CachedIntrospection) -> None:
+        try:
+            await t.cast(TokenCache, self._shared).set(key, entry)
+        except Exception:
+            logger.warning("Failed to write to the shared token cache", exc_info=True)
+
+    @staticmethod
+    def _count(cache_name: str, result: str) -> None:
+        CACHE_REQUESTS.labels(cache=cache_name, result=result).inc()
+
+
+async def introspect_token(token: str, introspector: TokenIntrospector) -> dict:
+    """Introspect a token and return the response data.
+
+    Raises a 401 if the token isn't active.
+    """
+    auth_data = await introspector.introspect(token)
     if not auth_data.get("active", False):
         raise HTTPException(
             status_code=401,
@@ -34,6 +162,18 @@ def introspect_token(token: str, log: bool = True) -> globus_sdk.GlobusHTTPRespo
     return auth_data
 
 
+def get_token_introspector(
+    settings: Settings, db_session_maker: async_sessionmaker[AsyncSession]
+) -> TokenIntrospector:
+    """Create the worker's TokenIntrospector, set up by the INTROSPECTION_CACHE_* settings."""
+    return TokenIntrospector(
+        maxsize=settings.INTROSPECTION_CACHE_SIZE,
+        ttl=settings.INTROSPECTION_CACHE_TTL_SECS,
+        invalid_ttl=settings.INTROSPECTION_CACHE_INVALID_TTL_SECS,
+        shared=get_shared_token_cache(settings, db_session_maker),
+    )
+
+
 @lru_cache
 def get_auth_client() -> globus_sdk.ConfidentialAppAuthClient:
     """Create an AuthClient for the service."""
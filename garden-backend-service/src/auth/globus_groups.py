@@ -1,54 +1,187 @@
+import asyncio
+from functools import lru_cache
+from uuid import UUID
+
 import globus_sdk as glb
+import structlog
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from src.config import Settings
+from src.middleware.timing import external_call
+from src.models.user import User
 
-from .auth_state import AuthenticationState
 from .globus_auth import get_auth_client
 
+logger = structlog.get_logger(__name__)
 
-def add_user_to_group(
-    authed_user: AuthenticationState,
-    settings: Settings,
-) -> None:
-    """Add authed_user as a member of Garden Users Globus group specified in the settings.
 
-    If the user is already in the group this function does nothing.
+class GroupEnrollmentQueue:
+    """Add new users to the Garden Users Globus group in the background.
 
-    Args:
-        authed_user (AuthenticationState): The authenticated user.
-        settings (Settings): Application settings.
+    `enroll` queues a user and returns at once. A worker task adds queued users to
+    the group, up to `batch_size` of them in a single Globus Groups call, so users
+    who arrive together (e.g. everyone at a workshop logging in at once) are added
+    together. A failed batch is retried up to `max_retries` times, `retry_interval`
+    seconds apart.
 
-    Raises:
-        globus_sdk.GlobusAPIError: when there is an issue communicating with Globus services
+    Users are only marked `enrolled_in_group` once they've been added, and
+    `authed_user` queues anyone who isn't. So a user whose batch failed, or was
+    lost when the worker crashed or restarted, is queued again on their next request.
+
+    Call `start` once the event loop is running and `stop` before it closes.
     """
 
-    groups_manager = _create_service_groups_manager()
-    groups_manager.add_member(settings.GARDEN_USERS_GROUP_ID, authed_user.identity_id)
+    def __init__(
+        self,
+        group_id: str,
+        db_session_maker: async_sessionmaker[AsyncSession],
+        batch_size: int = 100,
+        max_retries: int = 3,
+        retry_interval: float = 1,
+    ):
+        self.group_id = group_id
+        self.db_session_maker = db_session_maker
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_interval = retry_interval
+        self._pending: asyncio.Queue[UUID] = asyncio.Queue()
+        # queued or being added, so repeat requests don't queue them again
+        self._queued: set[UUID] = set()
+        self._worker: asyncio.Task | None = None
+        self._in_flight: asyncio.Task | None = None
+
+    def enroll(self, identity_id: UUID) -> None:
+        if identity_id in self._queued:
+            return
+        self._queued.add(identity_id)
+        self._pending.put_nowait(identity_id)
+
+    def start(self) -> None:
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the worker, making one last attempt to add anyone still queued."""
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        # let the batch being added finish rather than abandoning it
+        if self._in_flight is not None:
+            await asyncio.gather(self._in_flight, return_exceptions=True)
+        while not self._pending.empty():
+            await self._add_batch(self._take_batch(self.batch_size), retries=0)
+
+    async def _run(self) -> None:
+        while True:
+            # wait for someone to enroll, then add everyone who's queued up since
+            first = await self._pending.get()
+            batch = [first, *self._take_batch(self.batch_size - 1)]
+            self._in_flight = asyncio.create_task(
+                self._add_batch(batch, retries=self.max_retries)
+            )
+            # shielded, so stopping the worker doesn't interrupt the batch
+            await asyncio.shield(self._in_flight)
+            self._in_flight = None
+
+    def _take_batch(self, limit: int) -> list[UUID]:
+        batch: list[UUID] = []
+        while len(batch) < limit and not self._pending.empty():
+            batch.append(self._pending.get_nowait())
+        return batch
+
+    async def _add_batch(self, identity_ids: list[UUID], retries: int) -> None:
+        try:
+            if await self._try_add_batch(identity_ids, retries):
+                await self._mark_enrolled(identity_ids)
+        finally:
+            # whether or not they were added, they can be queued again
+            self._queued.difference_update(identity_ids)
+
+    async def _try_add_batch(self, identity_ids: list[UUID], retries: int) -> bool:
+        error: Exception | None = None
+        for attempt in range(retries + 1):
+            try:
+                await asyncio.to_thread(add_users_to_group, self.group_id, identity_ids)
+                return True
+            except Exception as e:
+                error = e
+                if attempt < retries:
+                    logger.warning(
+                        "Failed to add users to the Garden Users group, retrying",
+                        exc_info=True,
+                        attempt=attempt + 1,
+                    )
+                    await asyncio.sleep(self.retry_interval)
+        logger.error(
+            "Gave up adding users to the Garden Users group for now",
+            exc_info=error,
+            identity_ids=[str(identity_id) for identity_id in identity_ids],
+        )
+        return False
+
+    async def _mark_enrolled(self, identity_ids: list[UUID]) -> None:
+        try:
+            async with self.db_session_maker() as db:
+                await db.execute(
+                    update(User)
+                    .where(User.identity_id.in_(identity_ids))
+                    .values(enrolled_in_group=True)
+                )
+                await db.commit()
+        except Exception:
+            # they'll be queued (and harmlessly added) again on their next request
+            logger.warning("Failed to mark users as enrolled", exc_info=True)
+
+
+def get_group_enrollment_queue(
+    settings: Settings, db_session_maker: async_sessionmaker[AsyncSession]
+) -> GroupEnrollmentQueue:
+    return GroupEnrollmentQueue(
+        settings.GARDEN_USERS_GROUP_ID,
+        db_session_maker,
+        batch_size=settings.GROUP_ENROLLMENT_BATCH_SIZE,
+        max_retries=settings.MAX_RETRY_COUNT,
+        retry_interval=settings.RETRY_INTERVAL_SECS,
+    )
+
 
+def add_users_to_group(group_id: str, identity_ids: list[UUID]) -> None:
+    """Add the identities as members of a Globus group, in one call.
 
-def _create_service_groups_manager() -> glb.GroupsManager:
-    """Return a globus_sdk GroupsManager acting as the backend service.
+    Globus skips identities that are already in the group.
 
-    Returns:
-        globus_sdk.GroupsManager: Groups manager acting as the backend service.
+    Args:
+        group_id (str): The group to add them to.
+        identity_ids (list[UUID]): The identities to add.
+
+    Raises:
+        globus_sdk.GlobusAPIError: when there is an issue communicating with Globus services
     """
-    gc = _create_service_groups_client()
-    return glb.GroupsManager(client=gc)
+    groups_client = _create_service_groups_client()
+    actions = glb.BatchMembershipActions().add_members(identity_ids)
+    with external_call("globus_groups", "add members"):
+        response = groups_client.batch_membership_action(group_id, actions)
 
+    # e.g. for identities that were already members
+    if errors := response.get("errors", {}).get("add"):
+        logger.info("Globus didn't add some users to the group", errors=errors)
 
+
+@lru_cache
 def _create_service_groups_client() -> glb.GroupsClient:
     """Return a globus_sdk GroupsClient acting as the backend service.
 
+    The client is shared, and so is its token: the authorizer only asks Globus
+    Auth for a new one shortly before the current one expires.
+
     Returns:
         globus_sdk.GroupsClient: Groups client acting as the backend service.
     """
-    gc = get_auth_client()
-    tokens = gc.oauth2_client_credentials_tokens(
-        requested_scopes="urn:globus:auth:scope:groups.api.globus.org:all",
+    authorizer = glb.ClientCredentialsAuthorizer(
+        get_auth_client(), scopes=glb.GroupsClient.scopes.all
     )
-    auth_data = tokens.by_resource_server.get("groups.api.globus.org")
-    token = auth_data.get("access_token")
-    return _create_groups_client_with_token(token)
+    return glb.GroupsClient(authorizer=authorizer)
 
 
 def _create_groups_client_with_token(token: str) -> glb.GroupsClient:
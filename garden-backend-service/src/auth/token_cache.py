@@ -0,0 +1,202 @@
+"""Caches of Globus Auth token introspections.
+
+`TokenIntrospector` (see src/auth/globus_auth.py) always keeps introspections in
+the worker's memory. INTROSPECTION_CACHE_BACKEND picks a shared cache to check
+behind it, so a token introspected by one worker is known to the others too:
+
+- "memory": no shared cache, each worker introspects tokens itself (the default)
+- "sqlite": a SQLite file at INTROSPECTION_CACHE_SQLITE_PATH, shared by the workers on one host
+- "postgres": the token_introspection_cache table in the app's database, shared by every host
+
+Entries are keyed by a hash of the token, never the token itself. More backends
+can be added to `BACKENDS`.
+"""
+
+import asyncio
+import datetime
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Callable, NamedTuple, Protocol
+
+from cachetools import TLRUCache
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.config import Settings
+from src.models import TokenIntrospection
+
+# expired entries are deleted from the shared caches once every this many writes
+_PURGE_EVERY = 100
+
+
+class CachedIntrospection(NamedTuple):
+    data: dict
+    expires_at: float  # unix time
+
+
+class TokenCache(Protocol):
+    name: str
+
+    async def get(self, key: str) -> CachedIntrospection | None: ...
+
+    async def set(self, key: str, entry: CachedIntrospection) -> None: ...
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class MemoryTokenCache:
+    """Per-worker cache, evicting least-recently-used entries first once full."""
+
+    name = "memory"
+
+    def __init__(self, maxsize: int):
+        self._entries: TLRUCache = TLRUCache(
+            maxsize=maxsize,
+            ttu=lambda key, entry, now: entry.expires_at,
+            timer=time.time,
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> CachedIntrospection | None:
+        return self._entries.get(key)
+
+    async def set(self, key: str, entry: CachedIntrospection) -> None:
+        self._entries[key] = entry
+
+
+class SQLiteTokenCache:
+    """Cache in a SQLite file, shared by every worker that opens the same `path`."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS token_introspection_cache "
+                "(token_hash TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite connections can't be shared between threads, so each gets its own
+        if (db := getattr(self._local, "db", None)) is None:
+            db = sqlite3.connect(self.path, timeout=1)
+            # WAL lets workers read while another is writing
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    async def get(self, key: str) -> CachedIntrospection | None:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, entry: CachedIntrospection) -> None:
+        await asyncio.to_thread(self._set, key, entry)
+
+    def _get(self, key: str) -> CachedIntrospection | None:
+        row = (
+            self._connect()
+            .execute(
+                "SELECT data, expires_at FROM token_introspection_cache "
+                "WHERE token_hash = ? AND expires_at > ?",
+                (key, time.time()),
+            )
+            .fetchone()
+        )
+        return CachedIntrospection(json.loads(row[0]), row[1]) if row else None
+
+    def _set(self, key: str, entry: CachedIntrospection) -> None:
+        self._writes += 1
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO token_introspection_cache VALUES (?, ?, ?)",
+                (key, json.dumps(entry.data), entry.expires_at),
+            )
+            if self._writes % _PURGE_EVERY == 0:
+                db.execute(
+                    "DELETE FROM token_introspection_cache WHERE expires_at <= ?",
+                    (time.time(),),
+                )
+
+
+class PostgresTokenCache:
+    """Cache in the (unlogged) token_introspection_cache table, shared by every host."""
+
+    name = "postgres"
+
+    def __init__(self, db_session_maker: async_sessionmaker[AsyncSession]):
+        self.db_session_maker = db_session_maker
+        self._writes = 0
+
+    async def get(self, key: str) -> CachedIntrospection | None:
+        async with self.db_session_maker() as db:
+            row = (
+                await db.execute(
+                    select(
+                        TokenIntrospection.data, TokenIntrospection.expires_at
+                    ).where(
+                        TokenIntrospection.token_hash == key,
+                        TokenIntrospection.expires_at > _now(),
+                    )
+                )
+            ).first()
+        return (
+            CachedIntrospection(row.data, row.expires_at.timestamp()) if row else None
+        )
+
+    async def set(self, key: str, entry: CachedIntrospection) -> None:
+        self._writes += 1
+        expires_at = datetime.datetime.fromtimestamp(
+            entry.expires_at, datetime.timezone.utc
+        )
+        stmt = insert(TokenIntrospection).values(
+            token_hash=key, data=entry.data, expires_at=expires_at
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TokenIntrospection.token_hash],
+            set_={"data": stmt.excluded.data, "expires_at": stmt.excluded.expires_at},
+        )
+        async with self.db_session_maker() as db:
+            await db.execute(stmt)
+            if self._writes % _PURGE_EVERY == 0:
+                await db.execute(
+                    delete(TokenIntrospection).where(
+                        TokenIntrospection.expires_at <= _now()
+                    )
+                )
+            await db.commit()
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+BACKENDS: dict[
+    str, Callable[[Settings, async_sessionmaker[AsyncSession]], TokenCache | None]
+] = {
+    "memory": lambda settings, db_session_maker: None,
+    "sqlite": lambda settings, db_session_maker: SQLiteTokenCache(
+        settings.INTROSPECTION_CACHE_SQLITE_PATH
+    ),
+    "postgres": lambda settings, db_session_maker: PostgresTokenCache(db_session_maker),
+}
+
+
+def get_shared_token_cache(
+    settings: Settings, db_session_maker: async_sessionmaker[AsyncSession]
+) -> TokenCache | None:
+    """Create the shared cache set by INTROSPECTION_CACHE_BACKEND, if any."""
+    if settings.INTROSPECTION_CACHE_BACKEND not in BACKENDS:
+        raise ValueError(
+            f"Unknown INTROSPECTION_CACHE_BACKEND: {settings.INTROSPECTION_CACHE_BACKEND}"
+        )
+    return BACKENDS[settings.INTROSPECTION_CACHE_BACKEND](settings, db_session_maker)
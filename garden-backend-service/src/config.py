@@ -37,6 +37,8 @@ class Settings(BaseSettings):
     )
 
     GARDEN_USERS_GROUP_ID: str
+    # most new users added to the group in one Globus call
+    GROUP_ENROLLMENT_BATCH_SIZE: int = 100
 
     DATACITE_REPO_ID: str
     DATACITE_PASSWORD: str
@@ -51,12 +53,36 @@ class Settings(BaseSettings):
 
     GLOBUS_SEARCH_INDEX_ID: str
     SYNC_SEARCH_INDEX: bool
+    # for retrying calls to Globus made in the background (e.g. group enrollment)
     RETRY_INTERVAL_SECS: int
     MAX_RETRY_COUNT: int
 
     DB_USERNAME: str
     DB_PASSWORD: str
     DB_ENDPOINT: str
+    # connection pool settings for the per-worker engine created in main.lifespan
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECS: int = 30
+    DB_POOL_RECYCLE_SECS: int = 30 * 60
+    DB_POOL_PRE_PING: bool = True
+    # optional read replica for read-only routes; they use the primary when unset
+    DB_REPLICA_ENDPOINT: str | None = None
+    # send a caller's reads to the primary for this long after they write (0 = off)
+    DB_READ_YOUR_WRITES_SECS: int = 0
+
+    # per-worker cache of /gardens/search responses (0 = off)
+    SEARCH_CACHE_SIZE: int = 1024
+    SEARCH_CACHE_TTL_SECS: int = 60
+
+    # cache of Globus Auth token introspections (see src/auth/token_cache.py)
+    INTROSPECTION_CACHE_SIZE: int = 1024
+    INTROSPECTION_CACHE_TTL_SECS: int = 5 * 60
+    # how long an inactive (expired, revoked or bogus) token is remembered
+    INTROSPECTION_CACHE_INVALID_TTL_SECS: int = 30
+    # cache shared between workers: memory (i.e. none), sqlite or postgres
+    INTROSPECTION_CACHE_BACKEND: str = "memory"
+    INTROSPECTION_CACHE_SQLITE_PATH: str = "introspection_cache.sqlite3"
 
     MDF_API_CLIENT_ID: str
     MDF_API_CLIENT_SECRET: str
@@ -69,14 +95,35 @@ class Settings(BaseSettings):
     MODAL_USE_LOCAL: bool = False
     MODAL_VIP_LIST: list[str]
     MODAL_USAGE_LIMIT: float = 5.0
+    # how long a worker caches a user's monthly usage total (0 = off)
+    MODAL_USAGE_CACHE_TTL_SECS: float = 5
+    # per-worker cache of deployed Modal function handles (0 = off)
+    MODAL_FUNCTION_CACHE_SIZE: int = 1024
+    MODAL_FUNCTION_CACHE_TTL_SECS: int = 5 * 60
+    # longest a GET /modal-invocations/{function_call_id} request waits for a result
+    MODAL_POLL_TIMEOUT_SECS: float = 50
+    # spawned calls are billed for this long up front, and settled when their result is collected
+    MODAL_SPAWN_RESERVED_SECS: float = 5 * 60
 
     GARDEN_SEARCH_SQL_DIR: str = "src/api/search/sql.sql"
 
+    # where finished request traces go: none, log, file or otlp (see src/tracing.py)
+    TRACING_EXPORTER: str = "none"
+    TRACING_FILE_PATH: str = "traces.jsonl"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+
     @computed_field
     @property
     def SQLALCHEMY_DATABASE_URL(self) -> str:
         return f"postgresql+asyncpg://{self.DB_USERNAME}:{self.DB_PASSWORD}@{self.DB_ENDPOINT}/garden_db_{self.GARDEN_ENV}"
 
+    @computed_field
+    @property
+    def SQLALCHEMY_REPLICA_DATABASE_URL(self) -> str | None:
+        if self.DB_REPLICA_ENDPOINT is None:
+            return None
+        return f"postgresql+asyncpg://{self.DB_USERNAME}:{self.DB_PASSWORD}@{self.DB_REPLICA_ENDPOINT}/garden_db_{self.GARDEN_ENV}"
+
     model_config = SettingsConfigDict(env_file=_dotenv_path, case_sensitive=True)
 
     @classmethod
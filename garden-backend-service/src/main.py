@@ -2,12 +2,18 @@ import os
 from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from prometheus_client import CONTENT_TYPE_LATEST
 
 import src.logging  # noqa  # import to ensure logger is configured
-from src.api.dependencies.database import async_init
+from src.api.dependencies.database import (
+    async_init,
+    create_db_engine,
+    get_db_session_maker,
+    get_recent_writers,
+)
+from src.api.dependencies.modal import SharedModalClient, get_modal_function_cache
 from src.api.routes import (
     docker_push_token,
     doi,
@@ -20,34 +26,68 @@ from src.api.routes import (
     users,
 )
 from src.api.routes.mdf import search as mdf_search
-from src.config import Settings, get_settings
-from src.middleware.logging import (
-    ErrorHandlingMiddleware,
-    LogProcessTimeMiddleware,
-    LogRequestIdMiddleware,
-)
-
-
-def get_db_session_maker(settings: Settings) -> async_sessionmaker[AsyncSession]:
-    postgres_url = settings.SQLALCHEMY_DATABASE_URL
-    engine = create_async_engine(postgres_url, echo=False)
-    return async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+from src.api.search.cache import get_search_cache
+from src.auth.globus_auth import get_token_introspector
+from src.auth.globus_groups import get_group_enrollment_queue
+from src.config import get_settings
+from src.metrics import instrument_db_pool, render_metrics
+from src.middleware.logging import RequestContextMiddleware
+from src.tracing import configure_tracing, shutdown_tracing
+from src.usage import get_monthly_usage_cache
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     settings = get_settings()
-    db_session = get_db_session_maker(settings=settings)
+    configure_tracing(settings)
+
+    # one engine (and connection pool) per worker, shared by every request
+    engine = create_db_engine(settings)
+    instrument_db_pool(engine, "primary")
+    app.state.db_engine = engine
+    app.state.db_session_maker = get_db_session_maker(engine)
+
+    # read-only routes use the replica if there is one, otherwise the primary
+    if settings.SQLALCHEMY_REPLICA_DATABASE_URL is not None:
+        readonly_engine = create_db_engine(
+            settings, settings.SQLALCHEMY_REPLICA_DATABASE_URL
+        )
+        instrument_db_pool(readonly_engine, "replica")
+    else:
+        readonly_engine = engine
+    app.state.readonly_db_engine = readonly_engine
+    app.state.readonly_db_session_maker = get_db_session_maker(readonly_engine)
+    app.state.recent_writers = get_recent_writers(settings)
+    app.state.search_cache = get_search_cache(settings)
+    app.state.token_introspector = get_token_introspector(
+        settings, app.state.db_session_maker
+    )
+    app.state.group_enrollment = get_group_enrollment_queue(
+        settings, app.state.db_session_maker
+    )
+    app.state.group_enrollment.start()
+    app.state.modal_client = SharedModalClient(
+        settings.MODAL_TOKEN_ID, settings.MODAL_TOKEN_SECRET
+    )
+    app.state.modal_function_cache = get_modal_function_cache(settings)
+    app.state.monthly_usage_cache = get_monthly_usage_cache(settings)
 
     # Set Modal env variables
     os.environ["MODAL_TOKEN_ID"] = settings.MODAL_TOKEN_ID
     os.environ["MODAL_TOKEN_SECRET"] = settings.MODAL_TOKEN_SECRET
 
     # load text-search sql
-    await async_init(db_session, Path(settings.GARDEN_SEARCH_SQL_DIR))
+    await async_init(app.state.db_session_maker, Path(settings.GARDEN_SEARCH_SQL_DIR))
 
     yield
 
+    await app.state.group_enrollment.stop()
+    await app.state.modal_client.close()
+    await engine.dispose()
+    if readonly_engine is not engine:
+        await readonly_engine.dispose()
+    shutdown_tracing()
+
 
 app = FastAPI(lifespan=lifespan)
 
@@ -57,9 +97,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-app.add_middleware(ErrorHandlingMiddleware)
-app.add_middleware(LogProcessTimeMiddleware)
-app.add_middleware(LogRequestIdMiddleware)
+app.add_middleware(RequestContextMiddleware)
 
 app.include_router(greet.router)
 app.include_router(doi.router)
@@ -80,3 +118,9 @@ app.include_router(mdf_search.router)
 @app.get("/")
 async def greet_world():
     return {"Hello there": "You must be World"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics, see src/metrics.py"""
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
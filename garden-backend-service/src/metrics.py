@@ -0,0 +1,107 @@
+"""Prometheus metrics for the service, served at /metrics.
+
+Each worker process keeps its own metrics. When running more than one worker,
+set the PROMETHEUS_MULTIPROC_DIR environment variable to an empty directory
+shared by all of them (and cleared on each deploy) before they start. Workers then
+write their metrics there and /metrics reports the total across every worker,
+whichever one serves the scrape. The process manager should also call
+`prometheus_client.multiprocess.mark_process_dead(pid)` when a worker exits
+(e.g. from gunicorn's `child_exit` hook), so the pool gauges only count live workers.
+
+see: https://prometheus.github.io/client_python/multiprocess/
+"""
+
+import os
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+REQUEST_LATENCY = Histogram(
+    "garden_http_request_duration_seconds",
+    "Time to handle a request, by route template",
+    ["method", "route"],
+)
+REQUESTS = Counter(
+    "garden_http_requests_total",
+    "Requests handled, by route template and status code",
+    ["method", "route", "status_code"],
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "garden_db_pool_checked_out_connections",
+    "Database connections currently in use",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "garden_db_pool_overflow_connections",
+    "Database connections open beyond the pool size",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+CACHE_REQUESTS = Counter(
+    "garden_cache_requests_total",
+    "Cache lookups, by cache and result (hit, miss, coalesced or bypass)",
+    ["cache", "result"],
+)
+CACHE_ENTRIES = Gauge(
+    "garden_cache_entries",
+    "Entries currently held in a cache",
+    ["cache"],
+    multiprocess_mode="livesum",
+)
+CACHE_MAX_ENTRIES = Gauge(
+    "garden_cache_max_entries",
+    "Most entries a cache holds (per worker)",
+    ["cache"],
+    multiprocess_mode="livemax",
+)
+CACHE_TTL = Gauge(
+    "garden_cache_ttl_seconds",
+    "How long a cache keeps an entry",
+    ["cache"],
+    multiprocess_mode="livemax",
+)
+UPSTREAM_LATENCY = Histogram(
+    "garden_upstream_request_duration_seconds",
+    "Time spent in calls to other services (Globus, Modal, Datacite, ...)",
+    ["service"],
+)
+
+
+def instrument_db_pool(engine: AsyncEngine, pool: str) -> None:
+    """Keep the pool gauges current as connections are checked in and out of `engine`."""
+    sync_pool = engine.sync_engine.pool
+    if not hasattr(sync_pool, "size"):
+        # e.g. NullPool, which doesn't hold on to connections
+        return
+    checked_out = 0
+
+    def update(change: int) -> None:
+        nonlocal checked_out
+        checked_out += change
+        DB_POOL_CHECKED_OUT.labels(pool=pool).set(checked_out)
+        # connections beyond the pool size are closed as soon as they're checked in
+        DB_POOL_OVERFLOW.labels(pool=pool).set(max(checked_out - sync_pool.size(), 0))
+
+    event.listen(sync_pool, "checkout", lambda *args: update(1))
+    event.listen(sync_pool, "checkin", lambda *args: update(-1))
+    update(0)
+
+
+def render_metrics() -> bytes:
+    """Render every metric in the Prometheus text format, across all workers if configured."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
@@ -2,74 +2,106 @@ import time
 import uuid
 
 import structlog
-from fastapi import HTTPException, Request, Response
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from src.metrics import REQUEST_LATENCY, REQUESTS
+from src.middleware.timing import track_request_timings
+from src.tracing import start_trace
 
-class LogRequestIdMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
 
-    async def dispatch(self, request: Request, call_next):
-        request_id = str(uuid.uuid4())
-        request.state.request_id = request_id
-
-        # Add request ID to the structlog context when processing the request
-        with structlog.contextvars.bound_contextvars(request_id=request_id):
-            response = await call_next(request)
-
-        # Add request ID to the response headers
-        response.headers["X-Request-ID"] = request_id
+class RequestContextMiddleware:
+    """Give each request an ID, time it, log it and turn unhandled errors into 500s.
 
-        return response
+    - The request ID goes in `request.state.request_id`, the structlog context, the
+      X-Request-ID response header and is the request's trace ID.
+    - Once the request is handled it's logged ("Request processed") and recorded in
+      the request metrics. The response carries its X-Process-Time and a
+      Server-Timing breakdown of its DB and outside-service time.
+    - Unhandled exceptions are logged and answered with a generic 500.
 
+    This is a plain ASGI middleware rather than a BaseHTTPMiddleware, so the
+    response body is passed straight through and the endpoint runs in the same
+    task (and contextvars context) as the middleware.
+    """
 
-class LogProcessTimeMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        response: Response = await call_next(request)
-
-        process_time = (time.time() - start_time) * 1000
-        formatted_process_time = f"{process_time:.2f}"
-
-        # Log the request details and timing
+        request_id = str(uuid.uuid4())
+        scope.setdefault("state", {})["request_id"] = request_id
+        method, path = scope["method"], scope["path"]
         logger = structlog.get_logger()
-        logger.info(
-            "Request processed",
-            method=request.method,
-            path=request.url.path,
-            status_code=response.status_code,
-            process_time_ms=formatted_process_time,
-        )
-
-        response.headers["X-Process-Time"] = formatted_process_time
-
-        return response
-
-
-class ErrorHandlingMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
-
-    async def dispatch(self, request: Request, call_next):
-        try:
-            return await call_next(request)
-        except HTTPException:
-            raise
-        except Exception:
-            logger = structlog.get_logger()
-            logger.error(
-                "Unhandled exception",
-                exc_info=True,
-                method=request.method,
-                path=request.url.path,
-            )
-
-            return JSONResponse(
-                status_code=500, content={"detail": "Internal Server Error"}
-            )
+        start_time = time.perf_counter()
+        status_code = 500
+        response_started = False
+
+        async def send_with_headers(message: Message) -> None:
+            nonlocal status_code, response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                status_code = message["status"]
+                process_time = (time.perf_counter() - start_time) * 1000
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-ID"] = request_id
+                headers["X-Process-Time"] = f"{process_time:.2f}"
+                headers["Server-Timing"] = timings.server_timing(process_time)
+            await send(message)
+
+        with (
+            structlog.contextvars.bound_contextvars(request_id=request_id),
+            start_trace(
+                uuid.UUID(request_id).hex,
+                f"{method} {path}",
+                **{"http.method": method, "http.target": path},
+            ) as root_span,
+            # count the queries and outside calls made while handling the request
+            track_request_timings() as timings,
+        ):
+            try:
+                await self.app(scope, receive, send_with_headers)
+            except Exception as e:
+                logger.error(
+                    "Unhandled exception", exc_info=True, method=method, path=path
+                )
+                if root_span is not None:
+                    root_span.end(e)
+                if response_started:
+                    # too late to replace the response
+                    raise
+                response = JSONResponse(
+                    status_code=500, content={"detail": "Internal Server Error"}
+                )
+                await response(scope, receive, send_with_headers)
+            finally:
+                process_time = (time.perf_counter() - start_time) * 1000
+                # label by route template (e.g. /gardens/{doi:path}) rather than the
+                # raw path, so each DOI doesn't get a metric (or trace name) of its own
+                route = getattr(scope.get("route"), "path", None)
+                if root_span is not None:
+                    if route is not None:
+                        root_span.name = f"{method} {route}"
+                        root_span.attributes["http.route"] = route
+                    root_span.attributes["http.status_code"] = status_code
+
+                logger.info(
+                    "Request processed",
+                    method=method,
+                    path=path,
+                    status_code=status_code,
+                    process_time_ms=f"{process_time:.2f}",
+                    **timings.log_fields(),
+                )
+                route = route or "unmatched"
+                REQUEST_LATENCY.labels(method=method, route=route).observe(
+                    process_time / 1000
+                )
+                REQUESTS.labels(
+                    method=method, route=route, status_code=status_code
+                ).inc()
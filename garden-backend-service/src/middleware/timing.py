@@ -0,0 +1,135 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.metrics import UPSTREAM_LATENCY
+from src.tracing import SpanKind, span, start_span
+
+
+@dataclass
+class RequestTimings:
+    """Where a request spent its time outside of our own code.
+
+    Counts the SQL statements a request ran and the time spent running them, and
+    likewise calls to other services (Globus, Modal, Datacite, ...) by name.
+    """
+
+    db_queries: int = 0
+    db_time_ms: float = 0.0
+    external_calls: dict[str, int] = field(default_factory=dict)
+    external_time_ms: dict[str, float] = field(default_factory=dict)
+
+    def record_query(self, elapsed_ms: float) -> None:
+        self.db_queries += 1
+        self.db_time_ms += elapsed_ms
+
+    def record_external_call(self, service: str, elapsed_ms: float) -> None:
+        self.external_calls[service] = self.external_calls.get(service, 0) + 1
+        self.external_time_ms[service] = (
+            self.external_time_ms.get(service, 0.0) + elapsed_ms
+        )
+
+    def log_fields(self) -> dict[str, int | str]:
+        """Fields for the "Request processed" log line."""
+        fields: dict[str, int | str] = {
+            "db_queries": self.db_queries,
+            "db_time_ms": f"{self.db_time_ms:.2f}",
+        }
+        for service, calls in self.external_calls.items():
+            fields[f"{service}_calls"] = calls
+            fields[f"{service}_time_ms"] = f"{self.external_time_ms[service]:.2f}"
+        return fields
+
+    def server_timing(self, total_ms: float) -> str:
+        """Render a Server-Timing header value (https://w3c.github.io/server-timing/)."""
+        metrics = [
+            f'db;dur={self.db_time_ms:.2f};desc="{self.db_queries} queries"',
+            *(
+                f'{service};dur={self.external_time_ms[service]:.2f};desc="{calls} calls"'
+                for service, calls in self.external_calls.items()
+            ),
+            f"total;dur={total_ms:.2f}",
+        ]
+        return ", ".join(metrics)
+
+
+# the timings of the request being handled, if any. The object is shared (not
+# copied) with any tasks or threads the request spawns, so their work counts too.
+_request_timings: ContextVar[RequestTimings | None] = ContextVar(
+    "request_timings", default=None
+)
+
+
+@contextmanager
+def track_request_timings() -> Iterator[RequestTimings]:
+    """Collect the timings of everything run inside this block."""
+    timings = RequestTimings()
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def get_request_timings() -> RequestTimings | None:
+    return _request_timings.get()
+
+
+@contextmanager
+def external_call(service: str, operation: str | None = None) -> Iterator[None]:
+    """Count a call to another service, and the time it took, against the current request.
+
+    The time is also recorded in the upstream latency histogram served at /metrics,
+    and the call is traced as a span named for the service and `operation`.
+
+    e.g.
+        with external_call("globus_auth", "token introspect"):
+            client.oauth2_token_introspect(token)
+    """
+    start = time.perf_counter()
+    try:
+        name = f"{service} {operation}" if operation else service
+        with span(name, SpanKind.CLIENT, **{"peer.service": service}):
+            yield
+    finally:
+        elapsed = time.perf_counter() - start
+        UPSTREAM_LATENCY.labels(service=service).observe(elapsed)
+        if (timings := _request_timings.get()) is not None:
+            timings.record_external_call(service, elapsed * 1000)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    query_span = start_span(
+        "db.query",
+        SpanKind.CLIENT,
+        **{"db.system": "postgresql", "db.statement": statement[:2000]},
+    )
+    conn.info.setdefault("running_queries", []).append(
+        (time.perf_counter(), query_span)
+    )
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    _finish_query(conn)
+
+
+@event.listens_for(Engine, "handle_error")
+def _record_failed_query(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("running_queries"):
+        _finish_query(conn, exception_context.original_exception)
+
+
+def _finish_query(conn, error: BaseException | None = None) -> None:
+    start, query_span = conn.info["running_queries"].pop()
+    if query_span is not None:
+        query_span.end(error)
+    if (timings := _request_timings.get()) is not None:
+        timings.record_query((time.perf_counter() - start) * 1000)
@@ -6,4 +6,6 @@ from .modal.modal_app import ModalApp  # noqa
 from .modal.modal_function import ModalFunction  # noqa
 from .modal.modal_app import ModalApp  # noqa
 from .modal.invocations import ModalInvocation  # noqa
+from .modal.usage import UserMonthlyUsage  # noqa
+from .token_introspection import TokenIntrospection  # noqa
 from .user import User  # noqa
@@ -1,24 +1,168 @@
+import asyncio
+from collections.abc import Iterable
+from functools import lru_cache
 from typing import Any, Optional, Type, TypeVar
 
-from sqlalchemy import select
+from sqlalchemy import bindparam, event, select
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.asyncio import AsyncAttrs, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.orm.attributes import QueryableAttribute
 from sqlalchemy.orm.relationships import RelationshipProperty
+from sqlalchemy.sql.selectable import Select
+
+from src.metrics import CACHE_REQUESTS
 
 T = TypeVar("T", bound="Base")
 
+# sqlalchemy's CacheStats for a statement, as a cache request result; anything else
+# (e.g. a statement that can't be cached) counts as a bypass
+_COMPILED_CACHE_RESULTS = {"CACHE_HIT": "hit", "CACHE_MISS": "miss"}
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_compiled_cache_requests(conn, cursor, statement, parameters, context, many):
+    """Count how often sqlalchemy's compiled cache could reuse a statement's SQL."""
+    if context is not None and context.compiled is not None:
+        result = _COMPILED_CACHE_RESULTS.get(context.cache_hit.name, "bypass")
+        CACHE_REQUESTS.labels(cache="compiled_sql", result=result).inc()
+
+
+@lru_cache(maxsize=256)
+def _lookup_statement(
+    model: type["Base"], fields: tuple[str, ...], null_fields: tuple[str, ...]
+) -> Select:
+    """Build the SELECT behind `model.get(**kwargs)` once per lookup shape.
+
+    Values are left as bind parameters named after their fields, so the same
+    statement object (and its compiled SQL) is reused for every lookup of that shape.
+    """
+    stmt = select(model)
+    for field in fields:
+        stmt = stmt.where(getattr(model, field) == bindparam(field))
+    for field in null_fields:
+        stmt = stmt.where(getattr(model, field).is_(None))
+    return stmt
+
+
+@lru_cache(maxsize=256)
+def _batch_statement(model: type["Base"], field: str) -> Select:
+    """Build the `SELECT ... WHERE field IN (...)` behind batched loads once per (model, field)."""
+    return select(model).where(
+        getattr(model, field).in_(bindparam("keys", expanding=True))
+    )
+
+
+class _BatchLoader:
+    """Coalesce `Base.load`/`Base.load_many` calls into one `IN (...)` query per (model, field).
+
+    Keys requested during the same event-loop tick (e.g. from coroutines passed to
+    `asyncio.gather`) are collected, then looked up together on the next tick.
+
+    One loader lives in each session's `info` dict, so batching is scoped to a
+    single session (i.e. a single request).
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self._pending: dict[tuple[type["Base"], str], dict[Any, asyncio.Future]] = {}
+        # an AsyncSession can only run one query at a time, so batches take turns
+        self._lock = asyncio.Lock()
+        self._tasks: set[asyncio.Task] = set()
+
+    @classmethod
+    def for_session(cls, db: AsyncSession) -> "_BatchLoader":
+        if "batch_loader" not in db.info:
+            db.info["batch_loader"] = cls(db)
+        return db.info["batch_loader"]
+
+    def load(self, model: type["Base"], field: str, key: Any) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        if not self._pending:
+            loop.call_soon(self._dispatch)
+
+        batch = self._pending.setdefault((model, field), {})
+        if key not in batch:
+            batch[key] = loop.create_future()
+        return batch[key]
+
+    def _dispatch(self) -> None:
+        pending, self._pending = self._pending, {}
+        task = asyncio.ensure_future(self._run(pending))
+        # hold a reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, pending: dict) -> None:
+        results: dict[tuple[type["Base"], str], dict[Any, Any]] = {}
+        try:
+            async with self._lock:
+                for (model, field), batch in pending.items():
+                    rows = await self.db.scalars(
+                        _batch_statement(model, field), {"keys": list(batch)}
+                    )
+                    results[(model, field)] = {
+                        getattr(row, field): row for row in rows.all()
+                    }
+        except BaseException as e:
+            # resolve every waiting caller, even if this task was cancelled (e.g. the
+            # session closed under it), so none of them are left hanging
+            for batch in pending.values():
+                for future in batch.values():
+                    if future.done():
+                        continue
+                    if isinstance(e, asyncio.CancelledError):
+                        future.cancel()
+                    else:
+                        future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        # only hand results back once every batch is done, so callers never
+        # touch the session while this task is still using it
+        for key, batch in pending.items():
+            for value, future in batch.items():
+                if not future.done():
+                    future.set_result(results[key].get(value))
+
 
 class Base(AsyncAttrs, DeclarativeBase):
     __abstract__ = True
 
     @classmethod
     async def get(cls: Type[T], db: AsyncSession, **kwargs: Any) -> Optional[T]:
-        q = select(cls)
-        for field, value in kwargs.items():
-            q = q.where(getattr(cls, field) == value)
+        params = {field: value for field, value in kwargs.items() if value is not None}
+        null_fields = tuple(sorted(kwargs.keys() - params.keys()))
+        misses = _lookup_statement.cache_info().misses
+        stmt = _lookup_statement(cls, tuple(sorted(params)), null_fields)
+        result = "miss" if _lookup_statement.cache_info().misses > misses else "hit"
+        CACHE_REQUESTS.labels(cache="lookup_statements", result=result).inc()
+
+        return (await db.execute(stmt, params)).scalar_one_or_none()
+
+    @classmethod
+    async def load(cls: Type[T], db: AsyncSession, field: str, key: Any) -> Optional[T]:
+        """Look up a single instance by a unique `field`, batched with any other loads this tick.
+
+        e.g. `await asyncio.gather(User.load(db, "identity_id", uuid), Garden.load(db, "doi", doi))`
+        issues one query per model rather than one per lookup.
+        """
+        return await _BatchLoader.for_session(db).load(cls, field, key)
 
-        return (await db.execute(q)).scalar_one_or_none()
+    @classmethod
+    async def load_many(
+        cls: Type[T], db: AsyncSession, field: str, keys: Iterable[Any]
+    ) -> list[Optional[T]]:
+        """Look up instances by a unique `field` in a single batched `IN (...)` query.
+
+        Returns one result per key, in order, with None for keys that weren't found.
+        Keys must have the same type as the column's python values (e.g. UUID, not str).
+        """
+        loader = _BatchLoader.for_session(db)
+        return list(
+            await asyncio.gather(*(loader.load(cls, field, key) for key in keys))
+        )
 
     @classmethod
     async def get_or_create(
@@ -1,6 +1,6 @@
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, String
+from sqlalchemy import ForeignKey, Index, String
 from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import Mapped, mapped_column, relationship, synonym
 
@@ -20,6 +20,16 @@ else:
 
 class Garden(Base):
     __tablename__ = "gardens"
+    __table_args__ = (
+        # back keyset pagination of search results sorted by these fields
+        Index("ix_gardens_title_id", "title", "id"),
+        Index("ix_gardens_year_id", "year", "id"),
+        # back the overlap/contains search filters (and year filters use the index above)
+        Index("ix_gardens_tags", "tags", postgresql_using="gin"),
+        Index("ix_gardens_authors", "authors", postgresql_using="gin"),
+        Index("ix_gardens_contributors", "contributors", postgresql_using="gin"),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str]
     doi: Mapped[str] = mapped_column(unique=True)
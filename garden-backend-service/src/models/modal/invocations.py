@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 import datetime
 
-from sqlalchemy import DateTime, ForeignKey, func
+from sqlalchemy import DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from src.models.base import Base
@@ -10,12 +10,20 @@ from src.models.base import Base
 
 class ModalInvocation(Base):
     __tablename__ = "modal_invocations"
+    __table_args__ = (
+        Index("ix_modal_invocations_user_id_date_invoked", "user_id", "date_invoked"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     function_id: Mapped[int] = mapped_column(ForeignKey("modal_functions.id"))
-    function_call_id: Mapped[str]
+    function_call_id: Mapped[str] = mapped_column(index=True)
     date_invoked: Mapped[datetime.datetime] = mapped_column(
         DateTime(), server_default=func.now()
     )
-    execution_time_seconds: Mapped[float]
-    estimated_usage: Mapped[float]
+    # left empty for spawned calls until their result is collected, until then
+    # estimated_usage is what's reserved for them (see MODAL_SPAWN_RESERVED_SECS)
+    execution_time_seconds: Mapped[float | None]
+    estimated_usage: Mapped[float | None]
+    # set for map calls, which are recorded once with the time and usage of all
+    # their collected outputs; None for calls with a single input
+    num_inputs: Mapped[int | None]
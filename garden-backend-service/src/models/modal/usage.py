@@ -0,0 +1,16 @@
+import datetime
+
+from sqlalchemy import Date, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.models.base import Base
+
+
+class UserMonthlyUsage(Base):
+    """A user's total estimated Modal usage for one month (see src/usage/monthly_usage.py)."""
+
+    __tablename__ = "user_monthly_usage"
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    # the first day of the month
+    month: Mapped[datetime.date] = mapped_column(Date(), primary_key=True)
+    estimated_usage: Mapped[float] = mapped_column(default=0.0)
@@ -0,0 +1,20 @@
+import datetime
+
+from sqlalchemy import DateTime, String
+from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.models.base import Base
+
+
+class TokenIntrospection(Base):
+    """A Globus Auth token introspection, shared by every worker (see src/auth/token_cache.py)."""
+
+    __tablename__ = "token_introspection_cache"
+    # only a cache, so it needn't survive a crash (and skipping the WAL makes writes cheap)
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+    token_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    data: Mapped[dict] = mapped_column(JSON)
+    expires_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), index=True
+    )
@@ -1,7 +1,7 @@
 from typing import TYPE_CHECKING
 from uuid import UUID
 
-from sqlalchemy import String
+from sqlalchemy import String, false
 from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -24,6 +24,10 @@ class User(Base):
     domains: Mapped[list[str] | None] = mapped_column(postgresql.ARRAY(String))
     affiliations: Mapped[list[str] | None] = mapped_column(postgresql.ARRAY(String))
     profile_pic_id: Mapped[int | None]
+    # whether they've been added to the Garden Users Globus group (see src/auth/globus_groups.py)
+    enrolled_in_group: Mapped[bool] = mapped_column(
+        default=False, server_default=false()
+    )
 
     saved_gardens: Mapped[list["Garden"]] = relationship(
         "Garden",
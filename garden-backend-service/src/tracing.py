@@ -0,0 +1,302 @@
+"""Request tracing.
+
+Each request is traced, using its request ID (see `RequestContextMiddleware`) as
+the trace ID. Spans are recorded around every database statement and every call
+to another service (see `src.middleware.timing.external_call`). Use `span()` to
+time anything else.
+
+Finished traces go to the exporter named by the TRACING_EXPORTER setting. Spans
+are in the OTLP JSON format, so any OpenTelemetry-compatible tool can read them:
+
+- "none": tracing is off (the default)
+- "log": one log line per span
+- "file": append each trace to TRACING_FILE_PATH as a line of OTLP JSON, for use offline
+- "otlp": POST each trace to the OTLP/HTTP collector at TRACING_OTLP_ENDPOINT
+
+More exporters can be added to `EXPORTERS`.
+"""
+
+import json
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Callable, Iterator, Protocol
+
+import httpx
+import structlog
+
+from src.config import Settings
+
+logger = structlog.get_logger(__name__)
+
+SERVICE_NAME = "garden-backend"
+
+
+class SpanKind(IntEnum):
+    # values from the OTLP spec
+    INTERNAL = 1
+    SERVER = 2
+    CLIENT = 3
+
+
+@dataclass
+class Trace:
+    trace_id: str
+    spans: list["Span"] = field(default_factory=list)
+
+
+@dataclass
+class Span:
+    name: str
+    trace: Trace
+    parent_id: str | None = None
+    kind: SpanKind = SpanKind.INTERNAL
+    attributes: dict[str, Any] = field(default_factory=dict)
+    span_id: str = field(default_factory=lambda: secrets.token_hex(8))
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int | None = None
+    error: str | None = None
+
+    def end(self, error: BaseException | None = None) -> None:
+        """Finish the span, marking it failed if there was an `error`. Only the first call counts."""
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.trace.spans.append(self)
+
+    def to_otlp(self) -> dict:
+        otlp = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": int(self.kind),
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": (
+                {"code": 2, "message": self.error} if self.error else {"code": 1}
+            ),
+        }
+        if self.parent_id is not None:
+            otlp["parentSpanId"] = self.parent_id
+        return otlp
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict]:
+    def value(v: Any) -> dict:
+        if isinstance(v, bool):
+            return {"boolValue": v}
+        if isinstance(v, int):
+            return {"intValue": str(v)}
+        if isinstance(v, float):
+            return {"doubleValue": v}
+        return {"stringValue": str(v)}
+
+    return [{"key": k, "value": value(v)} for k, v in attributes.items()]
+
+
+def to_otlp_request(spans: list[Span]) -> dict:
+    """Wrap spans in an OTLP ExportTraceServiceRequest."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": _otlp_attributes({"service.name": SERVICE_NAME})
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": __name__},
+                        "spans": [span.to_otlp() for span in spans],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class SpanExporter(Protocol):
+    def export(self, spans: list[Span]) -> None: ...
+
+    def shutdown(self) -> None: ...
+
+
+class LogSpanExporter:
+    def export(self, spans: list[Span]) -> None:
+        for span in spans:
+            logger.info(
+                "span",
+                span_name=span.name,
+                trace_id=span.trace.trace_id,
+                span_id=span.span_id,
+                parent_span_id=span.parent_id,
+                duration_ms=f"{((span.end_ns or span.start_ns) - span.start_ns) / 1e6:.2f}",
+                error=span.error,
+                **span.attributes,
+            )
+
+    def shutdown(self) -> None:
+        pass
+
+
+class FileSpanExporter:
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: list[Span]) -> None:
+        with open(self.path, "a") as f:
+            f.write(json.dumps(to_otlp_request(spans)) + "\n")
+
+    def shutdown(self) -> None:
+        pass
+
+
+class OTLPSpanExporter:
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.client = httpx.Client(timeout=10)
+
+    def export(self, spans: list[Span]) -> None:
+        response = self.client.post(self.endpoint, json=to_otlp_request(spans))
+        response.raise_for_status()
+
+    def shutdown(self) -> None:
+        self.client.close()
+
+
+EXPORTERS: dict[str, Callable[[Settings], SpanExporter]] = {
+    "log": lambda settings: LogSpanExporter(),
+    "file": lambda settings: FileSpanExporter(settings.TRACING_FILE_PATH),
+    "otlp": lambda settings: OTLPSpanExporter(settings.TRACING_OTLP_ENDPOINT),
+}
+
+
+class BackgroundSpanExporter:
+    """Run another exporter on a background thread, so requests never wait on it."""
+
+    _STOP = object()
+
+    def __init__(self, exporter: SpanExporter, max_queued_traces: int = 1000):
+        self.exporter = exporter
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queued_traces)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def export(self, spans: list[Span]) -> None:
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            logger.warning("Dropped a trace, the exporter is falling behind")
+
+    def shutdown(self) -> None:
+        self._queue.put(self._STOP)
+        self._thread.join(timeout=10)
+        self.exporter.shutdown()
+
+    def _run(self) -> None:
+        while (spans := self._queue.get()) is not self._STOP:
+            try:
+                self.exporter.export(spans)
+            except Exception:
+                logger.warning("Failed to export a trace", exc_info=True)
+
+
+_exporter: SpanExporter | None = None
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def configure_tracing(settings: Settings) -> None:
+    """Start exporting traces as set by TRACING_EXPORTER."""
+    if settings.TRACING_EXPORTER == "none":
+        set_exporter(None)
+    elif settings.TRACING_EXPORTER in EXPORTERS:
+        exporter = EXPORTERS[settings.TRACING_EXPORTER](settings)
+        set_exporter(BackgroundSpanExporter(exporter))
+    else:
+        raise ValueError(f"Unknown TRACING_EXPORTER: {settings.TRACING_EXPORTER}")
+
+
+def set_exporter(exporter: SpanExporter | None) -> None:
+    global _exporter
+    if _exporter is not None:
+        _exporter.shutdown()
+    _exporter = exporter
+
+
+def shutdown_tracing() -> None:
+    set_exporter(None)
+
+
+@contextmanager
+def start_trace(trace_id: str, name: str, **attributes) -> Iterator[Span | None]:
+    """Trace everything run inside this block, and export it at the end.
+
+    Yields the root span, or None when tracing is off.
+    """
+    exporter = _exporter
+    if exporter is None:
+        yield None
+        return
+
+    root = Span(name, Trace(trace_id), kind=SpanKind.SERVER, attributes=attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.end(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        root.end()
+        exporter.export(root.trace.spans)
+
+
+def start_span(
+    name: str, kind: SpanKind = SpanKind.INTERNAL, **attributes
+) -> Span | None:
+    """Start a span in the current trace, if there is one. The caller must `end()` it.
+
+    Unlike `span()`, this doesn't make the new span the parent of spans started
+    after it, so it suits leaf operations timed by a pair of callbacks (e.g.
+    SQLAlchemy's before/after_cursor_execute events).
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    return Span(
+        name,
+        parent.trace,
+        parent_id=parent.span_id,
+        kind=kind,
+        attributes=attributes,
+    )
+
+
+@contextmanager
+def span(
+    name: str, kind: SpanKind = SpanKind.INTERNAL, **attributes
+) -> Iterator[Span | None]:
+    """Time this block as a span in the current trace.
+
+    Yields the span, or None if nothing is being traced.
+    """
+    current = start_span(name, kind, **attributes)
+    if current is None:
+        yield None
+        return
+
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
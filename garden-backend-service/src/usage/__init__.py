@@ -2,3 +2,8 @@
 # -*- coding: utf-8 -*-
 
 from .modal_usage import estimate_usage  # noqa
+from .monthly_usage import (  # noqa
+    add_monthly_usage,
+    get_monthly_usage,
+    get_monthly_usage_cache,
+)
@@ -0,0 +1,106 @@
+"""Running totals of each user's estimated Modal usage per month.
+
+Whenever usage is recorded on a ModalInvocation, `add_monthly_usage` adds it to
+the user's row in user_monthly_usage in the same transaction. So checking a user
+against MODAL_USAGE_LIMIT is a primary-key lookup rather than a sum over their
+whole history.
+
+Each worker also caches recent totals for MODAL_USAGE_CACHE_TTL_SECS. Committing
+new usage through a session from `get_db_session` drops the user's cached total
+in that worker. Other workers can undercount by the usage from the last few
+seconds, which is fine for a soft monthly limit.
+"""
+
+import datetime
+
+from cachetools import TTLCache
+from sqlalchemy import Date, cast, event, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+
+from src.config import Settings
+from src.metrics import CACHE_REQUESTS
+from src.models import UserMonthlyUsage
+
+CACHE_NAME = "monthly_usage"
+
+
+def _current_month() -> ColumnElement[datetime.date]:
+    # the database's clock, like ModalInvocation.date_invoked
+    return cast(func.date_trunc("month", func.now()), Date)
+
+
+async def add_monthly_usage(
+    db: AsyncSession,
+    user_id: int,
+    usage: float,
+    month: datetime.date | None = None,
+) -> None:
+    """Add usage to the user's total for `month` (by default the current one).
+
+    Doesn't commit, so the total is updated along with the invocations the usage
+    belongs to.
+    """
+    stmt = insert(UserMonthlyUsage).values(
+        user_id=user_id,
+        month=month if month is not None else _current_month(),
+        estimated_usage=usage,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserMonthlyUsage.user_id, UserMonthlyUsage.month],
+        set_={
+            "estimated_usage": UserMonthlyUsage.estimated_usage
+            + stmt.excluded.estimated_usage
+        },
+    )
+    await db.execute(stmt)
+    db.info.setdefault("changed_usage_users", set()).add(user_id)
+
+
+async def get_monthly_usage(
+    db: AsyncSession, user_id: int, cache: TTLCache | None = None
+) -> float:
+    """Get the user's total usage for the current month, from `cache` if it's there."""
+    if cache is not None:
+        usage = cache.get(user_id)
+        if usage is not None:
+            CACHE_REQUESTS.labels(cache=CACHE_NAME, result="hit").inc()
+            return usage
+        CACHE_REQUESTS.labels(cache=CACHE_NAME, result="miss").inc()
+
+    usage = await db.scalar(
+        select(UserMonthlyUsage.estimated_usage).where(
+            UserMonthlyUsage.user_id == user_id,
+            UserMonthlyUsage.month == _current_month(),
+        )
+    )
+    usage = usage or 0.0
+    if cache is not None:
+        cache[user_id] = usage
+    return usage
+
+
+def get_monthly_usage_cache(settings: Settings) -> TTLCache | None:
+    """Create the cache of users' monthly usage totals.
+
+    Returns None when caching is turned off.
+    """
+    if not settings.MODAL_USAGE_CACHE_TTL_SECS:
+        return None
+    return TTLCache(maxsize=10_000, ttl=settings.MODAL_USAGE_CACHE_TTL_SECS)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_monthly_usage(session: Session) -> None:
+    cache: TTLCache | None = session.info.get("monthly_usage_cache")
+    changed = session.info.pop("changed_usage_users", set())
+    if cache is not None:
+        for user_id in changed:
+            cache.pop(user_id, None)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_usage_users(session: Session) -> None:
+    session.info.pop("changed_usage_users", None)
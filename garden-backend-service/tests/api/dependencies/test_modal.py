@@ -0,0 +1,47 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.api.dependencies.modal import ModalFunctionCache, SharedModalClient
+
+
+@pytest.mark.asyncio
+async def test_shared_modal_client_connects_once(mocker):
+    mock_client = MagicMock()
+    mock_client.is_closed.return_value = False
+    from_credentials = mocker.patch(
+        "modal.client._Client.from_credentials", new=AsyncMock(return_value=mock_client)
+    )
+    shared = SharedModalClient("token-id", "token-secret")
+
+    clients = await asyncio.gather(*(shared.get() for _ in range(5)))
+
+    assert all(client is mock_client for client in clients)
+    from_credentials.assert_awaited_once_with("token-id", "token-secret")
+
+    mock_client._close = AsyncMock()
+    await shared.close()
+    mock_client._close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_function_cache_invalidates_by_app(mocker):
+    lookup = mocker.patch(
+        "modal.functions._Function.lookup",
+        new=AsyncMock(side_effect=lambda **kwargs: object()),
+    )
+    cache = ModalFunctionCache(maxsize=10, ttl=60)
+    client = MagicMock()
+
+    first = await cache.lookup("app", "fn", "dev", client)
+    assert await cache.lookup("app", "fn", "dev", client) is first
+    other_env = await cache.lookup("app", "fn", "prod", client)
+    other_app = await cache.lookup("other-app", "fn", "dev", client)
+    assert lookup.await_count == 3
+
+    cache.invalidate_app("app")
+    assert await cache.lookup("app", "fn", "dev", client) is not first
+    assert await cache.lookup("app", "fn", "prod", client) is not other_env
+    assert await cache.lookup("other-app", "fn", "dev", client) is other_app
+    assert lookup.await_count == 5
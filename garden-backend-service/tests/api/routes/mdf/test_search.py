@@ -1,3 +1,4 @@
+import json
 from unittest.mock import AsyncMock
 
 import httpx
@@ -71,8 +72,10 @@ async def test_search_with_db_entry(
     mock_dataset = Dataset(
         id=1, versioned_source_id=versioned_source_id, doi=doi, owner=mock_user
     )
-    mock_dataset_get = mocker.patch("src.models.Dataset.get", new_callable=AsyncMock)
-    mock_dataset_get.return_value = mock_dataset
+    mock_dataset_load_many = mocker.patch(
+        "src.models.Dataset.load_many", new_callable=AsyncMock
+    )
+    mock_dataset_load_many.return_value = [mock_dataset]
 
     response = await client.post("/mdf/search", json=mock_request_body)
 
@@ -139,3 +142,39 @@ async def test_search_with_no_db_entry(
 
     assert response.status_code == 200
     assert response.json() == expected_response_body
+
+
+@pytest.mark.asyncio
+async def test_search_queries_globus_search(
+    client,
+    mock_db_session,
+    mock_settings,
+    mocker,
+):
+    mock_response_body = {
+        "total": 0,
+        "count": 0,
+        "gmeta": [],
+        "has_next_page": False,
+        "offset": 0,
+        "facet_results": None,
+    }
+    requests = []
+
+    def handle(request):
+        requests.append(request)
+        return httpx.Response(status_code=200, json=mock_response_body)
+
+    # only the transport is mocked, so the call is timed for real
+    async_client = httpx.AsyncClient
+    mocker.patch(
+        "src.api.routes.mdf.search.httpx.AsyncClient",
+        lambda: async_client(transport=httpx.MockTransport(handle)),
+    )
+
+    response = await client.post("/mdf/search", json={"q": "anything"})
+
+    assert response.status_code == 200
+    assert response.json() == mock_response_body
+    assert len(requests) == 1
+    assert json.loads(requests[0].content) == {"q": "anything"}
@@ -1,12 +1,24 @@
+import asyncio
 from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
 
 import pytest
+from modal.functions import _Function
 from modal_proto import api_pb2
+from sqlalchemy import select
 
 from src.api.schemas.modal.invocations import (
+    ModalBatchInvocationOutput,
+    ModalBatchInvocationRequest,
     ModalInvocationRequest,
     ModalInvocationResponse,
+    ModalInvocationSpawnResponse,
 )
+from src.main import app
+from src.models import ModalApp, User
+from src.models.modal.invocations import ModalInvocation
+from src.usage import get_monthly_usage
+from tests.utils import post_modal_app
 
 
 @pytest.mark.asyncio
@@ -20,20 +32,19 @@ async def test_invoke_modal_fn(
     override_get_modal_client_dependency,
     mocker,
     mock_modal_app_create_request_one_function,
+    mock_modal_function,
     override_sandboxed_functions,
 ):
     # first, "deploy" a modal function to invoke
-    response = await client.post(
-        "/modal-apps", json=mock_modal_app_create_request_one_function
-    )
-    assert response.status_code == 200
-    response_data = response.json()
-    test_function_id = response_data["modal_function_ids"][0]
+    modal_app = await post_modal_app(client, mock_modal_app_create_request_one_function)
+    test_function_id = modal_app["modal_function_ids"][0]
 
     # Mock the modal Function and _Invocation
-    mock_function = MagicMock()
-    mock_function._invocation_function_id.return_value = "mock_function_id"
-    mock_function.spec.return_value = {"cpu": 0.125, "gpus": "A100", "memory": None}
+    mock_modal_function.spec.return_value = {
+        "cpu": 0.125,
+        "gpus": "A100",
+        "memory": None,
+    }
     mock_invocation = AsyncMock()
     mock_invocation.function_call_id = "mock_call_id"
     mock_invocation.pop_function_call_outputs.return_value = MagicMock(
@@ -45,7 +56,6 @@ async def test_invoke_modal_fn(
         ]
     )
 
-    mocker.patch("modal.functions._Function.lookup", return_value=mock_function)
     mocker.patch("modal.functions._Invocation", return_value=mock_invocation)
     mocker.patch(
         "src.api.routes.modal.invocations.estimate_usage",
@@ -83,7 +93,7 @@ async def test_invoke_modal_fn(
     )  # b64 encoded b"mock_result_data"
 
     # Verify that the mocks were called as expected
-    mock_function._invocation_function_id.assert_called_once()
+    mock_modal_function._invocation_function_id.assert_called_once()
     mock_invocation.pop_function_call_outputs.assert_called_once_with(
         timeout=None, clear_on_success=True
     )
@@ -101,18 +111,13 @@ async def test_invoke_modal_fn_rejects_request_if_user_is_over_usage_limit(
     override_get_modal_client_dependency,
     mocker,
     mock_modal_app_create_request_one_function,
+    mock_modal_function,
     override_sandboxed_functions,
 ):
     # first, "deploy" a modal function to invoke
-    response = await client.post(
-        "/modal-apps", json=mock_modal_app_create_request_one_function
-    )
-    assert response.status_code == 200
-    response_data = response.json()
-    test_function_id = response_data["modal_function_ids"][0]
+    modal_app = await post_modal_app(client, mock_modal_app_create_request_one_function)
+    test_function_id = modal_app["modal_function_ids"][0]
 
-    mock_function = MagicMock()
-    mock_function._invocation_function_id.return_value = "mock_function_id"
     mock_invocation = AsyncMock()
     mock_invocation.function_call_id = "mock_call_id"
     mock_invocation.pop_function_call_outputs.return_value = MagicMock(
@@ -124,7 +129,6 @@ async def test_invoke_modal_fn_rejects_request_if_user_is_over_usage_limit(
         ]
     )
 
-    mocker.patch("modal.functions._Function.lookup", return_value=mock_function)
     mocker.patch("modal.functions._Invocation", return_value=mock_invocation)
 
     # Mock retry_transient_errors to avoid outbound network calls
@@ -158,3 +162,403 @@ async def test_invoke_modal_fn_rejects_request_if_user_is_over_usage_limit(
     response = await client.post("/modal-invocations", json=mock_request_body)
     assert response.status_code == 403
     assert "User is over Modal usage limit" in response.text
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_invocations_reuse_function_lookups_until_app_changes(
+    override_modal_vip,
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    override_get_settings_dependency,
+    override_get_modal_client_dependency,
+    mocker,
+    mock_modal_app_create_request_one_function,
+    mock_modal_function,
+    override_sandboxed_functions,
+):
+    # first, "deploy" a modal function to invoke
+    modal_app = await post_modal_app(client, mock_modal_app_create_request_one_function)
+    test_function_id = modal_app["modal_function_ids"][0]
+
+    mock_invocation = AsyncMock()
+    mock_invocation.function_call_id = "mock_call_id"
+    mock_invocation.pop_function_call_outputs.return_value = MagicMock(
+        outputs=[api_pb2.FunctionGetOutputsItem()]
+    )
+    mocker.patch("modal.functions._Invocation", return_value=mock_invocation)
+    mocker.patch("src.api.routes.modal.invocations.estimate_usage", return_value=0.01)
+    mock_retry = mocker.patch("src.api.routes.modal.invocations.retry_transient_errors")
+    mock_retry.return_value = MagicMock(
+        function_call_id="mock_call_id", pipelined_inputs=["mock_input"]
+    )
+
+    body = ModalInvocationRequest(
+        function_id=test_function_id, args_kwargs_serialized=b"mock_input_data"
+    ).model_dump()
+    for _ in range(3):
+        response = await client.post("/modal-invocations", json=body)
+        assert response.status_code == 200
+    _Function.lookup.assert_called_once()
+
+    # committing a change to the app (e.g. redeploying it) drops its cached functions
+    async with app.state.db_session_maker() as db:
+        db.info["modal_function_cache"] = app.state.modal_function_cache
+        modal_app = await ModalApp.get(db, id=modal_app["id"])
+        modal_app.requirements = [*modal_app.requirements, "numpy"]
+        await db.commit()
+
+    response = await client.post("/modal-invocations", json=body)
+    assert response.status_code == 200
+    assert _Function.lookup.call_count == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_spawn_and_poll_modal_fn(
+    override_modal_vip,
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    override_get_settings_dependency,
+    override_get_modal_client_dependency,
+    mocker,
+    mock_modal_app_create_request_one_function,
+    mock_modal_function,
+    override_sandboxed_functions,
+):
+    # first, "deploy" a modal function to invoke
+    modal_app = await post_modal_app(client, mock_modal_app_create_request_one_function)
+    test_function_id = modal_app["modal_function_ids"][0]
+
+    mock_invocation = AsyncMock()
+    mock_invocation.function_call_id = "mock_call_id"
+    mocker.patch("modal.functions._Invocation", return_value=mock_invocation)
+    # a cent per second
+    mock_estimate_usage = mocker.patch(
+        "src.api.routes.modal.invocations.estimate_usage",
+        side_effect=lambda modal_fn, seconds: seconds / 100,
+    )
+    mock_retry = mocker.patch("src.api.routes.modal.invocations.retry_transient_errors")
+    mock_retry.return_value = MagicMock(
+        function_call_id="mock_call_id", pipelined_inputs=["mock_input"]
+    )
+
+    body = ModalInvocationRequest(
+        function_id=test_function_id, args_kwargs_serialized=b"mock_input_data"
+    ).model_dump()
+    response = await client.post("/modal-invocations/spawn", json=body)
+    assert response.status_code == 200
+    assert ModalInvocationSpawnResponse(**response.json()).function_call_id == (
+        "mock_call_id"
+    )
+    # MODAL_SPAWN_RESERVED_SECS are billed up front
+    mock_estimate_usage.assert_called_once()
+    assert mock_estimate_usage.call_args.args[1] == 300
+    async with app.state.db_session_maker() as db:
+        invocation = (await db.scalars(select(ModalInvocation))).one()
+        assert invocation.estimated_usage == 3.0
+        assert await get_monthly_usage(db, invocation.user_id) == 3.0
+    map_request = mock_retry.call_args.args[1]
+    assert (
+        map_request.function_call_invocation_type
+        == api_pb2.FUNCTION_CALL_INVOCATION_TYPE_ASYNC_LEGACY
+    )
+
+    # still running
+    mock_invocation.pop_function_call_outputs.return_value = MagicMock(outputs=[])
+    response = await client.get("/modal-invocations/mock_call_id?timeout=600")
+    assert response.status_code == 202
+    assert response.json() == {"function_call_id": "mock_call_id"}
+    # the wait is capped by MODAL_POLL_TIMEOUT_SECS
+    mock_invocation.pop_function_call_outputs.assert_called_with(
+        timeout=50, clear_on_success=False
+    )
+    assert mock_estimate_usage.call_count == 1
+
+    # finished, and the result can be collected more than once
+    mock_invocation.pop_function_call_outputs.return_value = MagicMock(
+        outputs=[
+            api_pb2.FunctionGetOutputsItem(
+                result=api_pb2.GenericResult(status=0, data=b"mock_result_data"),
+                data_format=api_pb2.DATA_FORMAT_PICKLE,
+                input_started_at=100.0,
+                output_created_at=102.5,
+            )
+        ]
+    )
+    for _ in range(2):
+        response = await client.get("/modal-invocations/mock_call_id")
+        assert response.status_code == 200
+        result = ModalInvocationResponse(**response.json())
+        assert result.result.data == b"mock_result_data"
+
+    # the reservation is settled once, timed by modal
+    assert mock_estimate_usage.call_count == 2
+    assert mock_estimate_usage.call_args.args[1] == 2.5
+    async with app.state.db_session_maker() as db:
+        invocation = (await db.scalars(select(ModalInvocation))).one()
+        assert invocation.function_call_id == "mock_call_id"
+        assert invocation.execution_time_seconds == 2.5
+        assert invocation.estimated_usage == 0.025
+        assert await get_monthly_usage(db, invocation.user_id) == pytest.approx(0.025)
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_spawned_calls_count_towards_the_usage_limit(
+    override_modal_vip,
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    override_get_settings_dependency,
+    override_get_modal_client_dependency,
+    mocker,
+    mock_modal_app_create_request_one_function,
+    mock_modal_function,
+    override_sandboxed_functions,
+):
+    # first, "deploy" a modal function to invoke
+    modal_app = await post_modal_app(client, mock_modal_app_create_request_one_function)
+    test_function_id = modal_app["modal_function_ids"][0]
+
+    mock_invocation = AsyncMock()
+
+    def invocation(stub, function_call_id, client):
+        mock_invocation.function_call_id = function_call_id
+        return mock_invocation
+
+    mocker.patch("modal.functions._Invocation", side_effect=invocation)
+    # 300 reserved seconds cost 3.0, against a limit of 5.0
+    mocker.patch(
+        "src.api.routes.modal.invocations.estimate_usage",
+        side_effect=lambda modal_fn, seconds: seconds / 100,
+    )
+    mock_retry = mocker.patch("src.api.routes.modal.invocations.retry_transient_errors")
+    call_ids = (f"call_{i}" for i in range(3))
+    mock_retry.side_effect = lambda *args, **kwargs: MagicMock(
+        function_call_id=next(call_ids), pipelined_inputs=["mock_input"]
+    )
+
+    body = ModalInvocationRequest(
+        function_id=test_function_id, args_kwargs_serialized=b"mock_input_data"
+    ).model_dump()
+    # nothing is ever collected, but the spawns are still billed
+    for _ in range(2):
+        response = await client.post("/modal-invocations/spawn", json=body)
+        assert response.status_code == 200
+    response = await client.post("/modal-invocations/spawn", json=body)
+    assert response.status_code == 403
+
+    # when modal doesn't time a call, it's counted from when it was spawned
+    mock_invocation.pop_function_call_outputs.return_value = MagicMock(
+        outputs=[api_pb2.FunctionGetOutputsItem()]
+    )
+    response = await client.get("/modal-invocations/call_0")
+    assert response.status_code == 200
+    async with app.state.db_session_maker() as db:
+        invocation = await ModalInvocation.get(db, function_call_id="call_0")
+        assert 0 <= invocation.execution_time_seconds < 60
+        assert await get_monthly_usage(db, invocation.user_id) == pytest.approx(
+            3.0 + invocation.estimated_usage
+        )
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_poll_modal_fn_only_finds_own_invocations(
+    override_modal_vip,
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    override_get_settings_dependency,
+    override_get_modal_client_dependency,
+    mocker,
+    mock_modal_app_create_request_one_function,
+    override_sandboxed_functions,
+):
+    # first, "deploy" a modal function to invoke
+    modal_app = await post_modal_app(client, mock_modal_app_create_request_one_function)
+    test_function_id = modal_app["modal_function_ids"][0]
+    mock_invocation = AsyncMock()
+    mocker.patch("modal.functions._Invocation", return_value=mock_invocation)
+
+    async with app.state.db_session_maker() as db:
+        someone_else = User(identity_id=uuid4(), username="someone@else.org")
+        db.add(someone_else)
+        await db.flush()
+        db.add(
+            ModalInvocation(
+                user_id=someone_else.id,
+                function_id=test_function_id,
+                function_call_id="their_call_id",
+            )
+        )
+        await db.commit()
+
+    for function_call_id in ["their_call_id", "no_such_call_id"]:
+        response = await client.get(f"/modal-invocations/{function_call_id}")
+        assert response.status_code == 404
+    mock_invocation.pop_function_call_outputs.assert_not_called()
+
+
+def _fake_map_call(outputs_per_poll: list[list[int]]):
+    """Fake modal's map RPCs, returning outputs for the given input indexes on each poll."""
+    calls = {"put": [], "cancel": 0, "cleared": False}
+    polls = iter(outputs_per_poll)
+
+    async def fake_rpc(fn, request, **kwargs):
+        if isinstance(request, api_pb2.FunctionMapRequest):
+            calls["map"] = request
+            return api_pb2.FunctionMapResponse(
+                function_call_id="mock_call_id",
+                pipelined_inputs=[
+                    api_pb2.FunctionPutInputsResponseItem(idx=item.idx)
+                    for item in request.pipelined_inputs
+                ],
+            )
+        if isinstance(request, api_pb2.FunctionPutInputsRequest):
+            calls["put"].append([item.idx for item in request.inputs])
+            return api_pb2.FunctionPutInputsResponse()
+        if isinstance(request, api_pb2.FunctionCallCancelRequest):
+            calls["cancel"] += 1
+            return None
+        if request.clear_on_success:
+            calls["cleared"] = True
+            return api_pb2.FunctionGetOutputsResponse()
+        # long-polling gives the rest of the inputs time to be put
+        await asyncio.sleep(0.01)
+        idxs = next(polls, None)
+        if idxs is None:
+            raise ConnectionError("modal went away")
+        return api_pb2.FunctionGetOutputsResponse(
+            last_entry_id="1-0",
+            outputs=[
+                api_pb2.FunctionGetOutputsItem(
+                    idx=idx,
+                    result=api_pb2.GenericResult(status=0, data=str(idx).encode()),
+                    data_format=api_pb2.DATA_FORMAT_PICKLE,
+                    input_started_at=100.0,
+                    output_created_at=101.0,
+                )
+                for idx in idxs
+            ],
+        )
+
+    return fake_rpc, calls
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+@pytest.mark.parametrize("order_outputs", [True, False])
+async def test_map_modal_fn(
+    order_outputs,
+    override_modal_vip,
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    override_get_settings_dependency,
+    override_get_modal_client_dependency,
+    mocker,
+    mock_modal_app_create_request_one_function,
+    mock_modal_function,
+    override_sandboxed_functions,
+):
+    # first, "deploy" a modal function to invoke
+    modal_app = await post_modal_app(client, mock_modal_app_create_request_one_function)
+    test_function_id = modal_app["modal_function_ids"][0]
+
+    mock_estimate_usage = mocker.patch(
+        "src.api.routes.modal.invocations.estimate_usage", return_value=0.5
+    )
+    num_inputs = 120
+    # outputs arrive out of order, and one of them twice
+    fake_rpc, calls = _fake_map_call(
+        [list(range(60, num_inputs)), [], [59, *range(59)]]
+    )
+    mocker.patch(
+        "src.api.routes.modal.invocations.retry_transient_errors", side_effect=fake_rpc
+    )
+
+    body = ModalBatchInvocationRequest(
+        function_id=test_function_id,
+        args_kwargs_serialized=[str(i).encode() for i in range(num_inputs)],
+        order_outputs=order_outputs,
+    ).model_dump()
+    response = await client.post("/modal-invocations/map", json=body)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    outputs = [
+        ModalBatchInvocationOutput.model_validate_json(line)
+        for line in response.text.splitlines()
+    ]
+    idxs = [output.idx for output in outputs]
+    if order_outputs:
+        assert idxs == list(range(num_inputs))
+    else:
+        assert idxs == [*range(60, num_inputs), 59, *range(59)]
+    assert all(output.result.data == str(output.idx).encode() for output in outputs)
+
+    # one map call, the first chunk pipelined and the rest put in bounded chunks
+    assert calls["map"].function_call_type == api_pb2.FUNCTION_CALL_TYPE_MAP
+    assert len(calls["map"].pipelined_inputs) == 49
+    assert calls["put"] == [list(range(49, 98)), list(range(98, num_inputs))]
+    assert calls["cleared"] and not calls["cancel"]
+
+    # usage is recorded for every input, as one invocation
+    assert mock_estimate_usage.call_count == num_inputs
+    async with app.state.db_session_maker() as db:
+        invocation = (await db.scalars(select(ModalInvocation))).one()
+        assert invocation.function_call_id == "mock_call_id"
+        assert invocation.num_inputs == num_inputs
+        assert invocation.execution_time_seconds == num_inputs * 1.0
+        assert invocation.estimated_usage == 60.0
+        assert await get_monthly_usage(db, invocation.user_id) == 60.0
+
+    # map calls can't be polled like spawned calls
+    response = await client.get("/modal-invocations/mock_call_id")
+    assert response.status_code == 400
+    assert "map call" in response.json()["detail"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_map_modal_fn_cancels_unfinished_inputs(
+    override_modal_vip,
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    override_get_settings_dependency,
+    override_get_modal_client_dependency,
+    mocker,
+    mock_modal_app_create_request_one_function,
+    mock_modal_function,
+    override_sandboxed_functions,
+):
+    # first, "deploy" a modal function to invoke
+    modal_app = await post_modal_app(client, mock_modal_app_create_request_one_function)
+    test_function_id = modal_app["modal_function_ids"][0]
+
+    mocker.patch("src.api.routes.modal.invocations.estimate_usage", return_value=0.5)
+    # modal stops answering after the first output
+    fake_rpc, calls = _fake_map_call([[0]])
+    mocker.patch(
+        "src.api.routes.modal.invocations.retry_transient_errors", side_effect=fake_rpc
+    )
+
+    body = ModalBatchInvocationRequest(
+        function_id=test_function_id,
+        args_kwargs_serialized=[b"first", b"second"],
+    ).model_dump()
+    # the error surfaces mid-stream, once the response has already started
+    with pytest.raises(Exception) as e:
+        await client.post("/modal-invocations/map", json=body)
+    # wrapped in an exception group by the streaming response's task group
+    assert isinstance(e.value.exceptions[0], ConnectionError)
+
+    assert calls["cancel"] == 1 and calls["cleared"]
+    async with app.state.db_session_maker() as db:
+        invocation = (await db.scalars(select(ModalInvocation))).one()
+    assert invocation.num_inputs == 1
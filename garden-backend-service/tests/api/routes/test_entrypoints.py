@@ -1,5 +1,6 @@
 import copy
 from unittest.mock import patch
+from uuid import uuid4
 
 import pytest
 
@@ -456,3 +457,31 @@ async def test_disallow_editing_published_entrypoint_fields(
     updated_data = {"container_uuid": "12345678-1234-5678-1234-567812345678"}
     patch_response = await client.patch(f"/entrypoints/{doi}", json=updated_data)
     assert patch_response.status_code == 400
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_get_entrypoints_cursor_pages_through_results(
+    client,
+    mock_db_session,
+    mock_entrypoint_create_request_json,
+    override_authenticated_dependency,
+):
+    dois = []
+    for i in range(3):
+        entrypoint_data = copy.deepcopy(mock_entrypoint_create_request_json)
+        entrypoint_data["doi"] = f"12.345/some-entrypoint-{i}"
+        entrypoint_data["func_uuid"] = str(uuid4())
+        response = await client.post("/entrypoints", json=entrypoint_data)
+        assert response.status_code == 200
+        dois.append(entrypoint_data["doi"])
+
+    response = await client.get("/entrypoints", params={"limit": 2})
+    assert response.status_code == 200
+    assert [e["doi"] for e in response.json()] == dois[:2]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = await client.get("/entrypoints", params={"limit": 2, "cursor": cursor})
+    assert response.status_code == 200
+    assert [e["doi"] for e in response.json()] == dois[2:]
+    assert "X-Next-Cursor" not in response.headers
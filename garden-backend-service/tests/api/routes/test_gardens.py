@@ -3,9 +3,11 @@ from copy import deepcopy
 from unittest.mock import patch
 
 import pytest
+from sqlalchemy import event, update
 
 from src.api.dependencies.auth import authenticated
 from src.main import app
+from src.models import Garden
 from tests.utils import post_entrypoints, post_garden
 
 
@@ -635,6 +637,7 @@ async def test_disallow_editing_published_garden_fields(
 async def test_search_gardens_rejects_invalid_filters(
     client,
     override_get_settings_dependency,
+    override_db_engine,
 ):
     body = {
         "q": "some search query",
@@ -888,3 +891,509 @@ async def test_search_gardens_rejects_invalid_sort_order(
     res = await client.post("/gardens/search", json=body)
     assert res.status_code == 400
     assert "Invalid sort order" in res.text
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_search_gardens_reflects_updates_and_deletes(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+):
+    garden = await post_garden(client, mock_garden_create_request_no_entrypoints_json)
+    doi = garden["doi"]
+
+    response = await client.patch(f"/gardens/{doi}", json={"title": "Rutabaga"})
+    assert response.status_code == 200
+
+    res = await client.post("/gardens/search", json={"q": "rutabaga"})
+    assert res.status_code == 200
+    assert [g["doi"] for g in res.json()["garden_meta"]] == [doi]
+
+    response = await client.delete(f"/gardens/{doi}")
+    assert response.status_code == 200
+
+    res = await client.post("/gardens/search", json={"q": "rutabaga"})
+    assert res.status_code == 200
+    assert res.json()["total"] == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_search_gardens_matches_linked_entrypoint_text(
+    client,
+    mock_db_session,
+    create_shared_entrypoint_json,
+    create_entrypoint_with_related_metadata_json,
+    create_garden_two_entrypoints_json,
+    override_authenticated_dependency,
+):
+    await post_entrypoints(
+        client,
+        create_shared_entrypoint_json,
+        create_entrypoint_with_related_metadata_json,
+    )
+    garden = await post_garden(client, create_garden_two_entrypoints_json)
+    doi = garden["doi"]
+
+    # "oxide" only appears in one of the garden's entrypoints
+    res = await client.post("/gardens/search", json={"q": "oxide"})
+    assert res.status_code == 200
+    assert [g["doi"] for g in res.json()["garden_meta"]] == [doi]
+
+    response = await client.patch(
+        f"/gardens/{doi}",
+        json={"entrypoint_ids": [create_shared_entrypoint_json["doi"]]},
+    )
+    assert response.status_code == 200
+
+    res = await client.post("/gardens/search", json={"q": "oxide"})
+    assert res.status_code == 200
+    assert res.json()["total"] == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_search_gardens_orders_by_rank(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+):
+    weak = deepcopy(mock_garden_create_request_no_entrypoints_json)
+    weak["title"] = "Rutabaga"
+    weak["doi"] = "12.345/weak-match"
+
+    # tags are weighted above titles
+    strong = deepcopy(mock_garden_create_request_no_entrypoints_json)
+    strong["title"] = "Rutabaga"
+    strong["tags"] = ["rutabaga"]
+    strong["doi"] = "12.345/strong-match"
+
+    await post_garden(client, weak)
+    await post_garden(client, strong)
+
+    res = await client.post("/gardens/search", json={"q": "rutabaga"})
+    assert res.status_code == 200
+    assert [g["doi"] for g in res.json()["garden_meta"]] == [
+        strong["doi"],
+        weak["doi"],
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_search_gardens_past_last_page_keeps_total_and_facets(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+):
+    await post_garden(client, mock_garden_create_request_no_entrypoints_json)
+
+    res = await client.post("/gardens/search", json={"q": "garden", "offset": 10})
+    assert res.status_code == 200
+    result = res.json()
+    assert result["count"] == 0
+    assert result["garden_meta"] == []
+    assert result["total"] == 1
+    assert sum(result["facets"]["year"].values()) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_search_gardens_in_one_statement(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+):
+    await post_garden(client, mock_garden_create_request_no_entrypoints_json)
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sync_engine = app.state.db_engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", record)
+    try:
+        res = await client.post("/gardens/search", json={"q": "garden"})
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", record)
+
+    assert res.status_code == 200
+    assert res.json()["total"] == 1
+    searches = [s for s in statements if "search_gardens(" in s]
+    # the page, total and facets all come from one search
+    assert len(searches) == 1
+    # and the page is a plain top-k, not a window over every match
+    page = searches[0].split("LEFT OUTER JOIN (")[1].split(") AS page")[0]
+    assert "LIMIT" in page
+    assert "row_number" not in page
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+@pytest.mark.parametrize(
+    "sort",
+    [
+        None,
+        {"field_name": "title", "order": "asc"},
+        {"field_name": "year", "order": "desc"},
+    ],
+)
+async def test_search_gardens_cursor_pages_through_results(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+    sort,
+):
+    for i in range(7):
+        garden_data = deepcopy(mock_garden_create_request_no_entrypoints_json)
+        garden_data["doi"] = f"12.345/some-doi-{i}"
+        garden_data["title"] = f"Garden {i % 3}"
+        garden_data["year"] = str(2020 + i % 2)
+        await post_garden(client, garden_data)
+
+    body = {"q": "garden", "limit": 3, "sort": sort}
+    res = await client.post("/gardens/search", json=body)
+    assert res.status_code == 200
+    first_page = res.json()
+    expected = [g["doi"] for g in first_page["garden_meta"]]
+
+    # the whole result set in one page, to compare the cursor pages against
+    res = await client.post("/gardens/search", json={**body, "limit": 10})
+    everything = [g["doi"] for g in res.json()["garden_meta"]]
+    assert res.json()["next_cursor"] is None
+
+    page = first_page
+    while page["next_cursor"]:
+        res = await client.post(
+            "/gardens/search", json={**body, "cursor": page["next_cursor"]}
+        )
+        assert res.status_code == 200
+        page = res.json()
+        assert page["total"] == 7
+        assert page["offset"] == len(expected)
+        expected += [g["doi"] for g in page["garden_meta"]]
+
+    assert expected == everything
+    assert len(set(expected)) == 7
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_search_gardens_cursor_page_seeks_past_the_cursor(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+):
+    for i in range(3):
+        garden_data = deepcopy(mock_garden_create_request_no_entrypoints_json)
+        garden_data["doi"] = f"12.345/some-doi-{i}"
+        await post_garden(client, garden_data)
+
+    body = {"q": "garden", "limit": 1, "sort": {"field_name": "title", "order": "asc"}}
+    res = await client.post("/gardens/search", json=body)
+    cursor = res.json()["next_cursor"]
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sync_engine = app.state.db_engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", record)
+    try:
+        res = await client.post("/gardens/search", json={**body, "cursor": cursor})
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", record)
+
+    assert res.status_code == 200
+    assert res.json()["offset"] == 1
+    page = next(s for s in statements if "search_gardens(" in s and "LIMIT" in s)
+    assert "OFFSET" not in page
+    assert "filtered.sort_key_0 >" in page
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_search_gardens_rejects_cursor_from_other_sort(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+):
+    for i in range(2):
+        garden_data = deepcopy(mock_garden_create_request_no_entrypoints_json)
+        garden_data["doi"] = f"12.345/some-doi-{i}"
+        await post_garden(client, garden_data)
+
+    res = await client.post("/gardens/search", json={"q": "garden", "limit": 1})
+    cursor = res.json()["next_cursor"]
+    assert cursor is not None
+
+    body = {
+        "q": "garden",
+        "cursor": cursor,
+        "sort": {"field_name": "title", "order": "asc"},
+    }
+    res = await client.post("/gardens/search", json=body)
+    assert res.status_code == 400
+    assert "Invalid cursor" in res.text
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_get_gardens_cursor_pages_through_results(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+):
+    dois = []
+    for i in range(5):
+        garden_data = deepcopy(mock_garden_create_request_no_entrypoints_json)
+        garden_data["doi"] = f"12.345/some-doi-{i}"
+        dois.append((await post_garden(client, garden_data))["doi"])
+
+    seen, params = [], {"limit": 2}
+    while True:
+        res = await client.get("/gardens", params=params)
+        assert res.status_code == 200
+        seen += [g["doi"] for g in res.json()]
+        if "X-Next-Cursor" not in res.headers:
+            break
+        params["cursor"] = res.headers["X-Next-Cursor"]
+
+    assert seen == dois
+
+    res = await client.get("/gardens", params={"cursor": "not a cursor"})
+    assert res.status_code == 400
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_search_gardens_serves_repeat_searches_from_cache(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    create_shared_entrypoint_json,
+    create_entrypoint_with_related_metadata_json,
+    create_garden_two_entrypoints_json,
+):
+    await post_entrypoints(
+        client,
+        create_shared_entrypoint_json,
+        create_entrypoint_with_related_metadata_json,
+    )
+    garden = await post_garden(client, create_garden_two_entrypoints_json)
+    cache = app.state.search_cache
+
+    # the same search with whitespace and filter order that can't change the results
+    body = {
+        "q": "owen",
+        "filters": [
+            {"field_name": "year", "values": ["2023"]},
+            {"field_name": "authors", "values": ["Owen"]},
+        ],
+    }
+    equivalent = {"q": "  owen ", "filters": list(reversed(body["filters"]))}
+
+    miss = await client.post("/gardens/search", json=body)
+    assert miss.headers["X-Search-Cache"] == "miss"
+    hit = await client.post("/gardens/search", json=equivalent)
+    assert hit.headers["X-Search-Cache"] == "hit"
+    bypass = await client.post(
+        "/gardens/search", json=body, headers={"Cache-Control": "no-cache"}
+    )
+    assert bypass.headers["X-Search-Cache"] == "bypass"
+
+    # cached responses are serialized just like uncached ones
+    app.state.search_cache = None
+    try:
+        uncached = await client.post("/gardens/search", json=body)
+    finally:
+        app.state.search_cache = cache
+    assert "X-Search-Cache" not in uncached.headers
+    assert miss.json() == hit.json() == bypass.json() == uncached.json()
+
+    # writes invalidate cached results
+    response = await client.patch(f"/gardens/{garden['doi']}", json={"year": "2024"})
+    assert response.status_code == 200
+    res = await client.post("/gardens/search", json=body)
+    assert res.headers["X-Search-Cache"] == "miss"
+    assert res.json()["total"] == 0
+
+    # including writes this worker didn't make
+    res = await client.post("/gardens/search", json=body)
+    assert res.headers["X-Search-Cache"] == "hit"
+    async with app.state.db_session_maker() as db:
+        await db.execute(
+            update(Garden).where(Garden.doi == garden["doi"]).values(year="2023")
+        )
+        await db.commit()
+    res = await client.post("/gardens/search", json=body)
+    assert res.headers["X-Search-Cache"] == "miss"
+    assert res.json()["total"] == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_suggest_gardens_returns_prefix_matches_with_counts(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+):
+    for i, tags in enumerate([["materials", "mastml"], ["materials"], ["math_"]]):
+        garden_data = deepcopy(mock_garden_create_request_no_entrypoints_json)
+        garden_data["doi"] = f"12.345/some-doi-{i}"
+        garden_data["tags"] = tags
+        await post_garden(client, garden_data)
+
+    res = await client.get("/gardens/suggest", params={"prefix": "MA"})
+    assert res.status_code == 200
+    assert res.json() == [
+        {"term": "materials", "field": "tags", "count": 2},
+        {"term": "mastml", "field": "tags", "count": 1},
+        {"term": "math_", "field": "tags", "count": 1},
+    ]
+
+    # LIKE wildcards in the prefix are matched literally
+    res = await client.get("/gardens/suggest", params={"prefix": "mat%"})
+    assert res.json() == []
+    res = await client.get("/gardens/suggest", params={"prefix": "math_"})
+    assert [s["term"] for s in res.json()] == ["math_"]
+
+    res = await client.get("/gardens/suggest", params={"prefix": "ma", "limit": 1})
+    assert [s["term"] for s in res.json()] == ["materials"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_suggest_gardens_reflects_updates_and_deletes(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+):
+    garden = await post_garden(client, mock_garden_create_request_no_entrypoints_json)
+    doi = garden["doi"]
+
+    response = await client.patch(f"/gardens/{doi}", json={"title": "Rutabaga"})
+    assert response.status_code == 200
+    res = await client.get("/gardens/suggest", params={"prefix": "ruta"})
+    assert res.json() == [{"term": "Rutabaga", "field": "title", "count": 1}]
+
+    response = await client.delete(f"/gardens/{doi}")
+    assert response.status_code == 200
+    res = await client.get("/gardens/suggest", params={"prefix": "ruta"})
+    assert res.json() == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_search_gardens_limits_facets_and_counts_the_rest(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+):
+    for i, tags in enumerate([["a", "b", "c"], ["a", "b"], ["a", "d"]]):
+        garden_data = deepcopy(mock_garden_create_request_no_entrypoints_json)
+        garden_data["doi"] = f"12.345/some-doi-{i}"
+        garden_data["tags"] = tags
+        await post_garden(client, garden_data)
+
+    body = {"q": "garden", "facets": {"tags": 2}}
+    res = await client.post("/gardens/search", json=body)
+    assert res.status_code == 200
+    facets = res.json()["facets"]
+    assert facets["tags"] == {"a": 3, "b": 2}
+    # "c" and "d" are left out
+    assert facets["other"] == {"tags": 2}
+    # facets that weren't asked for aren't calculated
+    assert facets["authors"] == {}
+    assert facets["year"] == {}
+
+    res = await client.post("/gardens/search", json={"q": "garden", "facets": {}})
+    assert res.status_code == 200
+    assert res.json()["facets"] == {
+        "tags": {},
+        "authors": {},
+        "year": {},
+        "other": {},
+    }
+    assert res.json()["total"] == 3
+
+    res = await client.post(
+        "/gardens/search", json={"q": "garden", "facets": {"colors": 5}}
+    )
+    assert res.status_code == 422
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+@pytest.mark.parametrize(
+    "filter, expected",
+    [
+        ({"field_name": "tags", "operator": "overlap", "values": ["b", "x"]}, [0, 1]),
+        ({"field_name": "tags", "operator": "contains", "values": ["a", "b"]}, [0]),
+        ({"field_name": "year", "operator": "eq", "values": ["2021"]}, [1]),
+        ({"field_name": "year", "operator": "in", "values": ["2020", "2022"]}, [0, 2]),
+        ({"field_name": "year", "operator": "range", "values": ["2021", ""]}, [1, 2]),
+        ({"field_name": "year", "operator": "range", "values": ["", "2021"]}, [0, 1]),
+        ({"field_name": "doi_is_draft", "operator": "eq", "values": ["true"]}, []),
+    ],
+)
+async def test_search_gardens_filter_operators(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+    filter,
+    expected,
+):
+    for i, tags in enumerate([["a", "b"], ["b", "c"], ["c"]]):
+        garden_data = deepcopy(mock_garden_create_request_no_entrypoints_json)
+        garden_data["doi"] = f"12.345/some-doi-{i}"
+        garden_data["tags"] = tags
+        garden_data["year"] = str(2020 + i)
+        garden_data["doi_is_draft"] = False
+        await post_garden(client, garden_data)
+
+    body = {"q": "", "filters": [filter], "sort": {"field_name": "doi", "order": "asc"}}
+    res = await client.post("/gardens/search", json=body)
+    assert res.status_code == 200
+    assert [g["doi"] for g in res.json()["garden_meta"]] == [
+        f"12.345/some-doi-{i}" for i in expected
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+@pytest.mark.parametrize(
+    "filter",
+    [
+        {"field_name": "title", "operator": "overlap", "values": ["a"]},
+        {"field_name": "tags", "operator": "eq", "values": ["a"]},
+        {"field_name": "year", "operator": "eq", "values": ["2020", "2021"]},
+        {"field_name": "title", "operator": "range", "values": ["a", "b"]},
+        {"field_name": "year", "operator": "range", "values": ["2020"]},
+        {"field_name": "year", "operator": "range", "values": ["soon", ""]},
+        {"field_name": "doi_is_draft", "operator": "eq", "values": ["maybe"]},
+    ],
+)
+async def test_search_gardens_rejects_invalid_filter_operators(
+    client,
+    mock_db_session,
+    filter,
+):
+    res = await client.post("/gardens/search", json={"q": "", "filters": [filter]})
+    assert res.status_code == 400
+    assert "Invalid filter" in res.text
@@ -0,0 +1,32 @@
+import json
+
+import httpx
+import pytest
+
+from src.api.routes._utils import archive_on_datacite
+
+
+@pytest.mark.asyncio
+async def test_archive_on_datacite_hides_the_doi(mock_settings, mocker):
+    requests = []
+
+    def handle(request):
+        requests.append(request)
+        return httpx.Response(status_code=200, json={})
+
+    # only the transport is mocked, so the call is timed for real
+    async_client = httpx.AsyncClient
+    mocker.patch(
+        "src.api.routes._utils.httpx.AsyncClient",
+        lambda: async_client(transport=httpx.MockTransport(handle)),
+    )
+    mock_settings.DATACITE_ENDPOINT = "https://api.test.datacite.org/dois"
+
+    await archive_on_datacite("10.23677/fake-doi", mock_settings)
+
+    assert len(requests) == 1
+    assert requests[0].method == "PUT"
+    assert str(requests[0].url).endswith("/10.23677/fake-doi")
+    assert json.loads(requests[0].content) == {
+        "data": {"type": "dois", "attributes": {"event": "hide"}}
+    }
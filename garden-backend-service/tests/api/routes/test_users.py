@@ -1,5 +1,9 @@
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import event, update
+
+from src.main import app
+from src.models import User
 
 
 @pytest.mark.asyncio
@@ -211,12 +215,25 @@ async def test_save_garden_unauthorized(
     )
     assert res.status_code == 200
 
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
     # Try to save it to another users list of saved gardens
-    result = await client.put(
-        f"/users/{mock_auth_state_other_user.identity_id}/saved/gardens/{doi}"
-    )
+    sync_engine = app.state.db_engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", record)
+    try:
+        result = await client.put(
+            f"/users/{mock_auth_state_other_user.identity_id}/saved/gardens/{doi}"
+        )
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", record)
     assert result.status_code == 401
 
+    # refused before looking anything up
+    assert not [s for s in statements if "FROM gardens" in s]
+
 
 @pytest.mark.asyncio
 @pytest.mark.integration
@@ -261,3 +278,28 @@ async def test_save_garden_nonexistent_garden(
         f"/users/{mock_auth_state.identity_id}/saved/gardens/somedoi"
     )
     assert result.status_code == 404
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_users_are_queued_for_group_enrollment_until_enrolled(
+    client: AsyncClient,
+    mock_db_session,
+    override_authenticated_dependency,
+    patch_globus_groups,
+    mock_auth_state,
+):
+    for _ in range(2):
+        response = await client.get("/users")
+        assert response.status_code == 200
+    # queued again on every request, until the queue has added them
+    assert patch_globus_groups.enroll.call_count == 2
+    patch_globus_groups.enroll.assert_called_with(mock_auth_state.identity_id)
+
+    async with app.state.db_session_maker() as db:
+        await db.execute(update(User).values(enrolled_in_group=True))
+        await db.commit()
+
+    response = await client.get("/users")
+    assert response.status_code == 200
+    assert patch_globus_groups.enroll.call_count == 2
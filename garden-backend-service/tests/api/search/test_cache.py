@@ -0,0 +1,39 @@
+from src.api.schemas.garden import GardenSearchRequest
+from src.api.search.cache import SearchResultCache
+
+
+def test_key_ignores_filter_order_and_whitespace():
+    a = GardenSearchRequest(
+        q="iris  classifier",
+        filters=[
+            {"field_name": "tags", "values": ["b", "a"]},
+            {"field_name": "year", "values": ["2024"]},
+        ],
+    )
+    b = GardenSearchRequest(
+        q=" iris classifier",
+        filters=[
+            {"field_name": "year", "values": ["2024"]},
+            {"field_name": "tags", "values": ["a", "b"]},
+        ],
+    )
+    assert SearchResultCache.key(a) == SearchResultCache.key(b)
+
+    other_page = GardenSearchRequest(q="iris classifier", offset=10)
+    assert SearchResultCache.key(a) != SearchResultCache.key(other_page)
+
+
+def test_results_are_only_served_at_their_generation():
+    cache = SearchResultCache(maxsize=10, ttl=60)
+
+    cache.set("key", b"first", 1)
+    assert cache.get("key", 1) == b"first"
+    # a write (through any worker) moved the generation on
+    assert cache.get("key", 2) is None
+
+    # a result read from a replica that hasn't caught up isn't stored
+    cache.set("key", b"stale", 1)
+    assert cache.get("key", 1) == b"first"
+
+    cache.set("key", b"fresh", 2)
+    assert cache.get("key", 2) == b"fresh"
@@ -0,0 +1,43 @@
+import pytest
+from sqlalchemy import asc, desc
+
+from src.api.search.pagination import (
+    decode_cursor,
+    encode_cursor,
+    keyset_after,
+    sort_keys,
+)
+from src.models import Garden
+
+
+def test_cursor_round_trips():
+    cursor = encode_cursor("title:asc", ["Some Garden", 42])
+    assert decode_cursor(cursor, "title:asc") == ["Some Garden", 42]
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "e30"])
+def test_decode_cursor_rejects_garbage(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, "id")
+
+
+def test_decode_cursor_rejects_other_orderings():
+    cursor = encode_cursor("title:asc", ["Some Garden", 42])
+    with pytest.raises(ValueError, match="sorted differently"):
+        decode_cursor(cursor, "title:desc")
+
+
+def test_keyset_after_rejects_mismatched_values():
+    keys = sort_keys([asc(Garden.title), Garden.id])
+    with pytest.raises(ValueError):
+        keyset_after(keys, ["Some Garden"])
+    with pytest.raises(ValueError):
+        keyset_after(keys, ["Some Garden", "not an id"])
+
+
+def test_keyset_after_bounds_leading_non_null_column():
+    keys = sort_keys([desc(Garden.title), Garden.id])
+    clause = str(keyset_after(keys, ["Some Garden", 42]))
+    assert clause.startswith("gardens.title <= ")
+    assert "gardens.title < " in clause
+    assert "gardens.id > " in clause
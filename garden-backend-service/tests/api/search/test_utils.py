@@ -0,0 +1,83 @@
+import pytest
+from sqlalchemy import desc, select, text
+from sqlalchemy.dialects import postgresql
+
+from src.api.schemas.garden import GardenSearchFilter
+from src.api.search.utils import apply_filters, apply_search
+from src.main import app
+from src.models import Garden
+from tests.utils import post_garden
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_apply_search_uses_search_document_index(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+):
+    await post_garden(client, mock_garden_create_request_no_entrypoints_json)
+
+    stmt, rank = apply_search(Garden, select(Garden), "owen")
+    stmt = stmt.order_by(desc(rank)).limit(10)
+    sql = stmt.compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    )
+
+    async with app.state.db_session_maker() as db:
+        # a tiny test table would otherwise always be scanned sequentially
+        await db.execute(text("SET LOCAL enable_seqscan = off"))
+        result = await db.execute(text(f"EXPLAIN {sql}"))
+        plan = "\n".join(row[0] for row in result)
+
+    # search_gardens is inlined, so its @@ prefilter shows up as an index scan
+    assert "garden_search_documents_index" in plan
+    assert "Function Scan on search_gardens" not in plan
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_suggest_uses_prefix_index(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+):
+    await post_garden(client, mock_garden_create_request_no_entrypoints_json)
+
+    async with app.state.db_session_maker() as db:
+        await db.execute(text("SET LOCAL enable_seqscan = off"))
+        result = await db.execute(
+            text(
+                "EXPLAIN SELECT term FROM garden_suggest_terms "
+                "WHERE lower(term) LIKE 'gar%'"
+            )
+        )
+        plan = "\n".join(row[0] for row in result)
+
+    assert "garden_suggest_terms_prefix_index" in plan
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_apply_filters_uses_array_index(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+):
+    await post_garden(client, mock_garden_create_request_no_entrypoints_json)
+
+    filters = [GardenSearchFilter(field_name="tags", operator="contains", values=["a"])]
+    stmt = apply_filters(Garden, select(Garden), filters)
+    sql = stmt.compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    )
+
+    async with app.state.db_session_maker() as db:
+        await db.execute(text("SET LOCAL enable_seqscan = off"))
+        result = await db.execute(text(f"EXPLAIN {sql}"))
+        plan = "\n".join(row[0] for row in result)
+
+    assert "ix_gardens_tags" in plan
@@ -0,0 +1,222 @@
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+from prometheus_client import REGISTRY
+from sqlalchemy import select
+
+from src.api.dependencies.database import get_db_session_maker
+from src.auth.auth_state import AuthenticationState
+from src.auth.globus_auth import TokenIntrospector, introspect_token
+from src.auth.token_cache import (
+    CachedIntrospection,
+    PostgresTokenCache,
+    SQLiteTokenCache,
+    hash_token,
+)
+from src.models import TokenIntrospection
+
+IDENTITY_ID = "00000000-0000-0000-0000-000000000000"
+
+
+def _introspection(active: bool = True, **fields) -> dict:
+    return {
+        "active": active,
+        "sub": IDENTITY_ID,
+        "username": "jean-paul@ens-paris.fr",
+        "scope": "openid some:scope",
+        "email": "some@email.com",
+        "name": "M. Sartre",
+        **fields,
+    }
+
+
+def _cache_requests(result: str, cache: str = "token_introspection") -> float:
+    labels = {"cache": cache, "result": result}
+    return REGISTRY.get_sample_value("garden_cache_requests_total", labels) or 0.0
+
+
+@pytest.fixture
+def mock_auth_client(mocker):
+    client = MagicMock()
+    client.oauth2_token_introspect.return_value = _introspection()
+    mocker.patch("src.auth.globus_auth.get_auth_client", return_value=client)
+    return client
+
+
+@pytest.fixture
+def introspector():
+    return TokenIntrospector(maxsize=10, ttl=60, invalid_ttl=60)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_one_introspection(
+    mock_auth_client, introspector
+):
+    released = threading.Event()
+
+    def slow_introspect(token, **kwargs):
+        released.wait(timeout=5)
+        return _introspection()
+
+    mock_auth_client.oauth2_token_introspect.side_effect = slow_introspect
+    coalesced_before = _cache_requests("coalesced")
+
+    lookups = [
+        asyncio.create_task(introspect_token("token", introspector)) for _ in range(10)
+    ]
+    # the event loop isn't blocked while Globus Auth is slow to answer
+    await asyncio.sleep(0.05)
+    assert not any(lookup.done() for lookup in lookups)
+    released.set()
+
+    results = await asyncio.gather(*lookups)
+    assert all(result["sub"] == IDENTITY_ID for result in results)
+    mock_auth_client.oauth2_token_introspect.assert_called_once()
+    assert _cache_requests("coalesced") - coalesced_before == 9
+
+    # later lookups are served from the cache
+    await introspect_token("token", introspector)
+    mock_auth_client.oauth2_token_introspect.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_lookup_does_not_cancel_others(mock_auth_client, introspector):
+    released = threading.Event()
+
+    def slow_introspect(token, **kwargs):
+        released.wait(timeout=5)
+        return _introspection()
+
+    mock_auth_client.oauth2_token_introspect.side_effect = slow_introspect
+
+    first = asyncio.create_task(introspect_token("token", introspector))
+    second = asyncio.create_task(introspect_token("token", introspector))
+    await asyncio.sleep(0.05)
+    first.cancel()
+    released.set()
+
+    assert (await second)["sub"] == IDENTITY_ID
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+@pytest.mark.asyncio
+async def test_inactive_tokens_are_cached_briefly(mock_auth_client):
+    introspector = TokenIntrospector(maxsize=10, ttl=60, invalid_ttl=0.1)
+    mock_auth_client.oauth2_token_introspect.return_value = _introspection(active=False)
+
+    for _ in range(3):
+        with pytest.raises(HTTPException) as e:
+            await introspect_token("expired", introspector)
+        assert e.value.status_code == 401
+    mock_auth_client.oauth2_token_introspect.assert_called_once()
+
+    time.sleep(0.15)
+    with pytest.raises(HTTPException):
+        await introspect_token("expired", introspector)
+    assert mock_auth_client.oauth2_token_introspect.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_tokens_are_not_cached_past_their_expiry(mock_auth_client, introspector):
+    mock_auth_client.oauth2_token_introspect.return_value = _introspection(
+        exp=time.time() + 0.1
+    )
+
+    await introspect_token("token", introspector)
+    await introspect_token("token", introspector)
+    mock_auth_client.oauth2_token_introspect.assert_called_once()
+
+    time.sleep(0.15)
+    await introspect_token("token", introspector)
+    assert mock_auth_client.oauth2_token_introspect.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_introspection_is_not_cached(mock_auth_client, introspector):
+    mock_auth_client.oauth2_token_introspect.side_effect = [
+        RuntimeError("Globus Auth is down"),
+        _introspection(),
+    ]
+
+    with pytest.raises(RuntimeError):
+        await introspect_token("token", introspector)
+    assert (await introspect_token("token", introspector))["sub"] == IDENTITY_ID
+
+
+@pytest.mark.asyncio
+async def test_workers_share_the_sqlite_cache(mock_auth_client, tmp_path):
+    path = str(tmp_path / "introspection_cache.sqlite3")
+    workers = [
+        TokenIntrospector(
+            maxsize=10, ttl=60, invalid_ttl=60, shared=SQLiteTokenCache(path)
+        )
+        for _ in range(2)
+    ]
+    shared_hits_before = _cache_requests("hit", "token_introspection_sqlite")
+
+    for worker in workers:
+        assert (await introspect_token("token", worker))["sub"] == IDENTITY_ID
+    mock_auth_client.oauth2_token_introspect.assert_called_once()
+    assert (
+        _cache_requests("hit", "token_introspection_sqlite") - shared_hits_before == 1
+    )
+
+    # entries are keyed by the token's hash
+    cached = await SQLiteTokenCache(path).get(hash_token("token"))
+    assert cached.data["sub"] == IDENTITY_ID
+    assert await SQLiteTokenCache(path).get("token") is None
+
+
+@pytest.mark.asyncio
+async def test_unavailable_shared_cache_is_skipped(mock_auth_client):
+    shared = MagicMock()
+    shared.name = "broken"
+    shared.get.side_effect = OSError("disk full")
+    shared.set.side_effect = OSError("disk full")
+    introspector = TokenIntrospector(maxsize=10, ttl=60, invalid_ttl=60, shared=shared)
+    errors_before = _cache_requests("error", "token_introspection_broken")
+
+    assert (await introspect_token("token", introspector))["sub"] == IDENTITY_ID
+    assert _cache_requests("error", "token_introspection_broken") - errors_before == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_postgres_cache(mock_db_session, override_db_engine):
+    db_session_maker = get_db_session_maker(override_db_engine)
+    cache = PostgresTokenCache(db_session_maker)
+    key = hash_token("token")
+    assert await cache.get(key) is None
+
+    await cache.set(key, CachedIntrospection(_introspection(), time.time() + 60))
+    cached = await cache.get(key)
+    assert cached.data["sub"] == IDENTITY_ID
+
+    # expired entries are ignored
+    await cache.set(key, CachedIntrospection(_introspection(), time.time() - 1))
+    assert await cache.get(key) is None
+
+    async with db_session_maker() as db:
+        assert (await db.scalars(select(TokenIntrospection.token_hash))).all() == [key]
+
+
+@pytest.mark.asyncio
+async def test_auth_state_from_token(
+    mocker, mock_auth_client, introspector, mock_settings
+):
+    mock_settings.GARDEN_DEFAULT_SCOPE = "some:scope"
+    mocker.patch("src.auth.auth_state.get_settings", return_value=mock_settings)
+
+    auth_state = await AuthenticationState.from_token("token", introspector)
+    assert auth_state.is_authenticated
+    assert str(auth_state.identity_id) == IDENTITY_ID
+    auth_state.assert_has_default_scope()
+
+    anonymous = await AuthenticationState.from_token(None, introspector)
+    assert not anonymous.is_authenticated
+    mock_auth_client.oauth2_token_introspect.assert_called_once()
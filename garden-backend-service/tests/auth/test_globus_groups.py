@@ -1,28 +1,181 @@
-from unittest.mock import MagicMock
+import asyncio
+import threading
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
 
 import pytest
+from sqlalchemy import select
 
-from src.auth.globus_groups import add_user_to_group
+from src.api.dependencies.database import get_db_session_maker
+from src.auth.globus_groups import GroupEnrollmentQueue, add_users_to_group
+from src.models import User
 
 
-@pytest.mark.asyncio
-async def test_add_user_to_group(
-    mocker,
-    mock_auth_state,
-    mock_settings,
-):
+def test_add_users_to_group(mocker, mock_settings):
     module = "src.auth.globus_groups"
 
-    mock_groups_manager = MagicMock()
+    mock_groups_client = MagicMock()
+    mock_groups_client.batch_membership_action.return_value = {}
     mocker.patch(
-        module + "._create_service_groups_manager",
-        return_value=mock_groups_manager,
+        module + "._create_service_groups_client",
+        return_value=mock_groups_client,
     )
+    identity_ids = [uuid4(), uuid4()]
+
+    add_users_to_group(mock_settings.GARDEN_USERS_GROUP_ID, identity_ids)
+
+    # Verify the users were added to the group in one call
+    mock_groups_client.batch_membership_action.assert_called_once()
+    group_id, actions = mock_groups_client.batch_membership_action.call_args.args
+    assert group_id == mock_settings.GARDEN_USERS_GROUP_ID
+    assert [member["identity_id"] for member in actions["add"]] == [
+        str(identity_id) for identity_id in identity_ids
+    ]
+
+
+@pytest.fixture
+def mock_add_users_to_group(mocker):
+    return mocker.patch("src.auth.globus_groups.add_users_to_group")
+
+
+@pytest.fixture
+def mock_db_session_maker():
+    db = AsyncMock()
+    session_maker = MagicMock()
+    session_maker.return_value.__aenter__.return_value = db
+    session_maker.db = db
+    return session_maker
+
+
+@pytest.mark.asyncio
+async def test_enrollments_queued_together_are_added_together(
+    mock_add_users_to_group, mock_db_session_maker
+):
+    released = threading.Event()
+    mock_add_users_to_group.side_effect = lambda *args: released.wait(timeout=5)
+    queue = GroupEnrollmentQueue("group", mock_db_session_maker, batch_size=3)
+    queue.start()
+    identity_ids = [uuid4() for _ in range(6)]
+
+    queue.enroll(identity_ids[0])
+    await asyncio.sleep(0.05)
+    # these arrive while the first user is being added
+    for identity_id in identity_ids[1:]:
+        queue.enroll(identity_id)
+    released.set()
+    await asyncio.sleep(0.05)
+    await queue.stop()
+
+    batches = [call.args[1] for call in mock_add_users_to_group.call_args_list]
+    assert batches == [identity_ids[:1], identity_ids[1:4], identity_ids[4:]]
+
+
+@pytest.mark.asyncio
+async def test_failed_enrollments_are_retried(
+    mock_add_users_to_group, mock_db_session_maker
+):
+    mock_add_users_to_group.side_effect = [RuntimeError("Globus is down"), None]
+    queue = GroupEnrollmentQueue(
+        "group", mock_db_session_maker, max_retries=3, retry_interval=0
+    )
+    queue.start()
+
+    queue.enroll(uuid4())
+    await asyncio.sleep(0.05)
+    await queue.stop()
+
+    assert mock_add_users_to_group.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_stop_adds_anyone_still_queued(
+    mock_add_users_to_group, mock_db_session_maker
+):
+    queue = GroupEnrollmentQueue("group", mock_db_session_maker)
+    identity_id = uuid4()
 
-    add_user_to_group(mock_auth_state, mock_settings)
+    queue.enroll(identity_id)
+    await queue.stop()
 
-    # Verify the user was added to the group
-    mock_groups_manager.add_member.assert_called_once_with(
-        mock_settings.GARDEN_USERS_GROUP_ID,
-        mock_auth_state.identity_id,
+    mock_add_users_to_group.assert_called_once_with("group", [identity_id])
+
+
+@pytest.mark.asyncio
+async def test_users_are_only_queued_once(
+    mock_add_users_to_group, mock_db_session_maker
+):
+    queue = GroupEnrollmentQueue("group", mock_db_session_maker)
+    identity_id = uuid4()
+
+    for _ in range(3):
+        queue.enroll(identity_id)
+    await queue.stop()
+
+    mock_add_users_to_group.assert_called_once_with("group", [identity_id])
+
+
+@pytest.mark.asyncio
+async def test_users_can_be_queued_again_after_giving_up(
+    mock_add_users_to_group, mock_db_session_maker
+):
+    mock_add_users_to_group.side_effect = [RuntimeError("Globus is down"), None]
+    queue = GroupEnrollmentQueue(
+        "group", mock_db_session_maker, max_retries=0, retry_interval=0
     )
+    queue.start()
+    identity_id = uuid4()
+
+    queue.enroll(identity_id)
+    await asyncio.sleep(0.05)
+    # not marked as enrolled, so their next request queues them again
+    mock_db_session_maker.db.execute.assert_not_called()
+
+    queue.enroll(identity_id)
+    await asyncio.sleep(0.05)
+    await queue.stop()
+
+    assert mock_add_users_to_group.call_count == 2
+    mock_db_session_maker.db.execute.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_stop_finishes_the_batch_being_added(
+    mock_add_users_to_group, mock_db_session_maker
+):
+    released = threading.Event()
+    mock_add_users_to_group.side_effect = lambda *args: released.wait(timeout=5)
+    queue = GroupEnrollmentQueue("group", mock_db_session_maker)
+    queue.start()
+
+    queue.enroll(uuid4())
+    await asyncio.sleep(0.05)
+    stopping = asyncio.create_task(queue.stop())
+    await asyncio.sleep(0.05)
+    assert not stopping.done()
+
+    released.set()
+    await stopping
+    mock_add_users_to_group.assert_called_once()
+    mock_db_session_maker.db.execute.assert_called_once()
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_added_users_are_marked_enrolled(
+    mock_add_users_to_group, mock_db_session, override_db_engine
+):
+    db_session_maker = get_db_session_maker(override_db_engine)
+    async with db_session_maker() as db:
+        users = [User(identity_id=uuid4()) for _ in range(2)]
+        db.add_all(users)
+        await db.commit()
+
+    queue = GroupEnrollmentQueue("group", db_session_maker)
+    queue.enroll(users[0].identity_id)
+    await queue.stop()
+
+    async with db_session_maker() as db:
+        enrolled = (
+            await db.scalars(select(User.identity_id).where(User.enrolled_in_group))
+        ).all()
+    assert enrolled == [users[0].identity_id]
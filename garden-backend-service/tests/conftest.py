@@ -11,7 +11,9 @@ from fastapi.security import HTTPBearer
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy import text
 from sqlalchemy.engine import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
 from testcontainers.postgres import PostgresContainer
 
 from src.api.dependencies.auth import (
@@ -20,15 +22,22 @@ from src.api.dependencies.auth import (
     authenticated,
     modal_vip,
 )
-from src.api.dependencies.database import init
-from src.api.dependencies.modal import get_modal_client
+from src.api.dependencies.database import (
+    get_db_session_maker,
+    get_recent_writers,
+    init,
+)
+from src.api.dependencies.modal import get_modal_client, get_modal_function_cache
 from src.api.dependencies.sandboxed_functions import (
     DeployModalAppProvider,
     ValidateModalFileProvider,
 )
+from src.api.search.cache import get_search_cache
+from src.auth.globus_auth import get_token_introspector
 from src.config import Settings, get_settings
 from src.main import app
 from src.models.base import Base
+from src.usage import get_monthly_usage_cache
 
 
 @pytest.fixture
@@ -38,8 +47,10 @@ def client(patch_globus_groups):
 
 
 @pytest.fixture
-def patch_globus_groups(mocker):
-    mocker.patch("src.api.dependencies.auth.add_user_to_group")
+def patch_globus_groups():
+    app.state.group_enrollment = MagicMock()
+    yield app.state.group_enrollment
+    del app.state.group_enrollment
 
 
 def docker_available():
@@ -89,16 +100,52 @@ def _sync_engine(mock_settings):
     engine.dispose()
 
 
+@pytest.fixture
+def override_db_engine(mock_settings):
+    """Give the app an engine pointed at the test db.
+
+    The test client doesn't run the app's lifespan, so we set up the engine and
+    session maker it would have put on app.state. NullPool keeps connections
+    from outliving each test's event loop.
+    """
+    engine = create_async_engine(
+        mock_settings.SQLALCHEMY_DATABASE_URL, poolclass=NullPool
+    )
+    app.state.db_engine = engine
+    app.state.db_session_maker = get_db_session_maker(engine)
+    # no replica under test, read-only sessions use the same db
+    app.state.readonly_db_engine = engine
+    app.state.readonly_db_session_maker = get_db_session_maker(engine)
+    app.state.recent_writers = get_recent_writers(mock_settings)
+    app.state.search_cache = get_search_cache(mock_settings)
+    app.state.modal_function_cache = get_modal_function_cache(mock_settings)
+    app.state.monthly_usage_cache = get_monthly_usage_cache(mock_settings)
+    app.state.token_introspector = get_token_introspector(
+        mock_settings, app.state.db_session_maker
+    )
+    yield engine
+    del app.state.token_introspector
+    del app.state.monthly_usage_cache
+    del app.state.modal_function_cache
+    del app.state.search_cache
+    del app.state.recent_writers
+    del app.state.readonly_db_session_maker
+    del app.state.readonly_db_engine
+    del app.state.db_session_maker
+    del app.state.db_engine
+
+
 @pytest.fixture
 def mock_db_session(
     mock_settings,
     override_get_settings_dependency,
+    override_db_engine,
     _sync_engine,
 ):
     """Provide a mock database session to the test.
 
-    override_get_settings_dependency gives get_db_session the url of the database
-    so routes that need the database will automatically be given the url of the test db.
+    override_db_engine points get_db_session at the test db, so routes that need
+    the database will automatically be given a session on the test db.
     """
     # Initialize the database schema
     Base.metadata.create_all(_sync_engine)
@@ -110,9 +157,12 @@ def mock_db_session(
 
     # Clean up after the test
     with Session(_sync_engine) as db:
-        db.execute(text("DROP MATERIALIZED VIEW garden_documents;"))
-        db.execute(text("DROP MATERIALIZED VIEW entrypoint_documents;"))
-        db.execute(text("DROP MATERIALIZED VIEW modal_function_documents;"))
+        db.execute(text("DROP TABLE garden_suggest_terms;"))
+        db.execute(text("DROP TABLE search_generation;"))
+        db.execute(text("DROP TABLE garden_search_documents;"))
+        db.execute(text("DROP TABLE garden_documents;"))
+        db.execute(text("DROP TABLE entrypoint_documents;"))
+        db.execute(text("DROP TABLE modal_function_documents;"))
         db.commit()
     Base.metadata.drop_all(_sync_engine)
 
@@ -195,6 +245,15 @@ def override_get_modal_client_dependency():
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+def mock_modal_function(mocker):
+    """Stand in for the deployed modal function that invocations look up."""
+    mock_function = MagicMock()
+    mock_function._invocation_function_id.return_value = "mock_function_id"
+    mocker.patch("modal.functions._Function.lookup", return_value=mock_function)
+    return mock_function
+
+
 @pytest.fixture
 def mock_auth_state():
     # Mock auth state for authentic user
@@ -241,13 +300,33 @@ def mock_settings(db_url):
     mock_settings.STS_TOKEN_TIMEOUT = 1234
     mock_settings.NOTEBOOKS_S3_BUCKET = "test-bucket"
     mock_settings.SQLALCHEMY_DATABASE_URL = db_url
+    mock_settings.DB_POOL_SIZE = 10
+    mock_settings.DB_MAX_OVERFLOW = 10
+    mock_settings.DB_POOL_TIMEOUT_SECS = 30
+    mock_settings.DB_POOL_RECYCLE_SECS = 1800
+    mock_settings.DB_POOL_PRE_PING = True
+    mock_settings.DB_REPLICA_ENDPOINT = None
+    mock_settings.SQLALCHEMY_REPLICA_DATABASE_URL = None
+    mock_settings.DB_READ_YOUR_WRITES_SECS = 0
+    mock_settings.SEARCH_CACHE_SIZE = 128
+    mock_settings.SEARCH_CACHE_TTL_SECS = 60
+    mock_settings.INTROSPECTION_CACHE_SIZE = 128
+    mock_settings.INTROSPECTION_CACHE_TTL_SECS = 300
+    mock_settings.INTROSPECTION_CACHE_INVALID_TTL_SECS = 30
+    mock_settings.INTROSPECTION_CACHE_BACKEND = "memory"
+    mock_settings.INTROSPECTION_CACHE_SQLITE_PATH = "introspection_cache.sqlite3"
+    mock_settings.TRACING_EXPORTER = "none"
+    mock_settings.TRACING_FILE_PATH = "traces.jsonl"
+    mock_settings.TRACING_OTLP_ENDPOINT = "http://localhost:4318/v1/traces"
     mock_settings.GARDEN_USERS_GROUP_ID = "fakeid"
+    mock_settings.GROUP_ENROLLMENT_BATCH_SIZE = 100
     mock_settings.SYNC_SEARCH_INDEX = False
     mock_settings.GLOBUS_SEARCH_INDEX_ID = "GLOBUS_ID"
     mock_settings.API_CLIENT_ID = "fakeid"
     mock_settings.API_CLIENT_SECRET = "secretfakeid"
     mock_settings.RETRY_INTERVAL_SECS = 1
-    mock_settings.MDF_SEARCH_INDEX = "mdfsearchindex"
+    mock_settings.MAX_RETRY_COUNT = 3
+    mock_settings.MDF_SEARCH_INDEX_UUID = "mdfsearchindex"
     mock_settings.MODAL_ENV = "dev"
     mock_settings.MODAL_TOKEN_ID = "fake-token-id"
     mock_settings.MODAL_TOKEN_SECRET = "fake-token-secret"
@@ -256,6 +335,11 @@ def mock_settings(db_url):
     mock_settings.GARDEN_SEARCH_SQL_DIR = "src/api/search/sql.sql"
     mock_settings.MODAL_VIP_LIST = []
     mock_settings.MODAL_USAGE_LIMIT = 5.0
+    mock_settings.MODAL_USAGE_CACHE_TTL_SECS = 5
+    mock_settings.MODAL_FUNCTION_CACHE_SIZE = 128
+    mock_settings.MODAL_FUNCTION_CACHE_TTL_SECS = 300
+    mock_settings.MODAL_POLL_TIMEOUT_SECS = 50
+    mock_settings.MODAL_SPAWN_RESERVED_SECS = 300
     return mock_settings
 
 
@@ -0,0 +1,66 @@
+import pytest
+import structlog
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from httpx import ASGITransport, AsyncClient
+
+from src.middleware.logging import RequestContextMiddleware
+
+
+@pytest.fixture
+def middleware_client():
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware)
+
+    @app.get("/request-id")
+    async def request_id(request: Request):
+        return {
+            "state": request.state.request_id,
+            "log_context": structlog.contextvars.get_contextvars().get("request_id"),
+        }
+
+    @app.get("/error")
+    async def error():
+        raise RuntimeError("boom")
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse(iter([b"one ", b"two"]), media_type="text/plain")
+
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_request_id_is_shared_with_the_endpoint(middleware_client):
+    response = await middleware_client.get("/request-id")
+
+    assert response.status_code == 200
+    request_id = response.headers["X-Request-ID"]
+    assert response.json() == {"state": request_id, "log_context": request_id}
+    assert float(response.headers["X-Process-Time"]) >= 0
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+
+
+@pytest.mark.asyncio
+async def test_unhandled_errors_become_500s(middleware_client):
+    response = await middleware_client.get("/error")
+
+    assert response.status_code == 500
+    assert response.json() == {"detail": "Internal Server Error"}
+    assert "X-Request-ID" in response.headers
+
+
+@pytest.mark.asyncio
+async def test_streaming_responses_pass_through(middleware_client):
+    response = await middleware_client.get("/stream")
+
+    assert response.status_code == 200
+    assert response.text == "one two"
+    assert "X-Request-ID" in response.headers
+
+
+@pytest.mark.asyncio
+async def test_request_ids_are_unique(middleware_client):
+    first = await middleware_client.get("/request-id")
+    second = await middleware_client.get("/request-id")
+    assert first.headers["X-Request-ID"] != second.headers["X-Request-ID"]
@@ -0,0 +1,101 @@
+import re
+from copy import deepcopy
+
+import pytest
+
+from src.middleware.timing import (
+    external_call,
+    get_request_timings,
+    track_request_timings,
+)
+from tests.utils import post_entrypoints, post_garden
+
+
+def _db_queries(response) -> int:
+    match = re.search(
+        r'db;dur=[\d.]+;desc="(\d+) queries"', response.headers["Server-Timing"]
+    )
+    assert match is not None
+    return int(match.group(1))
+
+
+def test_external_call_is_counted_against_the_current_request():
+    with track_request_timings() as timings:
+        with external_call("globus"):
+            pass
+        with external_call("globus"):
+            pass
+        with external_call("modal"):
+            pass
+
+    assert timings.external_calls == {"globus": 2, "modal": 1}
+    assert timings.log_fields()["globus_calls"] == 2
+    assert "globus;dur=" in timings.server_timing(1.0)
+    assert get_request_timings() is None
+
+
+def test_external_call_outside_a_request_is_ignored():
+    with external_call("globus"):
+        pass
+    assert get_request_timings() is None
+
+
+def test_server_timing_header_format():
+    with track_request_timings() as timings:
+        timings.record_query(1.5)
+        timings.record_query(2.5)
+        timings.record_external_call("modal", 10)
+
+    assert timings.server_timing(20) == (
+        'db;dur=4.00;desc="2 queries", modal;dur=10.00;desc="1 calls", total;dur=20.00'
+    )
+
+
+@pytest.mark.asyncio
+async def test_greet_makes_no_queries(client):
+    response = await client.get("/")
+    assert response.status_code == 200
+    assert _db_queries(response) == 0
+    assert "total;dur=" in response.headers["Server-Timing"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_request_counts_db_queries(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+):
+    await post_garden(client, mock_garden_create_request_no_entrypoints_json)
+
+    doi = mock_garden_create_request_no_entrypoints_json["doi"]
+    response = await client.get(f"/gardens/{doi}")
+    assert response.status_code == 200
+    assert _db_queries(response) > 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_listing_gardens_query_count_does_not_grow_with_results(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+    mock_entrypoint_create_request_json,
+):
+    # guards against N+1 queries from the lazy="selectin" relationships
+    await post_entrypoints(client, mock_entrypoint_create_request_json)
+    garden_data = deepcopy(mock_garden_create_request_no_entrypoints_json)
+    garden_data["entrypoint_ids"] = [mock_entrypoint_create_request_json["doi"]]
+
+    query_counts = []
+    for i in range(3):
+        garden_data["doi"] = f"12.345/some-doi-{i}"
+        await post_garden(client, garden_data)
+        response = await client.get("/gardens")
+        assert response.status_code == 200
+        assert len(response.json()) == i + 1
+        query_counts.append(_db_queries(response))
+
+    assert len(set(query_counts)) == 1
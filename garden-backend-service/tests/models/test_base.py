@@ -0,0 +1,129 @@
+import asyncio
+from copy import deepcopy
+from unittest.mock import MagicMock
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import event
+
+from src.main import app
+from src.models import Garden, User
+from tests.utils import post_garden
+
+
+def _cache_requests(cache: str, result: str) -> float:
+    labels = {"cache": cache, "result": result}
+    return REGISTRY.get_sample_value("garden_cache_requests_total", labels) or 0.0
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_get_reuses_cached_lookup_statement(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+):
+    garden = await post_garden(client, mock_garden_create_request_no_entrypoints_json)
+
+    async with app.state.db_session_maker() as db:
+        await Garden.get(db, doi=garden["doi"])
+        lookup_hits = _cache_requests("lookup_statements", "hit")
+        lookup_misses = _cache_requests("lookup_statements", "miss")
+        compiled_hits = _cache_requests("compiled_sql", "hit")
+
+        found = await Garden.get(db, doi=garden["doi"])
+        missing = await Garden.get(db, doi="10.missing/doi")
+
+    assert found.id == garden["id"]
+    assert missing is None
+
+    # both lookups reuse the same statement and its compiled SQL
+    assert _cache_requests("lookup_statements", "hit") == lookup_hits + 2
+    assert _cache_requests("lookup_statements", "miss") == lookup_misses
+    assert _cache_requests("compiled_sql", "hit") >= compiled_hits + 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_get_matches_null_values(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+):
+    garden_data = mock_garden_create_request_no_entrypoints_json
+    garden_data["description"] = None
+    garden = await post_garden(client, garden_data)
+
+    async with app.state.db_session_maker() as db:
+        found = await Garden.get(db, doi=garden["doi"], description=None)
+
+    assert found.id == garden["id"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_concurrent_loads_are_batched(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_auth_state,
+    mock_garden_create_request_no_entrypoints_json,
+):
+    dois = []
+    for i in range(3):
+        garden_data = deepcopy(mock_garden_create_request_no_entrypoints_json)
+        garden_data["doi"] = f"12.345/some-doi-{i}"
+        await post_garden(client, garden_data)
+        dois.append(garden_data["doi"])
+
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, many):
+        statements.append(statement)
+
+    sync_engine = app.state.db_engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", record_statement)
+    try:
+        async with app.state.db_session_maker() as db:
+            first, user, (second, missing, third) = await asyncio.gather(
+                Garden.load(db, "doi", dois[0]),
+                User.load(db, "identity_id", mock_auth_state.identity_id),
+                Garden.load_many(db, "doi", [dois[1], "10.missing/doi", dois[2]]),
+            )
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", record_statement)
+
+    assert [first.doi, second.doi, third.doi] == dois
+    assert missing is None
+    assert user.identity_id == mock_auth_state.identity_id
+
+    # one query per model, not one per lookup
+    assert len([s for s in statements if "WHERE gardens.doi IN" in s]) == 1
+    assert len([s for s in statements if "WHERE users.identity_id IN" in s]) == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_batch_load_does_not_leave_callers_waiting():
+    started = asyncio.Event()
+
+    async def slow_scalars(*args, **kwargs):
+        started.set()
+        await asyncio.sleep(10)
+
+    db = MagicMock()
+    db.info = {}
+    db.scalars = slow_scalars
+
+    loads = asyncio.gather(
+        Garden.load(db, "doi", "10.some/doi"),
+        User.load(db, "identity_id", "some-identity"),
+        return_exceptions=True,
+    )
+    await started.wait()
+    for task in list(db.info["batch_loader"]._tasks):
+        task.cancel()
+
+    results = await asyncio.wait_for(loads, timeout=1)
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
@@ -0,0 +1,106 @@
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from src.metrics import instrument_db_pool
+from src.middleware.timing import external_call
+
+
+def _sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_serves_prometheus_text(client):
+    await client.get("/")
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain")
+    assert "garden_http_requests_total" in response.text
+    assert "garden_http_request_duration_seconds_bucket" in response.text
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_requests_are_labelled_by_route_template(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+):
+    route = "/gardens/{doi:path}"
+    labels = {"method": "GET", "route": route}
+    before = _sample("garden_http_request_duration_seconds_count", **labels)
+    not_found_before = _sample(
+        "garden_http_requests_total", **labels, status_code="404"
+    )
+
+    await client.get("/gardens/10.1234/not-a-garden")
+    await client.get("/gardens/10.1234/another-missing-garden")
+
+    assert _sample("garden_http_request_duration_seconds_count", **labels) == before + 2
+    assert (
+        _sample("garden_http_requests_total", **labels, status_code="404")
+        == not_found_before + 2
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_search_cache_results_are_counted(client, mock_db_session):
+    body = {"q": "metrics"}
+    counts_before = {
+        result: _sample("garden_cache_requests_total", cache="search", result=result)
+        for result in ("hit", "miss", "bypass")
+    }
+
+    await client.post("/gardens/search", json=body)
+    await client.post("/gardens/search", json=body)
+    await client.post(
+        "/gardens/search", json=body, headers={"Cache-Control": "no-cache"}
+    )
+
+    for result in ("hit", "miss", "bypass"):
+        assert (
+            _sample("garden_cache_requests_total", cache="search", result=result)
+            == counts_before[result] + 1
+        )
+
+
+def test_external_calls_are_recorded_in_upstream_latency():
+    before = _sample("garden_upstream_request_duration_seconds_count", service="modal")
+    with external_call("modal"):
+        pass
+    assert (
+        _sample("garden_upstream_request_duration_seconds_count", service="modal")
+        == before + 1
+    )
+
+
+@pytest.mark.asyncio
+async def test_db_pool_gauges_follow_checkouts(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=1,
+        max_overflow=1,
+    )
+    instrument_db_pool(engine, "test")
+
+    def checked_out():
+        return _sample("garden_db_pool_checked_out_connections", pool="test")
+
+    def overflow():
+        return _sample("garden_db_pool_overflow_connections", pool="test")
+
+    async with engine.connect() as first:
+        await first.execute(text("SELECT 1"))
+        assert (checked_out(), overflow()) == (1, 0)
+        async with engine.connect() as second:
+            await second.execute(text("SELECT 1"))
+            assert (checked_out(), overflow()) == (2, 1)
+    assert (checked_out(), overflow()) == (0, 0)
+    await engine.dispose()
@@ -0,0 +1,103 @@
+import json
+import uuid
+
+import pytest
+
+from src import tracing
+from src.middleware.timing import external_call
+from src.tracing import FileSpanExporter, Span, SpanKind, span, start_trace
+
+
+class InMemorySpanExporter:
+    def __init__(self):
+        self.traces: list[list[Span]] = []
+
+    def export(self, spans: list[Span]) -> None:
+        self.traces.append(spans)
+
+    def shutdown(self) -> None:
+        pass
+
+
+@pytest.fixture
+def exporter():
+    exporter = InMemorySpanExporter()
+    tracing.set_exporter(exporter)
+    yield exporter
+    tracing.set_exporter(None)
+
+
+def test_spans_are_nested_under_the_trace(exporter):
+    with start_trace("ab" * 16, "root") as root:
+        with span("parent") as parent:
+            with external_call("modal", "FunctionMap"):
+                pass
+
+    [spans] = exporter.traces
+    by_name = {s.name: s for s in spans}
+    assert set(by_name) == {"root", "parent", "modal FunctionMap"}
+    assert by_name["parent"].parent_id == root.span_id
+    assert by_name["modal FunctionMap"].parent_id == parent.span_id
+    assert by_name["modal FunctionMap"].kind == SpanKind.CLIENT
+    assert by_name["modal FunctionMap"].attributes == {"peer.service": "modal"}
+    assert all(s.trace.trace_id == "ab" * 16 for s in spans)
+
+
+def test_span_records_errors(exporter):
+    with pytest.raises(ValueError):
+        with start_trace("ab" * 16, "root"):
+            with span("failing"):
+                raise ValueError("boom")
+
+    [spans] = exporter.traces
+    failing = next(s for s in spans if s.name == "failing")
+    assert failing.error == "ValueError: boom"
+    assert failing.to_otlp()["status"] == {"code": 2, "message": "ValueError: boom"}
+
+
+def test_spans_are_noops_when_tracing_is_off():
+    with start_trace("ab" * 16, "root") as root:
+        with span("child") as child:
+            pass
+    assert root is None and child is None
+
+
+def test_file_exporter_writes_otlp_json(tmp_path, exporter):
+    path = tmp_path / "traces.jsonl"
+    tracing.set_exporter(FileSpanExporter(str(path)))
+
+    with start_trace("ab" * 16, "root", **{"http.method": "GET"}):
+        pass
+
+    [line] = path.read_text().splitlines()
+    [otlp_span] = json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert otlp_span["traceId"] == "ab" * 16
+    assert otlp_span["name"] == "root"
+    assert otlp_span["kind"] == SpanKind.SERVER
+    assert {"key": "http.method", "value": {"stringValue": "GET"}} in otlp_span[
+        "attributes"
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_request_is_traced_under_its_request_id(
+    client,
+    mock_db_session,
+    override_authenticated_dependency,
+    mock_garden_create_request_no_entrypoints_json,
+    exporter,
+):
+    doi = mock_garden_create_request_no_entrypoints_json["doi"]
+    response = await client.get(f"/gardens/{doi}")
+
+    spans = exporter.traces[-1]
+    root = next(s for s in spans if s.parent_id is None)
+    assert root.trace.trace_id == uuid.UUID(response.headers["X-Request-ID"]).hex
+    assert root.name == "GET /gardens/{doi:path}"
+    assert root.attributes["http.status_code"] == response.status_code
+
+    queries = [s for s in spans if s.name == "db.query"]
+    assert queries
+    assert all(q.attributes["db.system"] == "postgresql" for q in queries)
+    assert all(q.end_ns is not None for q in queries)
@@ -0,0 +1,56 @@
+import datetime
+from uuid import uuid4
+
+import pytest
+from cachetools import TTLCache
+from sqlalchemy import select
+
+from src.main import app
+from src.models import User, UserMonthlyUsage
+from src.usage import add_monthly_usage, get_monthly_usage
+
+
+async def _create_user(db) -> int:
+    user = User(identity_id=uuid4(), username="some@user.org")
+    db.add(user)
+    await db.commit()
+    return user.id
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_monthly_usage_accumulates(mock_db_session):
+    async with app.state.db_session_maker() as db:
+        user_id = await _create_user(db)
+        assert await get_monthly_usage(db, user_id) == 0.0
+
+        await add_monthly_usage(db, user_id, 1.5)
+        await add_monthly_usage(db, user_id, 2.0)
+        # usage from an earlier month doesn't count against this one
+        await add_monthly_usage(db, user_id, 10.0, month=datetime.date(2000, 1, 1))
+        await db.commit()
+
+        assert await get_monthly_usage(db, user_id) == 3.5
+        rows = (await db.scalars(select(UserMonthlyUsage))).all()
+        assert len(rows) == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_cached_usage_is_dropped_on_commit(mock_db_session):
+    cache = TTLCache(maxsize=10, ttl=60)
+    async with app.state.db_session_maker() as db:
+        db.info["monthly_usage_cache"] = cache
+        user_id = await _create_user(db)
+        assert await get_monthly_usage(db, user_id, cache) == 0.0
+
+        # uncommitted usage leaves the cached total alone
+        await add_monthly_usage(db, user_id, 1.0)
+        assert await get_monthly_usage(db, user_id, cache) == 0.0
+        await db.rollback()
+        assert user_id in cache
+
+        await add_monthly_usage(db, user_id, 2.0)
+        await db.commit()
+        assert user_id not in cache
+        assert await get_monthly_usage(db, user_id, cache) == 2.0